@@ -47,3 +47,29 @@ class ContraAdmin(admin.ModelAdmin):
 @admin.register(AccountLog)
 class AccountLogAdmin(admin.ModelAdmin):
 	list_display = [field.name for field in AccountLog._meta.fields]
+
+
+@admin.register(AccountPosting)
+class AccountPostingAdmin(admin.ModelAdmin):
+	list_display = [field.name for field in AccountPosting._meta.fields]
+	list_filter = ['status', 'document_type']
+
+
+@admin.register(LedgerDailyBalance)
+class LedgerDailyBalanceAdmin(admin.ModelAdmin):
+	list_display = [field.name for field in LedgerDailyBalance._meta.fields]
+
+
+@admin.register(GroupClosure)
+class GroupClosureAdmin(admin.ModelAdmin):
+	list_display = [field.name for field in GroupClosure._meta.fields]
+
+
+@admin.register(FiscalPeriod)
+class FiscalPeriodAdmin(admin.ModelAdmin):
+	list_display = [field.name for field in FiscalPeriod._meta.fields]
+
+
+@admin.register(LedgerPeriodBalance)
+class LedgerPeriodBalanceAdmin(admin.ModelAdmin):
+	list_display = [field.name for field in LedgerPeriodBalance._meta.fields]
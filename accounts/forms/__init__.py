@@ -4,4 +4,5 @@ from .bank import BankForm
 from .ledgeraccount import LedgerAccountForm
 from .subledgeraccount import SubLedgerAccountForm
 from .paymentvoucher import PaymentVoucherForm
-from .receiptvoucher import ReceiptVoucherForm
\ No newline at end of file
+from .receiptvoucher import ReceiptVoucherForm
+from .voucher_import import VoucherImportForm
@@ -1,5 +1,6 @@
 from django import forms
 from django.core.exceptions import ValidationError
+from accounts.utils.period_close import check_document_dates
 from accounts.models import ReceiptVoucher
 
 class ReceiptVoucherForm(forms.ModelForm):
@@ -30,4 +31,10 @@ class ReceiptVoucherForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         self.request = kwargs.pop('request', None)
-        super().__init__(*args, **kwargs)
\ No newline at end of file
+        super().__init__(*args, **kwargs)
+
+    def clean_date(self):
+        date = self.cleaned_data.get('date')
+        # Both the new date and the stored one must lie in an open period
+        check_document_dates(date, self.instance.date if self.instance.pk else None)
+        return date
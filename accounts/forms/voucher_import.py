@@ -0,0 +1,13 @@
+from django import forms
+
+
+class VoucherImportForm(forms.Form):
+    voucher_type = forms.ChoiceField(
+        choices=[('payment', 'Payment Vouchers'), ('receipt', 'Receipt Vouchers')],
+        widget=forms.Select(attrs={'class': 'form-control'}),
+    )
+    file = forms.FileField(
+        help_text="CSV or XLSX with 'Date', 'Ledger' and 'Amount' columns, and optionally 'Account', "
+                  "'Sub Ledger', 'Cheque No' and 'Details'.",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'}),
+    )
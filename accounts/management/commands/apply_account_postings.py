@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from accounts.utils.account_posting import apply_pending_postings, retry_failed_postings
+
+
+class Command(BaseCommand):
+    help = "Apply the pending AccountLog postings from the outbox, e.g. to replay a backlog after an outage."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help="Queue failed postings again first")
+        parser.add_argument('--batch-size', type=int, default=500, help="Postings applied per DB transaction")
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            self.stdout.write(f"Re-queued {retry_failed_postings()} failed postings")
+
+        processed = apply_pending_postings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} postings."))
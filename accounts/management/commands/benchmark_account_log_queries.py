@@ -0,0 +1,87 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import AccountLog, Group, LedgerAccount, PrimaryGroup
+from commons.utils import date_range_filter
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Load synthetic AccountLog rows inside a transaction that is rolled back, then print the query plan "
+        "and timing of the posting lookup and of date-range filters written with __date and as half-open ranges."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=5_000_000, help="Synthetic logs to load")
+        parser.add_argument('--ledgers', type=int, default=500, help="Synthetic ledgers the logs are spread over")
+        parser.add_argument('--days', type=int, default=730, help="Days back the log dates are spread over")
+        parser.add_argument('--batch-size', type=int, default=10_000, help="Rows per bulk insert")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Synthetic rows rolled back.")
+
+    def run(self, options):
+        primary = PrimaryGroup.objects.create(name='Benchmark Primary')
+        group = Group.objects.create(name='Benchmark Group', head_primarygroup=primary)
+        ledgers = LedgerAccount.objects.bulk_create([
+            LedgerAccount(name=f'Benchmark Ledger {number}', head_group=group)
+            for number in range(options['ledgers'])
+        ])
+        ledger_ids = [ledger.pk for ledger in ledgers]
+
+        # bulk_create skips AccountLog.save, so the daily rollup is left alone
+        started = time.monotonic()
+        now = timezone.now()
+        seconds = options['days'] * 86400
+        loaded = 0
+        while loaded < options['rows']:
+            size = min(options['batch_size'], options['rows'] - loaded)
+            AccountLog.objects.bulk_create([
+                AccountLog(
+                    ledger_id=random.choice(ledger_ids),
+                    date=now - timedelta(seconds=random.randrange(seconds)),
+                    reference_no=f'BM-{loaded + number}',
+                    log_type=random.choice(('sale_customer', 'sale_payment', 'payment_voucher')),
+                    debit_amount=random.randint(0, 1000),
+                    credit_amount=0,
+                )
+                for number in range(size)
+            ])
+            loaded += size
+        self.stdout.write(f"Loaded {loaded} logs in {time.monotonic() - started:.1f}s")
+
+        ledger_id = ledger_ids[0]
+        day_to = timezone.localdate()
+        day_from = day_to - timedelta(days=30)
+        reference_no = f'BM-{loaded // 2}'
+        queries = {
+            'posting lookup (reference_no, log_type, ledger)': AccountLog.objects.filter(
+                reference_no=reference_no, log_type='sale_customer', ledger_id=ledger_id
+            ).order_by(),
+            'ledger month with __date casts': AccountLog.objects.filter(
+                ledger_id=ledger_id, date__date__gte=day_from, date__date__lte=day_to
+            ).order_by('date', 'id'),
+            'ledger month as a half-open range': AccountLog.objects.filter(
+                date_range_filter('date', day_from, day_to), ledger_id=ledger_id
+            ).order_by('date', 'id'),
+        }
+        for label, queryset in queries.items():
+            started = time.monotonic()
+            count = len(queryset)
+            elapsed = (time.monotonic() - started) * 1000
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{label}: {count} rows in {elapsed:.1f}ms"))
+            self.stdout.write(queryset.explain())
@@ -0,0 +1,29 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import FiscalPeriod
+from accounts.utils.period_close import close_fiscal_period, reopen_fiscal_period
+
+
+class Command(BaseCommand):
+    help = "Close a fiscal period, storing ledger balances and locking its postings, or reopen the latest one."
+
+    def add_arguments(self, parser):
+        parser.add_argument('period_id', type=int, help="FiscalPeriod id")
+        parser.add_argument('--reopen', action='store_true', help="Reopen the period instead of closing it")
+
+    def handle(self, *args, **options):
+        try:
+            period = FiscalPeriod.objects.get(pk=options['period_id'])
+        except FiscalPeriod.DoesNotExist:
+            raise CommandError(f"Fiscal period #{options['period_id']} does not exist.")
+
+        try:
+            if options['reopen']:
+                reopen_fiscal_period(period)
+                self.stdout.write(self.style.SUCCESS(f"{period} reopened."))
+            else:
+                stored = close_fiscal_period(period)
+                self.stdout.write(self.style.SUCCESS(f"{period} closed with {stored} ledger balances."))
+        except ValidationError as error:
+            raise CommandError(' '.join(error.messages))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import GroupClosure
+
+
+class Command(BaseCommand):
+    help = "Recompute the group closure table from the Group.head_group tree."
+
+    def handle(self, *args, **options):
+        links = GroupClosure.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Group closure rebuilt with {links} rows."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import LedgerAccount, LedgerDailyBalance
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily ledger balances from the account logs in chunks of ledgers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200, help="Ledgers processed per DB transaction")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = 0
+        processed = 0
+
+        while True:
+            ledger_ids = list(
+                LedgerAccount.all_objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not ledger_ids:
+                break
+
+            LedgerDailyBalance.objects.rebuild(ledger_ids)
+
+            processed += len(ledger_ids)
+            last_id = ledger_ids[-1]
+            self.stdout.write(f"Rebuilt daily balances for {processed} ledgers")
+
+        self.stdout.write(self.style.SUCCESS(f"Daily balances rebuilt for {processed} ledgers."))
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.utils.ledger_repost import CHUNK_SIZE, repost_ledgers
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%d-%m-%Y").date()
+    except ValueError:
+        raise CommandError(f"'{value}' is not a date in DD-MM-YYYY format.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the account logs of the sales, purchases, returns and vouchers dated in a range from the "
+        "documents and apply the differences in bulk, a chunk of documents per DB transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', required=True, type=parse_date, help="First document date, DD-MM-YYYY")
+        parser.add_argument('--to', dest='date_to', required=True, type=parse_date, help="Last document date, DD-MM-YYYY")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Documents processed per DB transaction")
+        parser.add_argument('--dry-run', action='store_true', help="Report the differences without writing them")
+
+    def handle(self, *args, **options):
+        if options['date_from'] > options['date_to']:
+            raise CommandError("--from must not be after --to.")
+
+        def progress(document_type, last_id, counts):
+            self.stdout.write(
+                f"{document_type} up to #{last_id}: "
+                f"{counts['created']} created, {counts['updated']} updated, {counts['deleted']} deleted"
+            )
+
+        try:
+            totals, skipped = repost_ledgers(
+                options['date_from'],
+                options['date_to'],
+                chunk_size=options['chunk_size'],
+                dry_run=options['dry_run'],
+                progress=progress if options['verbosity'] > 1 else None,
+            )
+        except ValidationError as error:
+            raise CommandError(' '.join(error.messages))
+
+        for message in skipped:
+            self.stderr.write(f"Skipped {message}")
+        for document_type, counts in totals.items():
+            self.stdout.write(
+                f"{document_type}: {counts['created']} created, {counts['updated']} updated, "
+                f"{counts['deleted']} deleted"
+            )
+        verb = "would be reposted" if options['dry_run'] else "reposted"
+        changed = sum(sum(counts.values()) for counts in totals.values())
+        self.stdout.write(self.style.SUCCESS(f"{changed} account logs {verb}."))
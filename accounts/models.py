@@ -1,7 +1,14 @@
+from collections import defaultdict
+
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from utils.base_model import BaseModel
+
+from commons.utils import date_range_filter
+from utils.base_model import BaseModel, SoftDeletionManager, SoftDeletionQuerySet
 
 # Create your models here.
 
@@ -63,8 +70,97 @@ class Group(BaseModel):
             raise ValidationError('Must provide either head_group_self or head_group_primarygroup.')
         if self.head_group and self.head_primarygroup:
             raise ValidationError('Select head_group_self or head_group_primarygroup, but not both.')
-        super().save(*args, **kwargs)
-    
+        if self.pk and self.head_group_id and GroupClosure.objects.filter(
+            ancestor_id=self.pk, descendant_id=self.head_group_id
+        ).exists():
+            raise ValidationError('A group cannot be placed under itself or one of its sub-groups.')
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Relink the subtree when the group is new or has moved
+            linked_parent = GroupClosure.objects.filter(descendant_id=self.pk, depth=1).values_list(
+                'ancestor_id', flat=True
+            ).first()
+            if linked_parent != self.head_group_id or not GroupClosure.objects.filter(descendant_id=self.pk).exists():
+                GroupClosure.objects.place(self)
+
+
+class GroupClosureManager(models.Manager):
+    def place(self, group):
+        """
+        Link `group` and its sub-groups under group.head_group: the rows joining
+        the subtree to its old ancestors are replaced by rows to the new ones.
+        """
+        subtree = list(self.filter(ancestor_id=group.pk).values_list('descendant_id', 'depth'))
+        if not subtree:
+            self.create(ancestor_id=group.pk, descendant_id=group.pk, depth=0)
+            subtree = [(group.pk, 0)]
+        subtree_ids = [pk for pk, _ in subtree]
+
+        self.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+        if group.head_group_id:
+            ancestors = list(self.filter(descendant_id=group.head_group_id).values_list('ancestor_id', 'depth'))
+            self.bulk_create([
+                GroupClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=above + below + 1)
+                for ancestor_id, above in ancestors
+                for descendant_id, below in subtree
+            ])
+
+    def rebuild(self):
+        """Recompute every row from Group.head_group."""
+        parents = dict(Group.all_objects.values_list('pk', 'head_group_id'))
+        links = []
+        for pk in parents:
+            ancestor_id, depth, seen = pk, 0, set()
+            # `seen` stops at a head_group cycle left by older data
+            while ancestor_id is not None and ancestor_id not in seen:
+                seen.add(ancestor_id)
+                links.append(GroupClosure(ancestor_id=ancestor_id, descendant_id=pk, depth=depth))
+                ancestor_id, depth = parents.get(ancestor_id), depth + 1
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(links, batch_size=2000)
+        return len(links)
+
+    def descendants_of(self, group, include_self=True):
+        """Live groups in the subtree of `group`, at any depth."""
+        lookups = {'ancestor_links__ancestor': group}
+        if not include_self:
+            lookups['ancestor_links__depth__gt'] = 0
+        return Group.objects.filter(**lookups)
+
+    def ledgers_under(self, group):
+        """Live ledgers anywhere under a Group, or under every group of a PrimaryGroup."""
+        if isinstance(group, PrimaryGroup):
+            # Only root groups hang off a primary group
+            return LedgerAccount.objects.filter(head_group__ancestor_links__ancestor__head_primarygroup=group)
+        return LedgerAccount.objects.filter(head_group__ancestor_links__ancestor=group)
+
+
+class GroupClosure(models.Model):
+    """
+    One row per (ancestor, descendant) pair of the Group tree, a group being its
+    own ancestor at depth 0. Kept up to date by Group.save, so a whole subtree
+    is one indexed join away.
+    """
+
+    ancestor = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Group, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveSmallIntegerField()
+
+    objects = GroupClosureManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='group_closure_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['descendant', 'depth'], name='group_closure_descendant_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ancestor_id} > {self.descendant_id} ({self.depth})"
+
 
 
 class LedgerAccount(BaseModel):
@@ -90,6 +186,10 @@ class LedgerAccount(BaseModel):
     class Meta:
         verbose_name_plural = 'LedgerAccounts'
         ordering = ['-id',]
+        indexes = [
+            # Customer/supplier ledgers are found by the party id they reference
+            models.Index(fields=['reference_id', 'ledger_type'], name='ledger_reference_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name}"
@@ -201,6 +301,50 @@ class Contra(BaseModel):
         return str(self.id)
 
 
+ROLLUP_FIELDS = {'ledger_id', 'date', 'debit_amount', 'credit_amount', 'deleted_at'}
+
+# Rollup changes touching more (ledger, day) rows than this are applied set-wise
+BULK_DELTAS_FROM = 20
+
+
+def rollup_deltas(removed=(), added=()):
+    """
+    Signed [debit, credit] changes per (ledger_id, local day) for log rows
+    given as dicts; rows without a ledger or date are not rolled up.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for sign, rows in ((-1, removed), (1, added)):
+        for row in rows:
+            if row is None or row['ledger_id'] is None or row['date'] is None:
+                continue
+            delta = deltas[(row['ledger_id'], timezone.localdate(row['date']))]
+            delta[0] += sign * (row['debit_amount'] or 0)
+            delta[1] += sign * (row['credit_amount'] or 0)
+    return deltas
+
+
+class AccountLogQuerySet(SoftDeletionQuerySet):
+    def delete(self, soft=True):
+        # Take the removed logs out of the daily rollup in the same DB transaction
+        with transaction.atomic():
+            removed = list(
+                self.filter(deleted_at__isnull=True)
+                .order_by()
+                .values('ledger_id', 'date', 'debit_amount', 'credit_amount')
+            )
+            FiscalPeriod.objects.check_open(row['date'] for row in removed)
+            result = super().delete(soft=soft)
+            LedgerDailyBalance.objects.apply_deltas(rollup_deltas(removed=removed))
+        return result
+
+
+class AccountLogManager(SoftDeletionManager):
+    def get_queryset(self):
+        return AccountLogQuerySet(self.model, using=self._db).filter(
+            deleted_at__isnull=True
+        )
+
+
 class AccountLog(BaseModel):
     date = models.DateTimeField(null=True, blank=True)
     ledger = models.ForeignKey(LedgerAccount, on_delete=models.RESTRICT, related_name='account_logs', null=True, blank=True)
@@ -213,13 +357,306 @@ class AccountLog(BaseModel):
     credit_amount = models.DecimalField(default=0, max_digits=20, decimal_places=2, null=True, blank=True)
     
     details = models.TextField(null=True, blank=True)
+
+    objects = AccountLogManager()
     
     class Meta:
         verbose_name_plural = 'AccountLogs'
         ordering = ['-id',]
+        indexes = [
+            # Ledger statements and date-range reports seek a ledger's logs by (date, id)
+            models.Index(fields=['ledger', 'date', 'id'], name='account_log_ledger_date_idx'),
+            # Postings look up a document's logs by reference, type and ledger
+            models.Index(fields=['reference_no', 'log_type', 'ledger'], name='account_log_reference_idx'),
+        ]
 
     def __str__(self):
         return str(self.id)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the rollup holds for this log, so save() can post just the difference
+        if ROLLUP_FIELDS.issubset(field_names):
+            instance._rolled_up = instance.rollup_row()
+        return instance
+
+    def rollup_row(self):
+        if self.deleted_at:
+            return None
+        return {
+            'ledger_id': self.ledger_id,
+            'date': self.date,
+            'debit_amount': self.debit_amount,
+            'credit_amount': self.credit_amount,
+        }
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            if self._state.adding:
+                previous = None
+            elif hasattr(self, '_rolled_up'):
+                previous = self._rolled_up
+            else:
+                previous = (
+                    AccountLog.objects.filter(pk=self.pk)
+                    .values('ledger_id', 'date', 'debit_amount', 'credit_amount')
+                    .first()
+                )
+            FiscalPeriod.objects.check_open([previous and previous['date'], self.date])
+            super().save(*args, **kwargs)
+            current = self.rollup_row()
+            LedgerDailyBalance.objects.apply_deltas(rollup_deltas(removed=[previous], added=[current]))
+        self._rolled_up = current
+
+    def delete(self, using=None, soft=True, *args, **kwargs):
+        if soft:
+            # A soft delete is a save, which takes the log out of the rollup
+            return super().delete(using=using, soft=soft, *args, **kwargs)
+        with transaction.atomic():
+            previous = (
+                AccountLog.objects.filter(pk=self.pk)
+                .values('ledger_id', 'date', 'debit_amount', 'credit_amount')
+                .first()
+            )
+            FiscalPeriod.objects.check_open([previous and previous['date']])
+            result = super().delete(using=using, soft=soft, *args, **kwargs)
+            LedgerDailyBalance.objects.apply_deltas(rollup_deltas(removed=[previous]))
+        return result
+
+
+class LedgerDailyBalanceManager(models.Manager):
+    def apply_deltas(self, deltas):
+        """
+        Add signed [debit, credit] changes per (ledger_id, day) with atomic F()
+        updates, in key order so concurrent writers lock consistently. A missing
+        row is initialised from the logs, which already include the change.
+        Batches beyond a few days are applied set-wise by apply_bulk_deltas().
+        """
+        deltas = {key: delta for key, delta in sorted(deltas.items()) if delta[0] or delta[1]}
+        if len(deltas) > BULK_DELTAS_FROM:
+            return self.apply_bulk_deltas(deltas)
+        for (ledger_id, day), (debit, credit) in deltas.items():
+            self.apply_delta(ledger_id, day, debit, credit)
+
+    def apply_delta(self, ledger_id, day, debit, credit):
+        values = {'debit_total': F('debit_total') + debit, 'credit_total': F('credit_total') + credit}
+        if self.filter(ledger_id=ledger_id, date=day).update(**values):
+            return
+
+        totals = AccountLog.objects.filter(date_range_filter('date', day, day), ledger_id=ledger_id).aggregate(
+            debit=Sum('debit_amount'), credit=Sum('credit_amount')
+        )
+        try:
+            with transaction.atomic():
+                self.create(
+                    ledger_id=ledger_id,
+                    date=day,
+                    debit_total=totals['debit'] or 0,
+                    credit_total=totals['credit'] or 0,
+                )
+        except IntegrityError:
+            # Another writer created the row first; apply our change on top of it
+            self.filter(ledger_id=ledger_id, date=day).update(**values)
+
+    def apply_bulk_deltas(self, deltas):
+        """
+        apply_deltas() for large batches such as imports and reposts: the
+        existing rows are locked in key order and moved by one bulk F() update,
+        and the missing ones initialised from one grouped aggregate of the logs
+        and bulk created.
+        """
+        ledger_ids = {ledger_id for ledger_id, _ in deltas}
+        days = {day for _, day in deltas}
+        with transaction.atomic():
+            rows = [
+                row for row in self.select_for_update()
+                .filter(ledger_id__in=ledger_ids, date__in=days)
+                .order_by('ledger_id', 'date')
+                if (row.ledger_id, row.date) in deltas
+            ]
+            for row in rows:
+                debit, credit = deltas[(row.ledger_id, row.date)]
+                row.debit_total = F('debit_total') + debit
+                row.credit_total = F('credit_total') + credit
+            self.bulk_update(rows, ['debit_total', 'credit_total'], batch_size=1000)
+
+            missing = deltas.keys() - {(row.ledger_id, row.date) for row in rows}
+            if not missing:
+                return
+            totals = {
+                (row['ledger_id'], row['day']): row
+                for row in AccountLog.objects.filter(
+                    date_range_filter('date', min(day for _, day in missing), max(day for _, day in missing)),
+                    ledger_id__in={ledger_id for ledger_id, _ in missing},
+                )
+                .annotate(day=TruncDate('date'))
+                .order_by()
+                .values('ledger_id', 'day')
+                .annotate(debit=Sum('debit_amount'), credit=Sum('credit_amount'))
+            }
+            try:
+                with transaction.atomic():
+                    self.bulk_create([
+                        LedgerDailyBalance(
+                            ledger_id=ledger_id,
+                            date=day,
+                            debit_total=totals.get((ledger_id, day), {}).get('debit') or 0,
+                            credit_total=totals.get((ledger_id, day), {}).get('credit') or 0,
+                        )
+                        for ledger_id, day in sorted(missing)
+                    ], batch_size=1000)
+            except IntegrityError:
+                # Another writer created some of the rows first; fall back to one day at a time
+                for key in sorted(missing):
+                    self.apply_delta(*key, *deltas[key])
+
+    def rebuild(self, ledger_ids):
+        """Recompute the daily rows of `ledger_ids` from their logs."""
+        days = (
+            AccountLog.objects.filter(ledger_id__in=ledger_ids, date__isnull=False)
+            .annotate(day=TruncDate('date'))
+            .order_by()
+            .values('ledger_id', 'day')
+            .annotate(debit=Sum('debit_amount'), credit=Sum('credit_amount'))
+        )
+        with transaction.atomic():
+            self.filter(ledger_id__in=ledger_ids).delete()
+            self.bulk_create([
+                LedgerDailyBalance(
+                    ledger_id=row['ledger_id'],
+                    date=row['day'],
+                    debit_total=row['debit'] or 0,
+                    credit_total=row['credit'] or 0,
+                )
+                for row in days
+            ], batch_size=2000)
+
+
+class LedgerDailyBalance(models.Model):
+    """
+    Debit and credit totals of the live AccountLog rows per ledger and local
+    day, kept up to date by every log save and queryset delete. Reports sum
+    these days instead of the individual logs.
+    """
+
+    ledger = models.ForeignKey(LedgerAccount, on_delete=models.CASCADE, related_name='daily_balances')
+    date = models.DateField()
+    debit_total = models.DecimalField(default=0, max_digits=20, decimal_places=2)
+    credit_total = models.DecimalField(default=0, max_digits=20, decimal_places=2)
+
+    objects = LedgerDailyBalanceManager()
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['ledger', 'date'], name='ledger_daily_balance_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'ledger'], name='ledger_daily_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ledger_id} | {self.date} | Dr {self.debit_total} Cr {self.credit_total}"
+
+
+class FiscalPeriodManager(models.Manager):
+    def closed_through(self):
+        """Last day of the latest closed period, or None."""
+        return self.filter(closed_at__isnull=False).aggregate(latest=Max('end_date'))['latest']
+
+    def check_open(self, dates):
+        """Raise ValidationError if any of the log `dates` falls in a closed period."""
+        dates = [timezone.localdate(value) for value in dates if value is not None]
+        if not dates:
+            return
+        closed_through = self.closed_through()
+        if closed_through and min(dates) <= closed_through:
+            raise ValidationError(
+                f"Postings dated on or before {closed_through:%d-%m-%Y} are locked by a closed fiscal period."
+            )
+
+
+class FiscalPeriod(models.Model):
+    """
+    An accounting period. Closing it stores every ledger's balances in
+    LedgerPeriodBalance and locks the AccountLog rows dated in it.
+    """
+
+    name = models.CharField(max_length=100)
+    start_date = models.DateField()
+    end_date = models.DateField(unique=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = FiscalPeriodManager()
+
+    class Meta:
+        ordering = ['-end_date']
+
+    def __str__(self):
+        return f"{self.name} ({self.start_date:%d-%m-%Y} to {self.end_date:%d-%m-%Y})"
+
+    def clean(self):
+        if self.start_date and self.end_date and self.start_date > self.end_date:
+            raise ValidationError('Start date must be on or before the end date.')
+
+
+class LedgerPeriodBalance(models.Model):
+    """
+    A ledger's debit and credit totals in a closed period and its balance
+    (debit minus credit) at the end of it, since the first posting.
+    """
+
+    period = models.ForeignKey(FiscalPeriod, on_delete=models.CASCADE, related_name='ledger_balances')
+    ledger = models.ForeignKey(LedgerAccount, on_delete=models.CASCADE, related_name='period_balances')
+    debit_total = models.DecimalField(default=0, max_digits=20, decimal_places=2)
+    credit_total = models.DecimalField(default=0, max_digits=20, decimal_places=2)
+    closing_balance = models.DecimalField(default=0, max_digits=20, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'ledger'], name='ledger_period_balance_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.ledger_id} | {self.period_id} | {self.closing_balance}"
+
+
+class AccountPosting(models.Model):
+    """
+    Outbox row for the AccountLog postings of one saved document. The signal
+    writes it in the document's transaction and a worker applies it; the
+    (document_type, document_id, version) key makes both steps idempotent.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('Pending')
+        APPLIED = 'applied', _('Applied')
+        SUPERSEDED = 'superseded', _('Superseded')
+        FAILED = 'failed', _('Failed')
+
+    document_type = models.CharField(max_length=50)
+    document_id = models.PositiveBigIntegerField()
+    version = models.PositiveIntegerField()
+    payload = models.JSONField()
+
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    applied_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['document_type', 'document_id', 'version'], name='account_posting_idempotency_key'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'id'], name='account_posting_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.document_type} #{self.document_id} v{self.version} | {self.status}"
@@ -1,85 +1,27 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from accounts.models import AccountLog
-from accounts.models import PaymentVoucher, ReceiptVoucher
-from django.utils.timezone import now
+from accounts.models import Group, LedgerAccount, PaymentVoucher, ReceiptVoucher, SubLedgerAccount
+from accounts.utils import posting_cache
+from accounts.utils.account_posting import enqueue_account_posting
 
-@receiver(post_save, sender=PaymentVoucher)
-def create_or_update_account_logs_for_sale(sender, instance, created, **kwargs):
-    expense_ledger = instance.expense_ledger
-    payment_ledger = instance.payment_ledger
-    reference_no = instance.invoice_no
-    amount = instance.amount
-    sub_ledger = instance.sub_ledger
 
-    # Handle Customer Ledger (DEBIT)
-    customer_log, _ = AccountLog.objects.update_or_create(
-        reference_no=reference_no,
-        log_type='payment_voucher',
-        ledger=expense_ledger,
-        defaults={
-            'date': now(),
-            'sub_ledger': sub_ledger,
-            'debit_amount': amount,
-            'credit_amount': 0,
-            'details': f'Payment Voucher for: {expense_ledger.name}',
-        }
-    )
-    # Handle Payment Ledger (CREDIT)
-    payment_log, _ = AccountLog.objects.update_or_create(
-        reference_no=reference_no,
-        log_type='payment_voucher',
-        ledger=payment_ledger,
-        defaults={
-            'date': now(),
-            'sub_ledger': sub_ledger,
-            'debit_amount': 0,
-            'credit_amount': amount,
-            'details': f'Payment Voucher for: {expense_ledger.name}',
-        }
-    )
+@receiver(post_save, sender=PaymentVoucher)
+@receiver(post_save, sender=ReceiptVoucher)
+def queue_account_logs_for_voucher(sender, instance, created, **kwargs):
+    # The worker writes the debit/credit logs, or removes them once the voucher is deleted
+    enqueue_account_posting(instance)
 
-    # Handle delete functionality
-    if instance.deleted_at:
-        AccountLog.objects.filter(reference_no=instance.invoice_no, log_type='payment_voucher').delete()
 
+@receiver([post_save, post_delete], sender=LedgerAccount)
+def clear_cached_ledgers(sender, instance, **kwargs):
+    posting_cache.ledgers.clear()
 
-@receiver(post_save, sender=ReceiptVoucher)
-def create_or_update_account_logs_for_receipt_voucher(sender, instance, created, **kwargs):
-    income_ledger = instance.income_ledger
-    receipt_ledger = instance.receipt_ledger
-    reference_no = instance.invoice_no
-    amount = instance.amount
-    sub_ledger = instance.sub_ledger
 
-    # Handle Income Ledger (CREDIT)
-    income_log, _ = AccountLog.objects.update_or_create(
-        reference_no=reference_no,
-        log_type='receipt_voucher',
-        ledger=income_ledger,
-        defaults={
-            'date': now(),
-            'sub_ledger': sub_ledger,
-            'debit_amount': 0,
-            'credit_amount': amount,
-            'details': f'Receipt Voucher for: {income_ledger.name}',
-        }
-    )
-    # Handle Receipt Ledger (DEBIT)
-    receipt_log, _ = AccountLog.objects.update_or_create(
-        reference_no=reference_no,
-        log_type='receipt_voucher',
-        ledger=receipt_ledger,
-        defaults={
-            'date': now(),
-            'sub_ledger': sub_ledger,
-            'debit_amount': amount,
-            'credit_amount': 0,
-            'details': f'Receipt Voucher for: {income_ledger.name}',
-        }
-    )
+@receiver([post_save, post_delete], sender=SubLedgerAccount)
+def clear_cached_sub_ledgers(sender, instance, **kwargs):
+    posting_cache.sub_ledgers.clear()
 
-    # Handle delete functionality
-    if instance.deleted_at:
-        AccountLog.objects.filter(reference_no=instance.invoice_no, log_type='receipt_voucher').delete()
 
+@receiver([post_save, post_delete], sender=Group)
+def clear_cached_groups(sender, instance, **kwargs):
+    posting_cache.groups.clear()
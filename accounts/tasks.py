@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from accounts.utils.account_posting import apply_pending_postings
+
+
+@shared_task
+def apply_account_postings():
+    # Woken after each document save and run periodically to drain any backlog
+    return apply_pending_postings()
@@ -1,3 +1,552 @@
-from django.test import TestCase
+import multiprocessing
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import (
+    AccountLog, AccountPosting, FiscalPeriod, Group, GroupClosure, LedgerAccount, LedgerDailyBalance,
+    LedgerPeriodBalance, PaymentVoucher, PrimaryGroup,
+)
+from accounts.utils import posting_cache
+from accounts.utils.balance_sheet import get_balance_sheet
+from accounts.utils.financial_statements import get_profit_and_loss, get_trial_balance
+from accounts.utils.ledger_repost import repost_ledgers
+from accounts.utils.ledger_statement import get_ledger_statement, iter_statement_lines
+from accounts.utils.period_close import check_document_dates, close_fiscal_period, reopen_fiscal_period
+from accounts.utils.voucher_import import import_vouchers
+from accounts.utils.account_posting import apply_pending_postings
+from authentication.models import Customer, User
+from commons.utils import start_of_day
+from sales.forms.sales import SaleForm
+from sales.models import Sale
+from utils.base_model import soft_delete_related_objects
+
+
+class AccountPostingTests(TestCase):
+    def setUp(self):
+        # Cached rows from another test were rolled back with it
+        posting_cache.clear_all()
+        primary = PrimaryGroup.objects.create(name='Assets')
+        group = Group.objects.create(name='Cash In Hand', head_primarygroup=primary)
+        self.cash = LedgerAccount.objects.create(name='Cash', head_group=group)
+        self.customer = Customer.objects.create(name='Walk In', phone='01700000000')
+
+    def logs(self):
+        return sorted(AccountLog.objects.values_list('log_type', 'debit_amount', 'credit_amount'))
+
+    def test_save_only_queues_and_the_worker_posts(self):
+        sale = Sale.objects.create(
+            customer=self.customer, invoice_number='SO-1', sale_date=date.today(),
+            total=100, paid=40, payment_ledger=self.cash,
+        )
+        self.assertFalse(AccountLog.objects.exists())
+
+        apply_pending_postings()
+        self.assertEqual(self.logs(), [('sale_customer', 0, 100), ('sale_payment', 40, 0)])
+
+        sale.paid = 0
+        sale.total = 120
+        sale.save()
+        apply_pending_postings()
+        self.assertEqual(self.logs(), [('sale_customer', 0, 120)])
+        self.assertEqual(
+            list(AccountPosting.objects.order_by('version').values_list('version', 'status')),
+            [(1, AccountPosting.Status.APPLIED), (2, AccountPosting.Status.APPLIED)],
+        )
+
+    def test_replaying_postings_is_idempotent(self):
+        sale = Sale.objects.create(
+            customer=self.customer, invoice_number='SO-2', sale_date=date.today(), total=50,
+        )
+        sale.total = 70
+        sale.save()
+        apply_pending_postings()
+        # Only the newest version of the document is applied
+        self.assertEqual(
+            list(AccountPosting.objects.order_by('version').values_list('status', flat=True)),
+            [AccountPosting.Status.SUPERSEDED, AccountPosting.Status.APPLIED],
+        )
+
+        AccountPosting.objects.update(status=AccountPosting.Status.PENDING)
+        apply_pending_postings()
+        self.assertEqual(self.logs(), [('sale_customer', 0, 70)])
+
+    def test_logs_are_dated_on_the_document_date(self):
+        sale = Sale.objects.create(
+            customer=self.customer, invoice_number='SO-3', sale_date=date.today() - timedelta(days=5), total=50,
+        )
+        apply_pending_postings()
+        self.assertEqual(set(AccountLog.objects.values_list('date', flat=True)), {start_of_day(sale.sale_date)})
+
+        # A later edit keeps the document date rather than its own save time
+        sale.total = 60
+        sale.save()
+        apply_pending_postings()
+        self.assertEqual(set(AccountLog.objects.values_list('date', flat=True)), {start_of_day(sale.sale_date)})
+
+        sale.sale_date = date.today()
+        sale.save()
+        apply_pending_postings()
+        self.assertEqual(set(AccountLog.objects.values_list('date', flat=True)), {start_of_day(date.today())})
+
+
+
+def save_sale(sale_id, results):
+    try:
+        with transaction.atomic():
+            sale = Sale.objects.get(pk=sale_id)
+            sale.total += 1
+            sale.save()
+        results.put('saved')
+    except Exception as error:
+        results.put(repr(error))
+    finally:
+        connections.close_all()
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Needs a database with row-level locks")
+class ConcurrentPostingTests(TransactionTestCase):
+    saves = 20
+
+    def test_parallel_saves_get_consecutive_versions(self):
+        customer = Customer.objects.create(name='Walk In', phone='01700000000')
+        sale = Sale.objects.create(customer=customer, invoice_number='SO-1', sale_date=date.today(), total=0)
+
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [context.Process(target=save_sale, args=(sale.pk, results)) for _ in range(self.saves)]
+        for worker in workers:
+            worker.start()
+        outcomes = [results.get(timeout=60) for _ in workers]
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(outcomes, ['saved'] * self.saves)
+        self.assertEqual(
+            list(AccountPosting.objects.order_by('version').values_list('version', flat=True)),
+            list(range(1, self.saves + 2)),
+        )
+
+class PostingCacheTests(TestCase):
+    def setUp(self):
+        posting_cache.clear_all()
+        self.customer = Customer.objects.create(name='Walk In', phone='01700000000')
+
+    def test_party_ledger_is_cached_until_a_ledger_changes(self):
+        ledger = posting_cache.get_party_ledger(self.customer.pk, 'customer')
+        self.assertEqual(ledger.name, 'Walk In')
+        with self.assertNumQueries(0):
+            posting_cache.get_party_ledger(self.customer.pk, 'customer')
+        # A supplier with the same id is a different ledger
+        self.assertIsNone(posting_cache.get_party_ledger(self.customer.pk, 'supplier'))
+
+        self.customer.name = 'Regular'
+        self.customer.save()
+        self.assertEqual(posting_cache.get_party_ledger(self.customer.pk, 'customer').name, 'Regular')
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = posting_cache.LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIs(cache.get('b'), posting_cache.MISSING)
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+
+
+class LedgerDailyBalanceTests(TestCase):
+    def setUp(self):
+        # Soft deletes queue a Celery task; run it inline instead of needing a broker
+        patcher = mock.patch.object(soft_delete_related_objects, 'delay', side_effect=soft_delete_related_objects)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        primary = PrimaryGroup.objects.create(name='Assets')
+        group = Group.objects.create(name='Cash In Hand', head_primarygroup=primary)
+        self.cash = LedgerAccount.objects.create(name='Cash', head_group=group)
+        self.bank = LedgerAccount.objects.create(name='Bank', head_group=group)
+
+    def days(self):
+        return sorted(
+            (row.ledger_id, row.date, row.debit_total, row.credit_total)
+            for row in LedgerDailyBalance.objects.all()
+            if row.debit_total or row.credit_total
+        )
+
+    def test_rollup_follows_log_changes_and_matches_a_rebuild(self):
+        now = timezone.now()
+        first = AccountLog.objects.create(ledger=self.cash, date=now, debit_amount=100, credit_amount=0)
+        second = AccountLog.objects.create(ledger=self.cash, date=now, debit_amount=0, credit_amount=30)
+        AccountLog.objects.create(ledger=self.bank, date=now - timedelta(days=1), debit_amount=5, credit_amount=0)
+        self.assertEqual(self.days(), sorted([
+            (self.cash.pk, timezone.localdate(now), 100, 30),
+            (self.bank.pk, timezone.localdate(now - timedelta(days=1)), 5, 0),
+        ]))
+
+        first = AccountLog.objects.get(pk=first.pk)
+        first.ledger = self.bank
+        first.debit_amount = 60
+        first.save()
+        second.delete()
+        AccountLog.objects.filter(ledger=self.bank, debit_amount=5).delete()
+        incremental = self.days()
+        self.assertEqual(incremental, [(self.bank.pk, timezone.localdate(now), 60, 0)])
+
+        LedgerDailyBalance.objects.rebuild([self.cash.pk, self.bank.pk])
+        self.assertEqual(self.days(), incremental)
+
+
+class BalanceSheetTests(TestCase):
+    def test_nested_groups_roll_up_to_their_primary_group(self):
+        assets = PrimaryGroup.objects.create(name='Assets')
+        current = Group.objects.create(name='Current Assets', head_primarygroup=assets)
+        bank = Group.objects.create(name='Bank Accounts', head_group=current)
+        deposits = Group.objects.create(name='Deposits', head_group=bank)
+        cash = LedgerAccount.objects.create(name='Cash', head_group=current)
+        fdr = LedgerAccount.objects.create(name='Fdr One', head_group=deposits)
+
+        now = timezone.now()
+        AccountLog.objects.create(ledger=cash, date=now, debit_amount=100, credit_amount=30)
+        AccountLog.objects.create(ledger=fdr, date=now, debit_amount=500, credit_amount=0)
+        # Outside the period
+        AccountLog.objects.create(ledger=fdr, date=now - timedelta(days=40), debit_amount=999, credit_amount=0)
+
+        today = timezone.localdate()
+        sheet = get_balance_sheet(today - timedelta(days=7), today)
+        self.assertEqual(
+            [(row['kind'], row['name'], row['depth'], row['amount']) for row in sheet['assets']],
+            [
+                ('group', 'Current Assets', 0, 570),
+                ('group', 'Bank Accounts', 1, 500),
+                ('group', 'Deposits', 2, 500),
+                ('ledger', 'Fdr One', 3, 500),
+                ('ledger', 'Cash', 1, 70),
+            ],
+        )
+        self.assertEqual(sheet['total_assets'], 570)
+        self.assertEqual(sheet['liabilities'], [])
+
+
+class GroupClosureTests(TestCase):
+    def setUp(self):
+        self.assets = PrimaryGroup.objects.create(name='Assets')
+        self.current = Group.objects.create(name='Current Assets', head_primarygroup=self.assets)
+        self.bank = Group.objects.create(name='Bank Accounts', head_group=self.current)
+        self.deposits = Group.objects.create(name='Deposits', head_group=self.bank)
+        self.fixed = Group.objects.create(name='Fixed Assets', head_primarygroup=self.assets)
+
+    def links(self):
+        return sorted(GroupClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+    def test_moving_a_group_relinks_its_subtree(self):
+        fdr = LedgerAccount.objects.create(name='Fdr One', head_group=self.deposits)
+        self.assertEqual(
+            set(GroupClosure.objects.descendants_of(self.current)), {self.current, self.bank, self.deposits}
+        )
+        self.assertEqual(list(GroupClosure.objects.ledgers_under(self.current)), [fdr])
+
+        self.bank.head_group = self.fixed
+        self.bank.save()
+        self.assertEqual(list(GroupClosure.objects.ledgers_under(self.current)), [])
+        self.assertEqual(list(GroupClosure.objects.ledgers_under(self.fixed)), [fdr])
+        self.assertEqual(list(GroupClosure.objects.ledgers_under(self.assets)), [fdr])
+
+        incremental = self.links()
+        GroupClosure.objects.rebuild()
+        self.assertEqual(self.links(), incremental)
+
+    def test_group_cannot_move_under_its_own_subtree(self):
+        self.current.head_primarygroup = None
+        self.current.head_group = self.deposits
+        with self.assertRaises(ValidationError):
+            self.current.save()
+
+
+class LedgerStatementTests(TestCase):
+    def test_pages_carry_the_running_balance_forward(self):
+        primary = PrimaryGroup.objects.create(name='Assets')
+        group = Group.objects.create(name='Cash In Hand', head_primarygroup=primary)
+        cash = LedgerAccount.objects.create(name='Cash', head_group=group)
+        now = timezone.now()
+        # Before the period, so only in the opening balance
+        AccountLog.objects.create(ledger=cash, date=now - timedelta(days=10), debit_amount=50, credit_amount=0)
+        for amount in (100, 20, 5):
+            AccountLog.objects.create(ledger=cash, date=now, debit_amount=amount, credit_amount=0)
+        AccountLog.objects.create(ledger=cash, date=now, debit_amount=0, credit_amount=40)
+
+        today = timezone.localdate()
+        first = get_ledger_statement(cash, today, today, page_size=3)
+        self.assertEqual(first['opening_balance'], 50)
+        self.assertEqual([line['balance'] for line in first['lines']], [150, 170, 175])
+
+        second = get_ledger_statement(cash, today, today, after=first['next_cursor'], page_size=3)
+        self.assertEqual(second['page_opening_balance'], 175)
+        self.assertEqual([line['balance'] for line in second['lines']], [135])
+        self.assertIsNone(second['next_cursor'])
+        self.assertEqual(second['closing_balance'], 135)
+        self.assertEqual(
+            [line['balance'] for line in iter_statement_lines(cash, today, today, chunk_size=2)], [150, 170, 175, 135]
+        )
+
+
+class FinancialStatementTests(TestCase):
+    def test_profit_and_loss_compares_periods(self):
+        incomes = PrimaryGroup.objects.create(name='Incomes')
+        expenses = PrimaryGroup.objects.create(name='Expenses')
+        sales = LedgerAccount.objects.create(
+            name='Sales', head_group=Group.objects.create(name='Sales Income', head_primarygroup=incomes)
+        )
+        direct = Group.objects.create(name='Direct Expenses', head_primarygroup=expenses)
+        rent = LedgerAccount.objects.create(
+            name='Rent', head_group=Group.objects.create(name='Premises', head_group=direct)
+        )
+
+        today = timezone.localdate()
+        now = timezone.now()
+        AccountLog.objects.create(ledger=sales, date=now, debit_amount=0, credit_amount=300)
+        AccountLog.objects.create(ledger=rent, date=now, debit_amount=100, credit_amount=0)
+        # Falls in the prior week
+        AccountLog.objects.create(ledger=sales, date=now - timedelta(days=7), debit_amount=0, credit_amount=50)
+
+        with self.assertNumQueries(1):
+            report = get_profit_and_loss(today - timedelta(days=6), today)
+        self.assertEqual(report['net_profit']['current'], 200)
+        self.assertEqual(report['net_profit']['prior'], 50)
+        self.assertEqual(
+            [(row['name'], row['depth'], row['current']) for row in report['expenses']],
+            [('Direct Expenses', 0, 100), ('Premises', 1, 100), ('Rent', 2, 100)],
+        )
+
+        trial_balance = get_trial_balance(today - timedelta(days=6), today)
+        self.assertEqual(trial_balance['totals']['opening'], {'debit': 0, 'credit': 50})
+        self.assertEqual(trial_balance['totals']['movement'], {'debit': 100, 'credit': 300})
+        self.assertEqual(trial_balance['totals']['closing'], {'debit': 100, 'credit': 350})
+
+    def test_trial_balance_starts_from_the_last_closed_period(self):
+        primary = PrimaryGroup.objects.create(name='Assets')
+        cash = LedgerAccount.objects.create(
+            name='Cash', head_group=Group.objects.create(name='Cash In Hand', head_primarygroup=primary)
+        )
+        today = timezone.localdate()
+        now = timezone.now()
+        AccountLog.objects.create(ledger=cash, date=now - timedelta(days=40), debit_amount=70, credit_amount=0)
+        AccountLog.objects.create(ledger=cash, date=now - timedelta(days=10), debit_amount=0, credit_amount=20)
+        AccountLog.objects.create(ledger=cash, date=now - timedelta(days=2), debit_amount=15, credit_amount=0)
+        AccountLog.objects.create(ledger=cash, date=now, debit_amount=5, credit_amount=0)
+        close_fiscal_period(FiscalPeriod.objects.create(
+            name='First', start_date=today - timedelta(days=30), end_date=today - timedelta(days=5)
+        ))
+        # Days up to the close are read from the stored balances only
+        LedgerDailyBalance.objects.filter(date__lte=today - timedelta(days=5)).delete()
+
+        report = get_trial_balance(today - timedelta(days=1), today)
+        cash_row = next(row for row in report['sections'][0]['rows'] if row['kind'] == 'ledger')
+        self.assertEqual(
+            (cash_row['opening'], cash_row['movement'], cash_row['closing']),
+            ({'debit': 65, 'credit': 0}, {'debit': 5, 'credit': 0}, {'debit': 70, 'credit': 0}),
+        )
+
+
+class FiscalPeriodCloseTests(TestCase):
+    def setUp(self):
+        primary = PrimaryGroup.objects.create(name='Assets')
+        group = Group.objects.create(name='Cash In Hand', head_primarygroup=primary)
+        self.cash = LedgerAccount.objects.create(name='Cash', head_group=group)
+        self.today = timezone.localdate()
+        self.now = timezone.now()
+
+    def test_closing_stores_balances_and_locks_the_period(self):
+        old = AccountLog.objects.create(
+            ledger=self.cash, date=self.now - timedelta(days=40), debit_amount=70, credit_amount=0
+        )
+        AccountLog.objects.create(ledger=self.cash, date=self.now - timedelta(days=10), debit_amount=0, credit_amount=20)
+        first = FiscalPeriod.objects.create(
+            name='First', start_date=self.today - timedelta(days=30), end_date=self.today - timedelta(days=5)
+        )
+        second = FiscalPeriod.objects.create(
+            name='Second', start_date=self.today - timedelta(days=4), end_date=self.today + timedelta(days=10)
+        )
+        with self.assertRaises(ValidationError):
+            close_fiscal_period(second)
+
+        self.assertEqual(close_fiscal_period(first), 1)
+        stored = LedgerPeriodBalance.objects.get(period=first, ledger=self.cash)
+        self.assertEqual((stored.debit_total, stored.credit_total, stored.closing_balance), (0, 20, 50))
+
+        old.debit_amount = 80
+        with self.assertRaises(ValidationError):
+            old.save()
+        with self.assertRaises(ValidationError):
+            AccountLog.objects.filter(pk=old.pk).delete()
+
+        AccountLog.objects.create(ledger=self.cash, date=self.now, debit_amount=5, credit_amount=0)
+        statement = get_ledger_statement(self.cash, self.today, self.today)
+        self.assertEqual(statement['opening_balance'], 50)
+        self.assertEqual(statement['closing_balance'], 55)
+
+        reopen_fiscal_period(first)
+        old.save()
+        self.assertFalse(LedgerPeriodBalance.objects.exists())
+
+    def test_documents_dated_in_a_closed_period_are_refused(self):
+        customer = Customer.objects.create(name='Walk In', phone='01700000000')
+        closed_day = self.today - timedelta(days=10)
+        sale = Sale.objects.create(customer=customer, invoice_number='SO-1', sale_date=closed_day, total=10)
+        close_fiscal_period(FiscalPeriod.objects.create(
+            name='First', start_date=self.today - timedelta(days=30), end_date=self.today - timedelta(days=5)
+        ))
+
+        def form(instance=None, sale_date=self.today, invoice_number='SO-2'):
+            return SaleForm(instance=instance, data={
+                'customer': customer.pk, 'invoice_number': invoice_number, 'sale_date': f"{sale_date:%d-%m-%Y}",
+                'discount': 0, 'paid': 0, 'due': 0, 'tax': 0, 'status': Sale.Status.DRAFT,
+            })
+
+        self.assertTrue(form().is_valid())
+        new_in_closed = form(sale_date=closed_day)
+        self.assertFalse(new_in_closed.is_valid())
+        self.assertIn('sale_date', new_in_closed.errors)
+        # Moving a sale out of the closed period would still change its postings there
+        moved_out = form(instance=sale, invoice_number='SO-1')
+        self.assertFalse(moved_out.is_valid())
+        self.assertIn('sale_date', moved_out.errors)
+        with self.assertRaises(ValidationError):
+            check_document_dates(sale.sale_date)
+
+
+class VoucherImportTests(TestCase):
+    def setUp(self):
+        posting_cache.clear_all()
+        primary = PrimaryGroup.objects.create(name='Assets')
+        group = Group.objects.create(name='Cash In Hand', head_primarygroup=primary)
+        self.bank = LedgerAccount.objects.create(name='City Bank', head_group=group)
+        self.rent = LedgerAccount.objects.create(name='Rent', head_group=group)
+        self.expenses = LedgerAccount.objects.create(name='Expenses', head_group=group)
+
+    def upload(self, text):
+        return SimpleUploadedFile('vouchers.csv', text.encode())
+
+    def test_sheet_is_posted_like_the_worker_would(self):
+        today = timezone.localdate()
+        sheet = (
+            "Date,Ledger,Account,Amount,Details\n"
+            f"{today:%d-%m-%Y},city bank,Rent,1200,October rent\n"
+            f"{today:%d-%m-%Y},City Bank,,\"1,000.50\",Bank charges\n"
+        )
+        vouchers = import_vouchers(self.upload(sheet), 'payment')
+        self.assertEqual([voucher.invoice_no for voucher in vouchers], [f'PV-{today.year}-00001', f'PV-{today.year}-00002'])
+        self.assertEqual(
+            sorted(AccountLog.objects.values_list('ledger__name', 'debit_amount', 'credit_amount')),
+            [('City Bank', 0, Decimal('1000.50')), ('City Bank', 0, 1200), ('Expenses', Decimal('1000.50'), 0), ('Rent', 1200, 0)],
+        )
+        self.assertEqual(
+            LedgerDailyBalance.objects.get(ledger=self.bank, date=today).credit_total, Decimal('2200.50')
+        )
+
+        # A later edit goes through the outbox and updates the imported logs in place
+        voucher = PaymentVoucher.objects.get(pk=vouchers[0].pk)
+        voucher.amount = 1300
+        voucher.save()
+        apply_pending_postings()
+        self.assertEqual(AccountLog.objects.count(), 4)
+        self.assertEqual(AccountLog.objects.get(ledger=self.rent).debit_amount, 1300)
+
+    def test_one_bad_line_rejects_the_sheet(self):
+        sheet = "Date,Ledger,Amount\n01-10-2026,City Bank,100\n01-10-2026,Unknown Bank,50\n"
+        with self.assertRaises(ValidationError) as raised:
+            import_vouchers(self.upload(sheet), 'payment')
+        self.assertEqual(raised.exception.messages, ["Line 3: unknown ledger 'Unknown Bank'"])
+        self.assertFalse(PaymentVoucher.objects.exists())
+
+    def test_only_csv_and_xlsx_files_are_read(self):
+        with self.assertRaises(ValidationError):
+            import_vouchers(SimpleUploadedFile('vouchers.xls', b"Date,Ledger,Amount\n"), 'payment')
+
+    def test_vouchers_entered_by_hand_continue_the_imported_numbers(self):
+        today = timezone.localdate()
+        import_vouchers(self.upload(f"Date,Ledger,Amount\n{today:%d-%m-%Y},City Bank,100\n"), 'payment')
+        self.client.force_login(User.objects.create_user(username='clerk', password='x', email='clerk@example.com'))
+
+        response = self.client.post(reverse('paymentvoucher_create'), {
+            'date': f"{today:%d-%m-%Y}", 'payment_ledger': self.bank.pk, 'amount': 50,
+        })
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            sorted(PaymentVoucher.objects.values_list('invoice_no', flat=True)),
+            [f'PV-{today.year}-00001', f'PV-{today.year}-00002'],
+        )
+
+
+class LedgerRepostTests(TestCase):
+    def setUp(self):
+        posting_cache.clear_all()
+        primary = PrimaryGroup.objects.create(name='Assets')
+        group = Group.objects.create(name='Cash In Hand', head_primarygroup=primary)
+        self.cash = LedgerAccount.objects.create(name='Cash', head_group=group)
+        self.customer = Customer.objects.create(name='Walk In', phone='01700000000')
+        self.today = timezone.localdate()
+        for number in (1, 2, 3):
+            Sale.objects.create(
+                customer=self.customer, invoice_number=f'SO-{number}', sale_date=self.today,
+                total=100 * number, paid=10 * number, payment_ledger=self.cash,
+            )
+        apply_pending_postings()
+
+    def logs(self):
+        return sorted(AccountLog.objects.values_list('reference_no', 'log_type', 'debit_amount', 'credit_amount'))
+
+    def daily_totals(self):
+        return sorted(LedgerDailyBalance.objects.values_list('ledger_id', 'date', 'debit_total', 'credit_total'))
+
+    def test_drifted_logs_are_reconciled_with_the_documents(self):
+        posted = self.logs()
+        # Drift the way misfired signals leave it: an edit that never posted, a
+        # lost log, a duplicate and a log of a document that is gone
+        Sale.objects.filter(invoice_number='SO-1').update(total=150)
+        AccountLog.objects.filter(reference_no='SO-2', log_type='sale_payment').delete()
+        AccountLog.objects.create(
+            reference_no='SO-3', log_type='sale_payment', ledger=self.cash, date=timezone.now(), debit_amount=30,
+        )
+        AccountLog.objects.create(
+            reference_no='SO-9', log_type='sale_customer', ledger=self.cash, date=timezone.now(), credit_amount=90,
+        )
+
+        totals, skipped = repost_ledgers(self.today, self.today, chunk_size=2)
+        self.assertEqual(skipped, [])
+        self.assertEqual(dict(totals['sales.sale']), {'created': 1, 'updated': 1, 'deleted': 2})
+        expected = [log for log in posted if log[:2] != ('SO-1', 'sale_customer')] + [('SO-1', 'sale_customer', 0, 150)]
+        self.assertEqual(self.logs(), sorted(expected))
+
+        # The rollup moved with the bulk writes
+        daily = self.daily_totals()
+        LedgerDailyBalance.objects.rebuild(LedgerAccount.objects.values_list('pk', flat=True))
+        self.assertEqual(daily, self.daily_totals())
+
+        totals, _ = repost_ledgers(self.today, self.today)
+        self.assertFalse(any(sum(counts.values()) for counts in totals.values()))
+
+    def test_redated_documents_move_their_logs(self):
+        yesterday = self.today - timedelta(days=1)
+        Sale.objects.filter(invoice_number='SO-1').update(sale_date=yesterday)
+
+        totals, _ = repost_ledgers(yesterday, self.today)
+        self.assertEqual(dict(totals['sales.sale']), {'created': 0, 'updated': 2, 'deleted': 0})
+        self.assertEqual(
+            set(AccountLog.objects.filter(reference_no='SO-1').values_list('date', flat=True)), {start_of_day(yesterday)}
+        )
+        daily = self.daily_totals()
+        LedgerDailyBalance.objects.rebuild(LedgerAccount.objects.values_list('pk', flat=True))
+        self.assertEqual(daily, self.daily_totals())
+
+    def test_deleting_a_document_removes_its_logs(self):
+        Sale.objects.get(invoice_number='SO-1').delete(soft=False)
+        self.assertEqual({log[0] for log in self.logs()}, {'SO-2', 'SO-3'})
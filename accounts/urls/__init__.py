@@ -6,6 +6,9 @@ from .subledgeraccount import urlpatterns as subledgeraccount_patterns
 from .paymentvoucher import urlpatterns as paymentvoucher_patterns
 from .receiptvoucher import urlpatterns as receiptvoucher_patterns
 from .balance_sheet import urlpatterns as balance_sheet_patterns
+from .ledger_statement import urlpatterns as ledger_statement_patterns
+from .financial_statements import urlpatterns as financial_statements_patterns
+from .voucher_import import urlpatterns as voucher_import_patterns
 
 urlpatterns = [
     *bank_patterns,
@@ -16,4 +19,7 @@ urlpatterns = [
     *paymentvoucher_patterns,
     *receiptvoucher_patterns,
     *balance_sheet_patterns,
+    *ledger_statement_patterns,
+    *financial_statements_patterns,
+    *voucher_import_patterns,
 ]
\ No newline at end of file
@@ -0,0 +1,7 @@
+from django.urls import path
+from accounts.views.financial_statements import profit_loss_report, trial_balance_report
+
+urlpatterns = [
+    path('trial-balance/', trial_balance_report, name='trial_balance_list'),
+    path('profit-loss/', profit_loss_report, name='profit_loss_list'),
+]
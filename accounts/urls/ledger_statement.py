@@ -0,0 +1,6 @@
+from django.urls import path
+from accounts.views.ledger_statement import ledger_statement
+
+urlpatterns = [
+    path('ledgeraccounts/<int:pk>/statement/', ledger_statement, name='ledger_statement'),
+]
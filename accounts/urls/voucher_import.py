@@ -0,0 +1,6 @@
+from django.urls import path
+from accounts.views.voucher_import import VoucherImportView
+
+urlpatterns = [
+    path('vouchers/import/', VoucherImportView.as_view(), name='voucher_import'),
+]
@@ -0,0 +1,308 @@
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+
+from accounts.models import AccountLog, AccountPosting
+from accounts.utils.posting_cache import get_ledger, get_party_ledger, get_sub_ledger
+from commons.utils import start_of_day
+
+MAX_ATTEMPTS = 5
+
+# How sales, purchases and their returns post, keyed by model label. The party
+# ledger carries the document total, the payment ledger what was paid/refunded.
+TRADE_POSTINGS = {
+    'sales.sale': {
+        'date_field': 'sale_date',
+        'number_field': 'invoice_number',
+        'party_field': 'customer_id',
+        'party_type': 'customer',
+        'settled_field': 'paid',
+        'sub_ledger': 'Sale',
+        'party_log': ('sale_customer', 'credit', 'Sale to customer: {party}'),
+        'payment_log': ('sale_payment', 'debit', 'Payment received for sale: {party}'),
+    },
+    'purchase.purchase': {
+        'date_field': 'purchase_date',
+        'number_field': 'invoice_number',
+        'party_field': 'supplier_id',
+        'party_type': 'supplier',
+        'settled_field': 'paid',
+        'sub_ledger': 'Purchase',
+        'party_log': ('purchase_supplier', 'debit', 'Purchase from supplier: {party}'),
+        'payment_log': ('purchase_payment', 'credit', 'Payment made for purchase: {party}'),
+    },
+    'purchase_return.purchasereturn': {
+        'date_field': 'return_date',
+        'number_field': 'return_number',
+        'party_field': 'supplier_id',
+        'party_type': 'supplier',
+        'settled_field': 'refunded',
+        'sub_ledger': 'Purchase Return',
+        'party_log': ('purchase_return_supplier', 'debit', 'Purchase return to supplier: {party}'),
+        'payment_log': ('purchase_return_payment', 'credit', 'Refund processed for return: {party}'),
+    },
+    'sales_return.salereturn': {
+        'date_field': 'return_date',
+        'number_field': 'return_number',
+        'party_field': 'customer_id',
+        'party_type': 'customer',
+        'settled_field': 'refunded',
+        'sub_ledger': 'Sale Return',
+        'party_log': ('sale_return_customer', 'debit', 'Sale return from customer: {party}'),
+        'payment_log': ('sale_return_payment', 'credit', 'Refund made for sale return: {party}'),
+    },
+}
+
+# Vouchers debit one ledger and credit another with the same amount; the
+# expense or income ledger names both entries
+VOUCHER_POSTINGS = {
+    'accounts.paymentvoucher': {
+        'date_field': 'date',
+        'number_field': 'invoice_no',
+        'log_type': 'payment_voucher',
+        'debit_field': 'expense_ledger_id',
+        'credit_field': 'payment_ledger_id',
+        'named_field': 'expense_ledger_id',
+        'details': 'Payment Voucher for: {ledger}',
+    },
+    'accounts.receiptvoucher': {
+        'date_field': 'date',
+        'number_field': 'invoice_no',
+        'log_type': 'receipt_voucher',
+        'debit_field': 'receipt_ledger_id',
+        'credit_field': 'income_ledger_id',
+        'named_field': 'income_ledger_id',
+        'details': 'Receipt Voucher for: {ledger}',
+    },
+}
+
+
+def log_types(document_type):
+    """Every AccountLog.log_type a document of this type can own."""
+    if document_type in VOUCHER_POSTINGS:
+        return [VOUCHER_POSTINGS[document_type]['log_type']]
+    rule = TRADE_POSTINGS[document_type]
+    return [rule['party_log'][0], rule['payment_log'][0]]
+
+
+def document_date(instance, rule):
+    value = getattr(instance, rule['date_field'])
+    return value.isoformat() if value else None
+
+
+def log_date(payload, default):
+    """
+    When the document's logs are dated: the start of the document date, as
+    the worker, the voucher import and the repost all date them. Documents
+    without a date, and postings queued before the date was recorded, fall
+    back to `default`.
+    """
+    if not payload.get('date'):
+        return default
+    return start_of_day(date.fromisoformat(payload['date']))
+
+
+def snapshot(instance):
+    """The document figures the postings are built from, as JSON-safe values."""
+    document_type = instance._meta.label_lower
+    if document_type in VOUCHER_POSTINGS:
+        rule = VOUCHER_POSTINGS[document_type]
+        return {
+            'reference_no': getattr(instance, rule['number_field']),
+            'date': document_date(instance, rule),
+            'debit_ledger_id': getattr(instance, rule['debit_field']),
+            'credit_ledger_id': getattr(instance, rule['credit_field']),
+            'named_ledger_id': getattr(instance, rule['named_field']),
+            'sub_ledger_id': instance.sub_ledger_id,
+            'amount': str(instance.amount),
+            'deleted': instance.deleted_at is not None,
+        }
+
+    rule = TRADE_POSTINGS[document_type]
+    return {
+        'reference_no': getattr(instance, rule['number_field']),
+        'date': document_date(instance, rule),
+        'party_id': getattr(instance, rule['party_field']),
+        'payment_ledger_id': instance.payment_ledger_id,
+        'total': str(instance.total),
+        'settled': str(getattr(instance, rule['settled_field'])),
+        'deleted': instance.deleted_at is not None,
+    }
+
+
+def enqueue_account_posting(instance):
+    """
+    Record the document's postings in the outbox, inside the caller's
+    transaction, and wake the worker once it commits. The document row is
+    locked while the next version is numbered.
+    """
+    document_type = instance._meta.label_lower
+    with transaction.atomic():
+        # Concurrent saves of the document wait here, so each reads the version the other wrote
+        type(instance).all_objects.select_for_update().filter(pk=instance.pk).exists()
+        latest = AccountPosting.objects.filter(
+            document_type=document_type, document_id=instance.pk
+        ).aggregate(version=Max('version'))['version']
+        AccountPosting.objects.create(
+            document_type=document_type,
+            document_id=instance.pk,
+            version=(latest or 0) + 1,
+            payload=snapshot(instance),
+        )
+    transaction.on_commit(wake_posting_worker)
+
+
+def wake_posting_worker():
+    from accounts.tasks import apply_account_postings
+
+    try:
+        apply_account_postings.delay()
+    except OperationalError:
+        # Broker unreachable: the document is saved and the periodic run picks the posting up
+        pass
+
+
+def build_entries(document_type, payload):
+    """The AccountLog rows the document should have, keyed by (log_type, ledger_id)."""
+    if document_type in VOUCHER_POSTINGS:
+        if payload['deleted']:
+            # Deleted vouchers drop their logs; documents keep theirs as before
+            return {}
+        rule = VOUCHER_POSTINGS[document_type]
+        amount = Decimal(payload['amount'])
+        details = rule['details'].format(ledger=get_ledger(payload['named_ledger_id']).name)
+        entries = {}
+        for ledger_id, debit, credit in (
+            (payload['debit_ledger_id'], amount, 0),
+            (payload['credit_ledger_id'], 0, amount),
+        ):
+            entries[(rule['log_type'], ledger_id)] = {
+                'sub_ledger_id': payload['sub_ledger_id'],
+                'debit_amount': debit,
+                'credit_amount': credit,
+                'details': details,
+            }
+        return entries
+
+    rule = TRADE_POSTINGS[document_type]
+    party = get_party_ledger(payload['party_id'], rule['party_type'])
+    if party is None:
+        raise LookupError(f"No {rule['party_type']} ledger for party #{payload['party_id']}.")
+    sub_ledger = get_sub_ledger(rule['sub_ledger'])
+
+    def entry(side, amount, details):
+        return {
+            'sub_ledger_id': sub_ledger.pk,
+            'debit_amount': amount if side == 'debit' else 0,
+            'credit_amount': amount if side == 'credit' else 0,
+            'details': details.format(party=party.name),
+        }
+
+    log_type, side, details = rule['party_log']
+    entries = {(log_type, party.pk): entry(side, Decimal(payload['total']), details)}
+
+    settled = Decimal(payload['settled'])
+    if settled > 0 and payload['payment_ledger_id']:
+        log_type, side, details = rule['payment_log']
+        entries[(log_type, payload['payment_ledger_id'])] = entry(side, settled, details)
+    return entries
+
+
+def apply_posting(posting):
+    """
+    Make the document's AccountLog rows match the posting: matching rows are
+    updated in place, missing ones created and the rest deleted. Applying the
+    same posting twice leaves the ledger unchanged.
+    """
+    entries = build_entries(posting.document_type, posting.payload)
+    reference_no = posting.payload['reference_no']
+    dated = log_date(posting.payload, posting.created_at)
+
+    logs = AccountLog.objects.filter(reference_no=reference_no, log_type__in=log_types(posting.document_type))
+    stale = []
+    for log in logs:
+        fields = entries.pop((log.log_type, log.ledger_id), None)
+        if fields is None:
+            stale.append(log.pk)
+            continue
+        for name, value in fields.items():
+            setattr(log, name, value)
+        log.date = dated
+        log.save()
+    if stale:
+        AccountLog.objects.filter(pk__in=stale).delete()
+
+    for (log_type, ledger_id), fields in entries.items():
+        AccountLog.objects.create(
+            reference_no=reference_no, log_type=log_type, ledger_id=ledger_id, date=dated, **fields
+        )
+
+
+def apply_pending_postings(batch_size=500):
+    """
+    Apply the pending outbox rows in id order, a batch per DB transaction, and
+    return how many were processed. Only the newest pending version of each
+    document is applied; older ones are superseded. A posting that fails stays
+    pending for the next run until it has failed MAX_ATTEMPTS times.
+    """
+    processed = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                AccountPosting.objects.select_for_update(skip_locked=True)
+                .filter(status=AccountPosting.Status.PENDING, pk__gt=last_id)
+                .order_by('pk')[:batch_size]
+            )
+            if not batch:
+                return processed
+
+            newest = {}
+            for posting in batch:
+                key = (posting.document_type, posting.document_id)
+                if key not in newest or posting.version > newest[key].version:
+                    newest[key] = posting
+            applied_versions = {
+                (row['document_type'], row['document_id']): row['version']
+                for row in AccountPosting.objects.filter(
+                    status=AccountPosting.Status.APPLIED,
+                    document_id__in={posting.document_id for posting in batch},
+                )
+                .values('document_type', 'document_id')
+                .annotate(version=Max('version'))
+            }
+
+            now = timezone.now()
+            for posting in batch:
+                key = (posting.document_type, posting.document_id)
+                if posting is not newest[key] or applied_versions.get(key, 0) >= posting.version:
+                    posting.status = AccountPosting.Status.SUPERSEDED
+                    continue
+                try:
+                    with transaction.atomic():
+                        apply_posting(posting)
+                except Exception as error:
+                    posting.attempts += 1
+                    posting.error = str(error)
+                    if posting.attempts >= MAX_ATTEMPTS:
+                        posting.status = AccountPosting.Status.FAILED
+                    continue
+                posting.status = AccountPosting.Status.APPLIED
+                posting.applied_at = now
+                posting.error = ''
+
+            AccountPosting.objects.bulk_update(batch, ['status', 'attempts', 'error', 'applied_at'])
+
+        processed += len(batch)
+        last_id = batch[-1].pk
+
+
+def retry_failed_postings():
+    """Put failed postings back in the queue, e.g. after the missing ledger was created."""
+    return AccountPosting.objects.filter(status=AccountPosting.Status.FAILED).update(
+        status=AccountPosting.Status.PENDING, attempts=0
+    )
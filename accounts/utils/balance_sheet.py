@@ -0,0 +1,100 @@
+from decimal import Decimal
+
+from django.db import connection
+
+from accounts.models import Group, GroupClosure, LedgerAccount, LedgerDailyBalance, PrimaryGroup
+
+# Primary groups shown on each side of the balance sheet
+ASSETS = 'Assets'
+LIABILITIES = 'Liabilities'
+
+BALANCE_SHEET_SQL = """
+WITH group_root (group_id, primary_name, depth) AS (
+    SELECT link.descendant_id, primary_group.name, link.depth
+    FROM {closure} link
+    JOIN {group} root ON root.id = link.ancestor_id
+    JOIN {primary} primary_group ON primary_group.id = root.head_primarygroup_id
+    WHERE root.head_group_id IS NULL
+),
+ledger_balance (ledger_id, group_id, debit, credit) AS (
+    SELECT ledger.id, ledger.head_group_id, SUM(day.debit_total), SUM(day.credit_total)
+    FROM {daily} day
+    JOIN {ledger} ledger ON ledger.id = day.ledger_id
+    WHERE day.date >= %s AND day.date <= %s AND ledger.head_group_id IS NOT NULL
+    GROUP BY ledger.id, ledger.head_group_id
+)
+SELECT 'ledger', balance.ledger_id, ledger.name, balance.group_id, root.primary_name, root.depth + 1,
+       balance.debit, balance.credit, ABS(balance.debit - balance.credit)
+FROM ledger_balance balance
+JOIN {ledger} ledger ON ledger.id = balance.ledger_id
+JOIN group_root root ON root.group_id = balance.group_id
+UNION ALL
+SELECT 'group', grp.id, grp.name, grp.head_group_id, root.primary_name, root.depth,
+       SUM(balance.debit), SUM(balance.credit), SUM(ABS(balance.debit - balance.credit))
+FROM ledger_balance balance
+JOIN {closure} link ON link.descendant_id = balance.group_id
+JOIN {group} grp ON grp.id = link.ancestor_id
+JOIN group_root root ON root.group_id = grp.id
+GROUP BY grp.id, grp.name, grp.head_group_id, root.primary_name, root.depth
+"""
+
+
+def to_decimal(value):
+    # SQLite hands back floats for summed decimals
+    return Decimal(str(value or 0)).quantize(Decimal('0.01'))
+
+
+def get_balance_sheet(date_from, date_to):
+    """
+    Ledger balances of the period and the subtotal of every group, including
+    all of its sub-groups, in one query: GroupClosure maps each group to its
+    ancestors and root primary group, and the daily rollup is summed per ledger.
+
+    Returns {'assets': rows, 'liabilities': rows, 'total_assets', 'total_liabilities'}
+    where rows is the tree flattened in display order, each row a dict with
+    kind ('group' or 'ledger'), name, depth and amount (the absolute balance).
+    """
+    sql = BALANCE_SHEET_SQL.format(
+        primary=PrimaryGroup._meta.db_table,
+        group=Group._meta.db_table,
+        closure=GroupClosure._meta.db_table,
+        ledger=LedgerAccount._meta.db_table,
+        daily=LedgerDailyBalance._meta.db_table,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [date_from, date_to])
+        rows = cursor.fetchall()
+
+    children = {}
+    for kind, pk, name, parent_id, primary_name, depth, debit, credit, amount in rows:
+        children.setdefault((primary_name, parent_id), []).append({
+            'kind': kind,
+            'id': pk,
+            'name': name,
+            'depth': depth,
+            'debit_total': to_decimal(debit),
+            'credit_total': to_decimal(credit),
+            'amount': to_decimal(amount),
+        })
+
+    def flatten(primary_name, parent_id):
+        # Sub-groups first, then the group's own ledgers, each by name
+        nodes = sorted(
+            children.get((primary_name, parent_id), []), key=lambda node: (node['kind'] != 'group', node['name'])
+        )
+        flat = []
+        for node in nodes:
+            flat.append(node)
+            if node['kind'] == 'group':
+                flat.extend(flatten(primary_name, node['id']))
+        return flat
+
+    sheet = {}
+    for key, name in (('assets', ASSETS), ('liabilities', LIABILITIES)):
+        # Top-level groups hang off the primary group, i.e. have no parent group
+        sheet[key] = flatten(name, None)
+        sheet[f'total_{key}'] = sum(
+            (row['amount'] for row in sheet[key] if row['kind'] == 'group' and row['depth'] == 0),
+            Decimal('0.00'),
+        )
+    return sheet
@@ -0,0 +1,215 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection
+
+from accounts.models import (
+    FiscalPeriod, Group, GroupClosure, LedgerAccount, LedgerDailyBalance, LedgerPeriodBalance, PrimaryGroup,
+)
+from accounts.utils.balance_sheet import to_decimal
+
+# Primary groups of the income statement
+INCOMES = 'Incomes'
+EXPENSES = 'Expenses'
+
+# First month of the year the year-to-date column starts from
+FISCAL_YEAR_START_MONTH = 1
+
+GROUP_BALANCES_SQL = """
+WITH group_root (group_id, primary_id, primary_name, depth) AS (
+    SELECT link.descendant_id, primary_group.id, primary_group.name, link.depth
+    FROM {closure} link
+    JOIN {group} root ON root.id = link.ancestor_id
+    JOIN {primary} primary_group ON primary_group.id = root.head_primarygroup_id
+    WHERE root.head_group_id IS NULL
+),
+ledger_balance (ledger_id, group_id, {balance_columns}) AS (
+    SELECT ledger.id, ledger.head_group_id, {period_sums}
+    FROM {days} day
+    JOIN {ledger} ledger ON ledger.id = day.ledger_id
+    WHERE day.date >= %s AND day.date <= %s AND ledger.head_group_id IS NOT NULL
+    GROUP BY ledger.id, ledger.head_group_id
+)
+SELECT 'ledger', balance.ledger_id, ledger.name, balance.group_id, root.primary_id, root.primary_name,
+       root.depth + 1, {ledger_columns}
+FROM ledger_balance balance
+JOIN {ledger} ledger ON ledger.id = balance.ledger_id
+JOIN group_root root ON root.group_id = balance.group_id
+UNION ALL
+SELECT 'group', grp.id, grp.name, grp.head_group_id, root.primary_id, root.primary_name,
+       root.depth, {group_columns}
+FROM ledger_balance balance
+JOIN {closure} link ON link.descendant_id = balance.group_id
+JOIN {group} grp ON grp.id = link.ancestor_id
+JOIN group_root root ON root.group_id = grp.id
+GROUP BY grp.id, grp.name, grp.head_group_id, root.primary_id, root.primary_name, root.depth
+"""
+
+# The rollup after a closed period, with each ledger's stored closing balance standing in for the days up to it
+CARRIED_DAYS_SQL = """(
+    SELECT ledger_id, date, debit_total, credit_total FROM {daily} WHERE date > %s
+    UNION ALL
+    SELECT ledger_id, %s, closing_balance, 0 FROM {period_balance} WHERE period_id = %s
+)"""
+
+
+def year_start(day):
+    start = date(day.year, FISCAL_YEAR_START_MONTH, 1)
+    return start if start <= day else date(day.year - 1, FISCAL_YEAR_START_MONTH, 1)
+
+
+def report_periods(date_from, date_to):
+    """The period itself, the period of the same length just before it, and the year to date_to."""
+    prior_to = date_from - timedelta(days=1)
+    return {
+        'current': (date_from, date_to),
+        'prior': (prior_to - (date_to - date_from), prior_to),
+        'ytd': (year_start(date_to), date_to),
+    }
+
+
+def get_group_balances(periods):
+    """
+    Net balance (debit minus credit) of every ledger and of every group,
+    including its sub-groups, for each of `periods`, in one pass over the daily
+    rollup: each period is a conditional SUM and GroupClosure rolls the
+    ledgers up to every ancestor. A period starting at None runs from the
+    first posting; the balances stored by the latest closed fiscal period
+    stand in for the days up to its end, so only the open days are read.
+
+    Returns [(primary_name, rows)] in PrimaryGroup id order, each rows list
+    the tree flattened in display order as dicts with kind, id, name, depth
+    and the net balance under each period key.
+    """
+    keys = list(periods)
+    starts = [start for start, _ in periods.values() if start is not None]
+    period_sums, params = [], []
+    for key in keys:
+        start, end = periods[key]
+        for field in ('debit_total', 'credit_total'):
+            if start is None:
+                period_sums.append(f"SUM(CASE WHEN day.date <= %s THEN day.{field} ELSE 0 END)")
+                params.append(end)
+            else:
+                period_sums.append(f"SUM(CASE WHEN day.date >= %s AND day.date <= %s THEN day.{field} ELSE 0 END)")
+                params.extend((start, end))
+    balance_columns = [f"{key}_{side}" for key in keys for side in ('debit', 'credit')]
+
+    days = LedgerDailyBalance._meta.db_table
+    first_day = min(starts, default=None)
+    if len(starts) < len(keys):
+        # The carried balances may only cover days every period takes in whole
+        carried_before = min(
+            start if start is not None else end + timedelta(days=1) for start, end in periods.values()
+        )
+        closed = (
+            FiscalPeriod.objects.filter(closed_at__isnull=False, end_date__lt=carried_before)
+            .order_by('-end_date')
+            .values_list('pk', 'end_date')
+            .first()
+        )
+        if closed:
+            period_id, end_date = closed
+            days = CARRIED_DAYS_SQL.format(
+                daily=LedgerDailyBalance._meta.db_table, period_balance=LedgerPeriodBalance._meta.db_table
+            )
+            params += [end_date, end_date, period_id]
+        first_day = date.min
+
+    sql = GROUP_BALANCES_SQL.format(
+        primary=PrimaryGroup._meta.db_table,
+        group=Group._meta.db_table,
+        closure=GroupClosure._meta.db_table,
+        ledger=LedgerAccount._meta.db_table,
+        days=days,
+        balance_columns=', '.join(balance_columns),
+        period_sums=', '.join(period_sums),
+        ledger_columns=', '.join(f"balance.{column}" for column in balance_columns),
+        group_columns=', '.join(f"SUM(balance.{column})" for column in balance_columns),
+    )
+    params += [first_day, max(end for _, end in periods.values())]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    children = {}
+    primaries = {}
+    for kind, pk, name, parent_id, primary_id, primary_name, depth, *totals in rows:
+        primaries[primary_id] = primary_name
+        node = {'kind': kind, 'id': pk, 'name': name, 'depth': depth}
+        for index, key in enumerate(keys):
+            node[key] = to_decimal(totals[2 * index]) - to_decimal(totals[2 * index + 1])
+        children.setdefault((primary_id, parent_id), []).append(node)
+
+    def flatten(primary_id, parent_id):
+        # Sub-groups first, then the group's own ledgers, each by name
+        nodes = sorted(
+            children.get((primary_id, parent_id), []), key=lambda node: (node['kind'] != 'group', node['name'])
+        )
+        flat = []
+        for node in nodes:
+            flat.append(node)
+            if node['kind'] == 'group':
+                flat.extend(flatten(primary_id, node['id']))
+        return flat
+
+    return [(primaries[primary_id], flatten(primary_id, None)) for primary_id in sorted(primaries)]
+
+
+def section_totals(rows, keys):
+    # Top-level groups already include everything below them
+    return {
+        key: sum((row[key] for row in rows if row['kind'] == 'group' and row['depth'] == 0), Decimal('0.00'))
+        for key in keys
+    }
+
+
+def get_trial_balance(date_from, date_to):
+    """
+    Every primary group with its groups and ledgers: the balance at the start
+    of the period, the period's net movement and the balance at its end, each
+    split into a debit or credit figure. The debit and credit totals of a
+    column agree when every posting balances.
+    """
+    periods = {
+        'opening': (None, date_from - timedelta(days=1)),
+        'movement': (date_from, date_to),
+        'closing': (None, date_to),
+    }
+    sections = []
+    totals = {key: {'debit': Decimal('0.00'), 'credit': Decimal('0.00')} for key in periods}
+    for name, rows in get_group_balances(periods):
+        for row in rows:
+            for key in periods:
+                net = row[key]
+                row[key] = {'debit': max(net, 0), 'credit': max(-net, 0)}
+                if row['kind'] == 'ledger':
+                    totals[key]['debit'] += row[key]['debit']
+                    totals[key]['credit'] += row[key]['credit']
+        sections.append({'name': name, 'rows': rows})
+    return {'periods': periods, 'sections': sections, 'totals': totals}
+
+
+def get_profit_and_loss(date_from, date_to):
+    """
+    Incomes (credit minus debit) and expenses (debit minus credit) per period,
+    with the net profit of each period.
+    """
+    periods = report_periods(date_from, date_to)
+    balances = dict(get_group_balances(periods))
+    incomes = balances.get(INCOMES, [])
+    expenses = balances.get(EXPENSES, [])
+    for row in incomes:
+        for key in periods:
+            row[key] = -row[key]
+
+    total_incomes = section_totals(incomes, periods)
+    total_expenses = section_totals(expenses, periods)
+    return {
+        'periods': periods,
+        'incomes': incomes,
+        'expenses': expenses,
+        'total_incomes': total_incomes,
+        'total_expenses': total_expenses,
+        'net_profit': {key: total_incomes[key] - total_expenses[key] for key in periods},
+    }
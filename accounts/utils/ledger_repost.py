@@ -0,0 +1,136 @@
+from collections import Counter
+
+from django.apps import apps
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import AccountLog, FiscalPeriod, LedgerDailyBalance, rollup_deltas
+from accounts.utils.account_posting import (
+    TRADE_POSTINGS, VOUCHER_POSTINGS, build_entries, log_date, log_types, snapshot,
+)
+from commons.utils import date_range_filter
+
+DOCUMENT_RULES = {**TRADE_POSTINGS, **VOUCHER_POSTINGS}
+CHUNK_SIZE = 500
+POSTED_FIELDS = ('sub_ledger_id', 'debit_amount', 'credit_amount', 'details')
+
+
+def expected_logs(document_type, documents):
+    """
+    {(reference_no, log_type, ledger_id): fields} for `documents`, the date
+    their logs carry by reference_no, and the documents whose postings could
+    not be built (left as they are).
+    """
+    expected, dates, skipped = {}, {}, []
+    for document in documents:
+        payload = snapshot(document)
+        reference_no = payload['reference_no']
+        if not reference_no:
+            continue
+        try:
+            entries = build_entries(document_type, payload)
+        except LookupError as error:
+            skipped.append(f"{reference_no}: {error}")
+            continue
+        for (log_type, ledger_id), fields in entries.items():
+            expected[(reference_no, log_type, ledger_id)] = fields
+        dates.setdefault(reference_no, log_date(payload, document.created_at))
+    return expected, dates, skipped
+
+
+def repost_chunk(document_type, documents, dry_run=False):
+    """
+    Make the AccountLog rows of `documents` match their postings: changed
+    rows are bulk updated, missing ones bulk created and stale or duplicate
+    ones deleted, with the daily rollup moved by the net difference.
+    """
+    expected, dates, skipped = expected_logs(document_type, documents)
+
+    removed, added, changed, stale = [], [], [], []
+    now = timezone.now()
+    logs = AccountLog.objects.filter(reference_no__in=dates, log_type__in=log_types(document_type))
+    # The oldest of duplicate logs is the one kept
+    for log in logs.order_by('pk'):
+        fields = expected.pop((log.reference_no, log.log_type, log.ledger_id), None)
+        if fields is None:
+            stale.append(log.pk)
+            continue
+        dated = dates[log.reference_no]
+        if log.date == dated and all(getattr(log, name) == value for name, value in fields.items()):
+            continue
+        removed.append(log.rollup_row())
+        for name, value in fields.items():
+            setattr(log, name, value)
+        log.date = dated
+        log.updated_at = now
+        added.append(log.rollup_row())
+        changed.append(log)
+
+    created = [
+        AccountLog(reference_no=reference_no, log_type=log_type, ledger_id=ledger_id, date=dates[reference_no], **fields)
+        for (reference_no, log_type, ledger_id), fields in expected.items()
+    ]
+    counts = Counter(created=len(created), updated=len(changed), deleted=len(stale))
+    if dry_run:
+        return counts, skipped
+
+    with transaction.atomic():
+        FiscalPeriod.objects.check_open([row['date'] for row in removed + added] + [log.date for log in created])
+        AccountLog.objects.bulk_update(changed, [*POSTED_FIELDS, 'date', 'updated_at'], batch_size=1000)
+        AccountLog.objects.bulk_create(created, batch_size=1000)
+        LedgerDailyBalance.objects.apply_deltas(
+            rollup_deltas(removed=removed, added=added + [log.rollup_row() for log in created])
+        )
+        if stale:
+            AccountLog.objects.filter(pk__in=stale).delete()
+    return counts, skipped
+
+
+def orphan_logs(document_type, date_from, date_to):
+    """Posted logs dated in the range whose document no longer exists at all."""
+    rule = DOCUMENT_RULES[document_type]
+    model = apps.get_model(document_type)
+    # Document numbers are not indexed, so the set is built once rather than probed per log
+    numbers = model.all_objects.filter(**{f"{rule['number_field']}__isnull": False}).values(rule['number_field'])
+    return AccountLog.objects.filter(
+        date_range_filter('date', date_from, date_to), log_type__in=log_types(document_type)
+    ).exclude(reference_no__in=numbers)
+
+
+def repost_ledgers(date_from, date_to, chunk_size=CHUNK_SIZE, dry_run=False, progress=None):
+    """
+    Reconcile the AccountLog rows of every sale, purchase, return and voucher
+    dated from `date_from` to `date_to` with the postings their current
+    figures produce, a chunk of documents per DB transaction, then delete the
+    posted logs in the range whose document is gone. Logs are dated on their
+    document's date, as the posting worker and the voucher import date them.
+
+    Returns (counts, skipped) with created/updated/deleted totals per
+    document type and the documents whose postings could not be built.
+    """
+    totals, skipped = {}, []
+    for document_type, rule in DOCUMENT_RULES.items():
+        model = apps.get_model(document_type)
+        documents = model.all_objects.filter(
+            **{f"{rule['date_field']}__gte": date_from, f"{rule['date_field']}__lte": date_to}
+        ).order_by('pk')
+        counts = Counter()
+        last_id = 0
+        while True:
+            chunk = list(documents.filter(pk__gt=last_id)[:chunk_size])
+            if not chunk:
+                break
+            chunk_counts, chunk_skipped = repost_chunk(document_type, chunk, dry_run=dry_run)
+            counts.update(chunk_counts)
+            skipped.extend(chunk_skipped)
+            last_id = chunk[-1].pk
+            if progress:
+                progress(document_type, last_id, counts)
+
+        orphans = orphan_logs(document_type, date_from, date_to)
+        if dry_run:
+            counts['deleted'] += orphans.count()
+        else:
+            counts['deleted'] += orphans.delete()
+        totals[document_type] = counts
+    return totals, skipped
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, Q, Sum, Window
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounts.models import AccountLog, LedgerDailyBalance
+from accounts.utils.period_close import carried_balance
+from commons.utils import date_range_filter, start_of_day
+
+PAGE_SIZE = 100
+EXPORT_CHUNK_SIZE = 2000
+
+AMOUNT_FIELD = DecimalField(max_digits=20, decimal_places=2)
+ZERO = Decimal('0.00')
+
+
+def encode_cursor(line):
+    return f"{int(line['date'].timestamp() * 1_000_000)}-{line['id']}"
+
+
+def decode_cursor(token):
+    """(date, id) of the last line shown, or None for a missing or malformed token."""
+    try:
+        micros, pk = (int(part) for part in token.split('-'))
+    except (AttributeError, ValueError):
+        return None
+    return datetime.fromtimestamp(micros / 1_000_000, tz=timezone.utc), pk
+
+
+def balance_before(ledger_id, day):
+    """
+    Debit minus credit of every log dated before `day`: the balance stored by
+    the last period close plus the daily rollup of the open days since.
+    """
+    carried, open_from = carried_balance(ledger_id, day)
+    days = LedgerDailyBalance.objects.filter(ledger_id=ledger_id, date__lt=day)
+    if open_from:
+        days = days.filter(date__gte=open_from)
+    totals = days.aggregate(debit=Sum('debit_total'), credit=Sum('credit_total'))
+    return carried + (totals['debit'] or ZERO) - (totals['credit'] or ZERO)
+
+
+def balance_through(ledger_id, cursor):
+    """
+    Balance including the line at `cursor`: the rollup up to the cursor's day
+    plus that day's logs up to the cursor, so it costs the same on any page.
+    """
+    date, pk = cursor
+    day = timezone.localdate(date)
+    same_day = AccountLog.objects.filter(
+        Q(date__lt=date) | Q(date=date, pk__lte=pk),
+        ledger_id=ledger_id,
+        date__gte=start_of_day(day),
+    ).aggregate(debit=Sum('debit_amount'), credit=Sum('credit_amount'))
+    return balance_before(ledger_id, day) + (same_day['debit'] or ZERO) - (same_day['credit'] or ZERO)
+
+
+def statement_lines(ledger_id, date_from, date_to, cursor=None, limit=PAGE_SIZE, opening=None):
+    """
+    Up to `limit` log lines of the period after `cursor`, oldest first, each
+    with its running balance. Rows are found by keyset on (date, id), and the
+    window only runs over the page, which starts from `opening` (by default
+    the balance at the cursor).
+    """
+    logs = AccountLog.objects.filter(date_range_filter('date', date_from, date_to), ledger_id=ledger_id)
+    if cursor:
+        date, pk = cursor
+        logs = logs.filter(Q(date__gt=date) | Q(date=date, pk__gt=pk))
+    if opening is None:
+        opening = balance_through(ledger_id, cursor) if cursor else balance_before(ledger_id, date_from)
+
+    page = logs.order_by('date', 'pk').values('pk')[:limit]
+    movement = Coalesce('debit_amount', 0, output_field=AMOUNT_FIELD) - Coalesce(
+        'credit_amount', 0, output_field=AMOUNT_FIELD
+    )
+    lines = list(
+        AccountLog.objects.filter(pk__in=page)
+        .annotate(movement=Window(Sum(movement), order_by=[F('date').asc(), F('id').asc()]))
+        .order_by('date', 'pk')
+        .values('id', 'date', 'reference_no', 'log_type', 'details', 'debit_amount', 'credit_amount', 'movement')
+    )
+    for line in lines:
+        line['balance'] = (opening + line.pop('movement')).quantize(ZERO)
+    return opening, lines
+
+
+def get_ledger_statement(ledger, date_from, date_to, after=None, page_size=PAGE_SIZE):
+    """One page of the statement; `after` is the cursor token of the previous page."""
+    cursor = decode_cursor(after) if after else None
+    opening, lines = statement_lines(ledger.pk, date_from, date_to, cursor, page_size + 1)
+    has_next = len(lines) > page_size
+    lines = lines[:page_size]
+    return {
+        'opening_balance': balance_before(ledger.pk, date_from) if cursor else opening,
+        'closing_balance': balance_before(ledger.pk, date_to + timedelta(days=1)),
+        'page_opening_balance': opening,
+        'lines': lines,
+        'next_cursor': encode_cursor(lines[-1]) if has_next else None,
+    }
+
+
+def iter_statement_lines(ledger, date_from, date_to, chunk_size=EXPORT_CHUNK_SIZE):
+    """Every line of the period, fetched a keyset page at a time for exports."""
+    cursor = opening = None
+    while True:
+        _, lines = statement_lines(ledger.pk, date_from, date_to, cursor, chunk_size, opening)
+        yield from lines
+        if len(lines) < chunk_size:
+            return
+        # The next chunk carries on from the last running balance
+        cursor, opening = (lines[-1]['date'], lines[-1]['id']), lines[-1]['balance']
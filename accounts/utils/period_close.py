@@ -0,0 +1,111 @@
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from accounts.models import FiscalPeriod, LedgerDailyBalance, LedgerPeriodBalance
+from commons.utils import start_of_day
+
+
+def close_fiscal_period(period):
+    """
+    Store every ledger's totals and closing balance for `period` and lock its
+    postings. Periods close in date order, each starting the day after the
+    previous one ended, so its openings are the previous period's closings and
+    only its own days are aggregated; the first period also takes in
+    everything dated before it. Returns the number of ledger rows stored.
+    """
+    with transaction.atomic():
+        period = FiscalPeriod.objects.select_for_update().get(pk=period.pk)
+        if period.closed_at:
+            raise ValidationError(f"{period} is already closed.")
+        if FiscalPeriod.objects.filter(closed_at__isnull=True, end_date__lt=period.start_date).exists():
+            raise ValidationError("Close the earlier fiscal periods first.")
+        previous = FiscalPeriod.objects.filter(closed_at__isnull=False).order_by('-end_date').first()
+        if previous and period.start_date != previous.end_date + timedelta(days=1):
+            raise ValidationError(
+                f"{period} must start on {previous.end_date + timedelta(days=1):%d-%m-%Y}, the day after {previous}."
+            )
+
+        openings = {}
+        days = LedgerDailyBalance.objects.filter(date__lte=period.end_date)
+        if previous:
+            openings = dict(previous.ledger_balances.values_list('ledger_id', 'closing_balance'))
+            days = days.filter(date__gte=period.start_date)
+
+        in_period = Q(date__gte=period.start_date)
+        totals = {
+            row['ledger_id']: row
+            for row in days.order_by().values('ledger_id').annotate(
+                debit=Sum('debit_total', filter=in_period),
+                credit=Sum('credit_total', filter=in_period),
+                earlier=Sum(F('debit_total') - F('credit_total'), filter=~in_period),
+            )
+        }
+
+        balances = []
+        for ledger_id in openings.keys() | totals.keys():
+            row = totals.get(ledger_id, {})
+            debit = row.get('debit') or 0
+            credit = row.get('credit') or 0
+            opening = openings.get(ledger_id, row.get('earlier') or 0)
+            balances.append(LedgerPeriodBalance(
+                period=period,
+                ledger_id=ledger_id,
+                debit_total=debit,
+                credit_total=credit,
+                closing_balance=opening + debit - credit,
+            ))
+        LedgerPeriodBalance.objects.bulk_create(balances, batch_size=2000)
+
+        period.closed_at = timezone.now()
+        period.save(update_fields=['closed_at'])
+    return len(balances)
+
+
+def reopen_fiscal_period(period):
+    """Unlock the latest closed period and drop its stored balances, e.g. to post a correction."""
+    with transaction.atomic():
+        period = FiscalPeriod.objects.select_for_update().get(pk=period.pk)
+        if not period.closed_at:
+            raise ValidationError(f"{period} is not closed.")
+        if FiscalPeriod.objects.filter(closed_at__isnull=False, end_date__gt=period.end_date).exists():
+            raise ValidationError("Reopen the later fiscal periods first.")
+        period.ledger_balances.all().delete()
+        period.closed_at = None
+        period.save(update_fields=['closed_at'])
+
+
+def check_document_dates(*dates):
+    """
+    Raise ValidationError if a document dated on any of `dates` would post
+    into a closed fiscal period. Forms pass the new date and, for an edit or
+    delete, the stored one, so the save is refused before its posting fails.
+    """
+    FiscalPeriod.objects.check_open([start_of_day(day) for day in dates if day])
+
+
+def carried_balance(ledger_id, day):
+    """
+    (balance, from_date): the ledger's balance at the end of the latest period
+    closed before `day`, and the first day after that period. Callers add the
+    open days from `from_date` on; with no closed period it is (0, None).
+    """
+    closed = (
+        FiscalPeriod.objects.filter(closed_at__isnull=False, end_date__lt=day)
+        .order_by('-end_date')
+        .values_list('pk', 'end_date')
+        .first()
+    )
+    if closed is None:
+        return 0, None
+    period_id, end_date = closed
+    # A ledger without a row had nothing posted up to then
+    balance = (
+        LedgerPeriodBalance.objects.filter(period_id=period_id, ledger_id=ledger_id)
+        .values_list('closing_balance', flat=True)
+        .first()
+    )
+    return balance or 0, end_date + timedelta(days=1)
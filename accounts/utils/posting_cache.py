@@ -0,0 +1,91 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from accounts.models import Group, LedgerAccount, SubLedgerAccount
+
+MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe in-process map that evicts the least recently used entry
+    beyond `maxsize`. Entries also expire after `ttl` seconds, which bounds how
+    long another process's change can go unseen here.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key, MISSING)
+            if entry is MISSING:
+                return MISSING
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return MISSING
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_or_load(self, key, load):
+        value = self.get(key)
+        if value is MISSING:
+            value = load()
+            self.set(key, value)
+        return value
+
+
+# Cleared by the post_save/post_delete receivers in accounts.signals; soft
+# deletes are saves, so they clear them too
+ledgers = LRUCache(maxsize=4096)
+sub_ledgers = LRUCache(maxsize=64)
+groups = LRUCache(maxsize=64)
+
+
+def get_ledger(pk):
+    return ledgers.get_or_load(pk, lambda: LedgerAccount.objects.get(pk=pk))
+
+
+def get_party_ledger(reference_id, ledger_type):
+    """The auto-created ledger of a customer or supplier, or None."""
+    reference_id = str(reference_id)
+    return ledgers.get_or_load(
+        (reference_id, ledger_type),
+        lambda: LedgerAccount.objects.filter(reference_id=reference_id, ledger_type=ledger_type).first(),
+    )
+
+
+def get_sub_ledger(name):
+    sub_ledger = sub_ledgers.get(name)
+    if sub_ledger is MISSING:
+        sub_ledger, created = SubLedgerAccount.objects.get_or_create(name=name)
+        # A row created here could still be rolled back; it is cached on a later lookup
+        if not created:
+            sub_ledgers.set(name, sub_ledger)
+    return sub_ledger
+
+
+def get_group(name):
+    """Group by case-insensitive name, or None."""
+    return groups.get_or_load(name.lower(), lambda: Group.objects.filter(name__iexact=name).first())
+
+
+def clear_all():
+    for cache in (ledgers, sub_ledgers, groups):
+        cache.clear()
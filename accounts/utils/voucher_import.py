@@ -0,0 +1,194 @@
+import os
+from decimal import Decimal, InvalidOperation
+
+import pandas as pd
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from sequences import get_next_value
+
+from accounts.models import (
+    AccountLog, FiscalPeriod, LedgerAccount, LedgerDailyBalance, PaymentVoucher, ReceiptVoucher,
+    SubLedgerAccount, rollup_deltas,
+)
+from accounts.utils.account_posting import build_entries, log_date, snapshot
+from commons.utils import start_of_day
+
+# Per voucher type: the cash/bank ledger the file names, the expense/income
+# ledger it is booked against (defaulting like the voucher forms) and the
+# invoice number prefix
+VOUCHER_IMPORTS = {
+    'payment': {
+        'model': PaymentVoucher,
+        'ledger_field': 'payment_ledger_id',
+        'account_field': 'expense_ledger_id',
+        'default_account': 'Expenses',
+        'prefix': 'PV',
+    },
+    'receipt': {
+        'model': ReceiptVoucher,
+        'ledger_field': 'receipt_ledger_id',
+        'account_field': 'income_ledger_id',
+        'default_account': 'Income',
+        'prefix': 'RV',
+    },
+}
+
+COLUMNS = {
+    'date': ('date',),
+    'ledger': ('ledger', 'payment_ledger', 'receipt_ledger', 'bank', 'cash_or_bank'),
+    'account': ('account', 'expense_ledger', 'income_ledger'),
+    'amount': ('amount',),
+    'sub_ledger': ('sub_ledger',),
+    'cheque_no': ('cheque_no',),
+    'details': ('details', 'narration', 'description'),
+}
+REQUIRED_COLUMNS = ('date', 'ledger', 'amount')
+MAX_REPORTED_ERRORS = 10
+
+
+def read_voucher_file(upload):
+    """
+    Read a CSV/XLSX voucher sheet into a frame with the COLUMNS keys as
+    columns, all as stripped strings. Headers are matched case-insensitively.
+    """
+    extension = os.path.splitext(upload.name)[1].lower()
+    try:
+        if extension == '.csv':
+            frame = pd.read_csv(upload, dtype=str, keep_default_na=False)
+        elif extension == '.xlsx':
+            frame = pd.read_excel(upload, dtype=str, keep_default_na=False)
+        else:
+            raise ValidationError("Upload a .csv or .xlsx file.")
+    except (ValueError, pd.errors.ParserError) as error:
+        raise ValidationError(f"Could not read the file: {error}")
+
+    frame.columns = [str(column).strip().lower().replace(' ', '_') for column in frame.columns]
+    renames = {}
+    for name, aliases in COLUMNS.items():
+        column = next((alias for alias in aliases if alias in frame.columns), None)
+        if column is None and name in REQUIRED_COLUMNS:
+            raise ValidationError("The file needs 'Date', 'Ledger' and 'Amount' columns.")
+        if column is not None:
+            renames[column] = name
+    frame = frame[list(renames)].rename(columns=renames)
+    for name in COLUMNS:
+        frame[name] = frame[name].astype(str).str.strip() if name in frame.columns else ''
+    frame = frame[frame['ledger'] != '']
+    if frame.empty:
+        raise ValidationError("The file has no voucher lines.")
+    return frame
+
+
+def name_map(model):
+    """Live rows of a named accounts model, by case-insensitive name."""
+    return {name.lower(): pk for pk, name in model.objects.values_list('pk', 'name')}
+
+
+def parse_lines(frame, rule):
+    """
+    Turn the sheet into voucher field dicts, matching every ledger and sub
+    ledger name against maps loaded once. Bad lines reject the whole sheet.
+    """
+    ledgers = name_map(LedgerAccount)
+    sub_ledgers = name_map(SubLedgerAccount)
+    # Parsed as one column rather than per line: ISO dates (as Excel cells
+    # read back) first, then day-first like the date pickers
+    dates = pd.to_datetime(frame['date'], format='ISO8601', errors='coerce').fillna(
+        pd.to_datetime(frame['date'], dayfirst=True, format='mixed', errors='coerce')
+    )
+    lines, errors = [], []
+    # Header is line 1 of the sheet
+    for number, row, date in zip(range(2, len(frame) + 2), frame.itertuples(index=False), dates):
+        problems = []
+        if pd.isna(date):
+            problems.append(f"invalid date '{row.date}'")
+        try:
+            amount = Decimal(row.amount.replace(',', '')).quantize(Decimal('0.01'))
+            if amount <= 0:
+                raise InvalidOperation
+        except (InvalidOperation, ValueError):
+            problems.append(f"invalid amount '{row.amount}'")
+        ledger_id = ledgers.get(row.ledger.lower())
+        if ledger_id is None:
+            problems.append(f"unknown ledger '{row.ledger}'")
+        account = row.account or rule['default_account']
+        account_id = ledgers.get(account.lower())
+        if account_id is None:
+            problems.append(f"unknown ledger '{account}'")
+        sub_ledger_id = sub_ledgers.get(row.sub_ledger.lower()) if row.sub_ledger else None
+        if row.sub_ledger and sub_ledger_id is None:
+            problems.append(f"unknown sub ledger '{row.sub_ledger}'")
+
+        if problems:
+            errors.append(f"Line {number}: {', '.join(problems)}")
+            continue
+        lines.append({
+            'date': date.date(),
+            rule['ledger_field']: ledger_id,
+            rule['account_field']: account_id,
+            'sub_ledger_id': sub_ledger_id,
+            'amount': amount,
+            'bank_or_cash': bool(row.cheque_no),
+            'cheque_no': row.cheque_no or None,
+            'details': row.details or None,
+        })
+
+    if errors:
+        more = len(errors) - MAX_REPORTED_ERRORS
+        raise ValidationError(errors[:MAX_REPORTED_ERRORS] + ([f"... and {more} more lines"] if more > 0 else []))
+    return lines
+
+
+def next_invoice_numbers(model, prefix, count):
+    """
+    `count` invoice numbers following the last one of this year, for imports
+    and the voucher create views alike. Call it in the transaction that
+    creates the vouchers: the year's sequence row stays locked until it
+    commits, so concurrent saves number one after the other.
+    """
+    prefix = f"{prefix}-{timezone.localdate().year}-"
+    # Only the row lock is wanted; the numbers follow the vouchers themselves
+    get_next_value(f"voucher_number_{prefix}")
+    last = model.all_objects.filter(invoice_no__startswith=prefix).order_by('-invoice_no').values_list(
+        'invoice_no', flat=True
+    ).first()
+    try:
+        start = int(last.split('-')[-1]) + 1 if last else 1
+    except (ValueError, IndexError):
+        start = 1
+    return [f"{prefix}{number:05d}" for number in range(start, start + count)]
+
+
+def import_vouchers(upload, voucher_type, user=None):
+    """
+    Create a voucher per sheet line and its debit/credit AccountLog pair in one
+    transaction: vouchers and logs are written with one bulk_create each and
+    the daily rollup is updated per ledger and day, so the per-voucher posting
+    signal never runs. The logs are the ones the posting worker would write,
+    dated on the voucher date. Returns the created vouchers.
+    """
+    rule = VOUCHER_IMPORTS[voucher_type]
+    model = rule['model']
+    lines = parse_lines(read_voucher_file(upload), rule)
+    FiscalPeriod.objects.check_open([start_of_day(line['date']) for line in lines])
+
+    with transaction.atomic():
+        numbers = next_invoice_numbers(model, rule['prefix'], len(lines))
+        vouchers = model.objects.bulk_create([
+            model(invoice_no=number, created_by=user, **line) for number, line in zip(numbers, lines)
+        ], batch_size=1000)
+
+        document_type = model._meta.label_lower
+        logs = []
+        for voucher in vouchers:
+            payload = snapshot(voucher)
+            date = log_date(payload, timezone.now())
+            for (log_type, ledger_id), fields in build_entries(document_type, payload).items():
+                logs.append(AccountLog(
+                    reference_no=voucher.invoice_no, log_type=log_type, ledger_id=ledger_id, date=date,
+                    created_by=user, **fields
+                ))
+        AccountLog.objects.bulk_create(logs, batch_size=2000)
+        LedgerDailyBalance.objects.apply_deltas(rollup_deltas(added=[log.rollup_row() for log in logs]))
+    return vouchers
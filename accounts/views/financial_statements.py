@@ -0,0 +1,44 @@
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import render
+from django.utils import timezone
+
+from accounts.utils.financial_statements import get_profit_and_loss, get_trial_balance
+from commons.utils import is_ajax, parse_date_range
+
+
+def get_report_dates(request):
+    # Default to the current month
+    date_from, date_to = parse_date_range(request, timezone.localdate().replace(day=1), timezone.localdate())
+    return date_from.strftime("%d-%m-%Y"), date_to.strftime("%d-%m-%Y"), date_from, date_to
+
+
+@login_required
+def trial_balance_report(request):
+    filter_date_from, filter_date_to, date_from, date_to = get_report_dates(request)
+
+    context = {
+        'report': get_trial_balance(date_from, date_to),
+        'filter_date_from': filter_date_from,
+        'filter_date_to': filter_date_to,
+    }
+
+    if not is_ajax(request):
+        return render(request, 'trial_balance/list.html', context)
+
+    return render(request, 'trial_balance/_table_fragment.html', context)
+
+
+@login_required
+def profit_loss_report(request):
+    filter_date_from, filter_date_to, date_from, date_to = get_report_dates(request)
+
+    context = {
+        'report': get_profit_and_loss(date_from, date_to),
+        'filter_date_from': filter_date_from,
+        'filter_date_to': filter_date_to,
+    }
+
+    if not is_ajax(request):
+        return render(request, 'profit_loss/list.html', context)
+
+    return render(request, 'profit_loss/_table_fragment.html', context)
@@ -0,0 +1,95 @@
+import csv
+import tempfile
+
+import openpyxl
+from django.contrib.auth.decorators import login_required
+from django.http import FileResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.utils import timezone
+
+from accounts.models import LedgerAccount
+from accounts.utils.ledger_statement import get_ledger_statement, iter_statement_lines
+from commons.utils import is_ajax, parse_date_range
+
+EXPORT_HEADER = ['Date', 'Reference', 'Type', 'Details', 'Debit', 'Credit', 'Balance']
+
+
+@login_required
+def ledger_statement(request, pk):
+    ledger = get_object_or_404(LedgerAccount, pk=pk)
+    export_format = request.GET.get('export_format', None)
+
+    # Default to the current month
+    date_from, date_to = parse_date_range(request, timezone.localdate().replace(day=1), timezone.localdate())
+    filter_date_from = date_from.strftime("%d-%m-%Y")
+    filter_date_to = date_to.strftime("%d-%m-%Y")
+
+    if export_format == 'csv':
+        return export_ledger_statement_to_csv(ledger, date_from, date_to)
+    if export_format == 'excel':
+        return export_ledger_statement_to_excel(ledger, date_from, date_to)
+
+    # Pages are addressed by the last line shown rather than an offset
+    statement = get_ledger_statement(ledger, date_from, date_to, after=request.GET.get('after'))
+
+    context = {
+        'ledger': ledger,
+        'statement': statement,
+        'filter_date_from': filter_date_from,
+        'filter_date_to': filter_date_to,
+    }
+
+    if not is_ajax(request):
+        return render(request, 'ledger_statement/list.html', context)
+
+    return render(request, 'ledger_statement/_table_fragment.html', context)
+
+
+def statement_row(line):
+    return [
+        timezone.localtime(line['date']).strftime("%d-%m-%Y %H:%M"), line['reference_no'], line['log_type'],
+        line['details'], line['debit_amount'], line['credit_amount'], line['balance'],
+    ]
+
+
+def statement_filename(ledger, date_from, date_to, extension):
+    return f"ledger_statement_{ledger.pk}_{date_from:%Y%m%d}_{date_to:%Y%m%d}.{extension}"
+
+
+class Echo:
+    """File-like object whose write() hands the line back to the csv writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def export_ledger_statement_to_csv(ledger, date_from, date_to):
+    writer = csv.writer(Echo())
+
+    def rows():
+        yield writer.writerow(EXPORT_HEADER)
+        for line in iter_statement_lines(ledger, date_from, date_to):
+            yield writer.writerow(statement_row(line))
+
+    response = StreamingHttpResponse(rows(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{statement_filename(ledger, date_from, date_to, "csv")}"'
+    return response
+
+
+def export_ledger_statement_to_excel(ledger, date_from, date_to):
+    # A write-only workbook spools rows to disk, and the file is streamed back from there
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title='Statement')
+    sheet.append(EXPORT_HEADER)
+    for line in iter_statement_lines(ledger, date_from, date_to):
+        sheet.append(statement_row(line))
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=statement_filename(ledger, date_from, date_to, 'xlsx'),
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
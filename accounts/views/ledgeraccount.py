@@ -7,7 +7,7 @@ from django.template.loader import render_to_string
 from django.http import JsonResponse
 from django.core.paginator import Paginator
 
-from accounts.models import LedgerAccount
+from accounts.models import Group, LedgerAccount
 from accounts.forms import LedgerAccountForm
 
 class LedgerAccountListView(LoginRequiredMixin, ListView):
@@ -20,6 +20,10 @@ class LedgerAccountListView(LoginRequiredMixin, ListView):
         search = self.request.GET.get('search_input', '').strip()
         if search:
             queryset = queryset.filter(name__icontains=search)
+        group = self.request.GET.get('group', '').strip()
+        if group.isdigit():
+            # Ledgers of the group and of all its sub-groups
+            queryset = queryset.filter(head_group__ancestor_links__ancestor_id=group)
         return queryset
 
     def get_context_data(self, **kwargs):
@@ -30,6 +34,9 @@ class LedgerAccountListView(LoginRequiredMixin, ListView):
         page_obj = paginator.get_page(page_number)
         context['ledgeraccount_list'] = page_obj
         context['filter_search_input'] = self.request.GET.get('search_input', '')
+        group = self.request.GET.get('group', '').strip()
+        context['groups'] = Group.objects.order_by('name')
+        context['selected_group'] = int(group) if group.isdigit() else None
         return context
 
     def render_to_response(self, context, **response_kwargs):
@@ -6,9 +6,13 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.template.loader import render_to_string
 from django.http import JsonResponse
 from django.core.paginator import Paginator
+from django.core.exceptions import ValidationError
+from django.db import transaction
 
 from accounts.models import LedgerAccount, PaymentVoucher
 from accounts.forms import PaymentVoucherForm
+from accounts.utils.period_close import check_document_dates
+from accounts.utils.voucher_import import next_invoice_numbers
 
 
 
@@ -57,8 +61,9 @@ class PaymentVoucherCreateView(LoginRequiredMixin, CreateView):
         paymentvoucher = form.save(commit=False)
         expense_ledger, _ = LedgerAccount.objects.get_or_create(name='Expenses')
         paymentvoucher.expense_ledger = expense_ledger
-        paymentvoucher.invoice_no = self.generate_invoice_number()
-        paymentvoucher.save()
+        with transaction.atomic():
+            paymentvoucher.invoice_no = self.generate_invoice_number()
+            paymentvoucher.save()
         messages.success(self.request, "Expense created successfully.")
         return redirect('paymentvoucher_list')
 
@@ -82,25 +87,8 @@ class PaymentVoucherCreateView(LoginRequiredMixin, CreateView):
     
 
     def generate_invoice_number(self):
-        import datetime
-        today = datetime.date.today()
-        prefix = f"PV-{today.year}-"
-        
-        # Find the last payment voucher of this year
-        last_payment_voucher = PaymentVoucher.objects.filter(
-            invoice_no__startswith=prefix
-        ).order_by('-invoice_no').first()
-        
-        if last_payment_voucher:
-            try:
-                last_number = int(last_payment_voucher.invoice_no.split('-')[-1])
-                new_number = last_number + 1
-            except (ValueError, IndexError):
-                new_number = 1
-        else:
-            new_number = 1
-        
-        return f"{prefix}{new_number:05d}"
+        # Locked like the voucher import, so the two cannot hand out the same number
+        return next_invoice_numbers(PaymentVoucher, 'PV', 1)[0]
 
 class PaymentVoucherUpdateView(LoginRequiredMixin, UpdateView):
     model = PaymentVoucher
@@ -124,6 +112,11 @@ class PaymentVoucherDeleteView(LoginRequiredMixin, DeleteView):
 
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
+        try:
+            check_document_dates(self.object.date)
+        except ValidationError as error:
+            messages.error(request, ' '.join(error.messages))
+            return redirect(self.success_url)
         self.object.delete()
         messages.success(request, "Expense deleted successfully.")
         return redirect(self.success_url)
\ No newline at end of file
@@ -6,9 +6,13 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.template.loader import render_to_string
 from django.http import JsonResponse
 from django.core.paginator import Paginator
+from django.core.exceptions import ValidationError
+from django.db import transaction
 
 from accounts.models import LedgerAccount, ReceiptVoucher
 from accounts.forms import ReceiptVoucherForm
+from accounts.utils.period_close import check_document_dates
+from accounts.utils.voucher_import import next_invoice_numbers
 
 
 
@@ -57,8 +61,9 @@ class ReceiptVoucherCreateView(LoginRequiredMixin, CreateView):
         receiptvoucher = form.save(commit=False)
         income_ledger, _ = LedgerAccount.objects.get_or_create(name='Income')
         receiptvoucher.income_ledger = income_ledger
-        receiptvoucher.invoice_no = self.generate_invoice_number()
-        receiptvoucher.save()
+        with transaction.atomic():
+            receiptvoucher.invoice_no = self.generate_invoice_number()
+            receiptvoucher.save()
         messages.success(self.request, "Income created successfully.")
         return redirect('receiptvoucher_list')
 
@@ -82,25 +87,8 @@ class ReceiptVoucherCreateView(LoginRequiredMixin, CreateView):
     
 
     def generate_invoice_number(self):
-        import datetime
-        today = datetime.date.today()
-        prefix = f"RV-{today.year}-"
-        
-        # Find the last receipt voucher of this year
-        last_receipt_voucher = ReceiptVoucher.objects.filter(
-            invoice_no__startswith=prefix
-        ).order_by('-invoice_no').first()
-        
-        if last_receipt_voucher:
-            try:
-                last_number = int(last_receipt_voucher.invoice_no.split('-')[-1])
-                new_number = last_number + 1
-            except (ValueError, IndexError):
-                new_number = 1
-        else:
-            new_number = 1
-        
-        return f"{prefix}{new_number:05d}"
+        # Locked like the voucher import, so the two cannot hand out the same number
+        return next_invoice_numbers(ReceiptVoucher, 'RV', 1)[0]
 
 class ReceiptVoucherUpdateView(LoginRequiredMixin, UpdateView):
     model = ReceiptVoucher
@@ -124,6 +112,11 @@ class ReceiptVoucherDeleteView(LoginRequiredMixin, DeleteView):
 
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
+        try:
+            check_document_dates(self.object.date)
+        except ValidationError as error:
+            messages.error(request, ' '.join(error.messages))
+            return redirect(self.success_url)
         self.object.delete()
         messages.success(request, "Income deleted successfully.")
         return redirect(self.success_url)
\ No newline at end of file
@@ -0,0 +1,38 @@
+from django.contrib import messages
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import ValidationError
+from django.shortcuts import redirect, render
+from django.views.generic import FormView
+
+from accounts.forms import VoucherImportForm
+from accounts.utils.voucher_import import import_vouchers
+
+LIST_URLS = {'payment': 'paymentvoucher_list', 'receipt': 'receiptvoucher_list'}
+
+
+class VoucherImportView(LoginRequiredMixin, FormView):
+    form_class = VoucherImportForm
+    template_name = 'voucher_import/form.html'
+
+    def get_initial(self):
+        return {'voucher_type': self.request.GET.get('voucher_type', 'payment')}
+
+    def form_valid(self, form):
+        voucher_type = form.cleaned_data['voucher_type']
+        try:
+            vouchers = import_vouchers(form.cleaned_data['file'], voucher_type, user=self.request.user)
+        except ValidationError as error:
+            for message in error.messages:
+                form.add_error('file', message)
+            return self.form_invalid(form)
+
+        messages.success(self.request, f"{len(vouchers)} vouchers imported.")
+        return redirect(LIST_URLS[voucher_type])
+
+    def form_invalid(self, form):
+        errors = []
+        for err_list in form.errors.values():
+            errors.extend(err_list)
+        context = self.get_context_data(form=form)
+        context.update({'messages': errors, 'is_error': True})
+        return render(self.request, self.template_name, context, status=400)
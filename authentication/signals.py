@@ -1,7 +1,8 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from authentication.models import Customer, Supplier
-from accounts.models import LedgerAccount, Group
+from accounts.models import LedgerAccount
+from accounts.utils.posting_cache import get_group
 
 
 # ---------- Customer Signals ----------
@@ -14,7 +15,7 @@ def create_or_update_ledger_for_customer(sender, instance, created, **kwargs):
         defaults={
             'name': instance.name,
             'details': f"Auto-created ledger for customer: {instance.name}",
-            'head_group': Group.objects.filter(name__iexact='Customer').first(),
+            'head_group': get_group('Customer'),
             'is_deletable': True,
             'is_default': False
         }
@@ -40,7 +41,7 @@ def create_or_update_ledger_for_supplier(sender, instance, created, **kwargs):
         defaults={
             'name': instance.name,
             'details': f"Auto-created ledger for supplier: {instance.name}",
-            'head_group': Group.objects.filter(name__iexact='Supplier').first(),
+            'head_group': get_group('Supplier'),
             'is_deletable': True,
             'is_default': False
         }
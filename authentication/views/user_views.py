@@ -22,6 +22,7 @@ from django.db.models import Q, Sum
 # from sms.models import Package, SingleSms
 from sms.utils.report_utils import export_to_pdf, export_transaction_report_to_excel
 # from commons.utils import is_ajax
+from commons.utils import date_range_filter
 
 
 from django.db.models import Sum, Count, Q
@@ -31,7 +32,7 @@ from authentication.models import Customer, Supplier
 from product.models import Product
 from sales.models import Sale, SaleItem
 from purchase.models import Purchase, PurchaseItem
-from inventory.models import InventoryTransaction
+from inventory.models import InventoryTransaction, LowStockAlert
 
 
 
@@ -67,7 +68,7 @@ def home(request):
     total_sales_invoices = Sale.objects.filter(status__in=['confirmed', 'delivered']).count()
     
     # Recently added products (last 10)
-    recent_products = Product.objects.filter(is_active=True).order_by('-created_at')[:10]
+    recent_products = Product.objects.filter(is_active=True).with_stock().order_by('-created_at')[:10]
     
     # Chart data - Monthly sales and purchase data for current year
     current_year = today.year
@@ -100,17 +101,11 @@ def home(request):
             'purchases': float(monthly_purchases)
         })
     
-    # Low stock products (products with stock <= 10)
-    low_stock_products = []
-    for product in Product.objects.filter(is_active=True):
-        if product.stock <= 10:
-            low_stock_products.append({
-                'product': product,
-                'stock': product.stock
-            })
-    
-    # Sort by stock level (lowest first)
-    low_stock_products.sort(key=lambda x: x['stock'])
+    # Low stock products (at or below their reorder point), lowest first
+    low_stock_products = [
+        {'product': alert.product, 'stock': alert.stock}
+        for alert in LowStockAlert.objects.lowest(10)
+    ]
     
     context = {
         'purchase_due_total': purchase_due_total,
@@ -470,11 +465,11 @@ def transaction_report(request):
     if recharged_by and recharged_by != '':
         transactions = transactions.filter(recharged_by__username__icontains=recharged_by)
     if filter_date_from and filter_date_from!='None':
-        date_from = datetime.strptime(filter_date_from, "%d-%m-%Y").strftime("%Y-%m-%d")
-        transactions = transactions.filter(created_at__date__gte=date_from)
+        date_from = datetime.strptime(filter_date_from, "%d-%m-%Y").date()
+        transactions = transactions.filter(date_range_filter('created_at', date_from=date_from))
     if filter_date_to and filter_date_to!='None':
-        date_to = datetime.strptime(filter_date_to, "%d-%m-%Y").strftime("%Y-%m-%d")
-        transactions = transactions.filter(created_at__date__lte=date_to)
+        date_to = datetime.strptime(filter_date_to, "%d-%m-%Y").date()
+        transactions = transactions.filter(date_range_filter('created_at', date_to=date_to))
 
     filter_search_input = request.GET.get('search_input', None)
     print("filter_search_input", filter_search_input)
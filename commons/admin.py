@@ -0,0 +1,14 @@
+class ReadOnlyAdminMixin:
+	"""
+	View-only admin for documents whose stock movements are posted by their
+	views; a save or delete here would skip them.
+	"""
+
+	def has_add_permission(self, request, obj=None):
+		return False
+
+	def has_change_permission(self, request, obj=None):
+		return False
+
+	def has_delete_permission(self, request, obj=None):
+		return False
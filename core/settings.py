@@ -1,4 +1,5 @@
 from pathlib import Path
+from celery.schedules import crontab
 from dotenv import load_dotenv
 from kombu import Exchange, Queue
 import os
@@ -307,6 +308,17 @@ CELERY_TASK_QUEUES = [
 CELERY_TASK_DEFAULT_QUEUE = 'sms_server_queue'
 CELERY_TASK_DEFAULT_ROUTING_KEY = 'sms_server.default'
 
+CELERY_BEAT_SCHEDULE = {
+    'daily-stock-snapshot': {
+        'task': 'inventory.tasks.take_stock_snapshot',
+        'schedule': crontab(hour=0, minute=15),
+    },
+    'apply-account-postings': {
+        'task': 'accounts.tasks.apply_account_postings',
+        'schedule': crontab(),  # every minute
+    },
+}
+
 
 
 # URL settings for password reset
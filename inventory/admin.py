@@ -13,3 +13,52 @@ class InventoryTransactionAdmin(admin.ModelAdmin):
 class InventoryAdjustmentAdmin(admin.ModelAdmin):
 	list_display = [field.name for field in InventoryAdjustment._meta.fields]
 
+
+@admin.register(StockLevel)
+class StockLevelAdmin(admin.ModelAdmin):
+	list_display = [field.name for field in StockLevel._meta.fields]
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+	list_display = [field.name for field in StockSnapshot._meta.fields]
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+	list_display = [field.name for field in StockReservation._meta.fields]
+
+
+@admin.register(LowStockAlert)
+class LowStockAlertAdmin(admin.ModelAdmin):
+	list_display = [field.name for field in LowStockAlert._meta.fields]
+
+
+@admin.register(ProductCost)
+class ProductCostAdmin(admin.ModelAdmin):
+	list_display = [field.name for field in ProductCost._meta.fields]
+
+
+@admin.register(CostLayer)
+class CostLayerAdmin(admin.ModelAdmin):
+	list_display = [field.name for field in CostLayer._meta.fields]
+
+
+@admin.register(StockCount)
+class StockCountAdmin(admin.ModelAdmin):
+	list_display = [field.name for field in StockCount._meta.fields]
+
+
+@admin.register(StockCountLine)
+class StockCountLineAdmin(admin.ModelAdmin):
+	list_display = [field.name for field in StockCountLine._meta.fields]
+
+
+@admin.register(InventoryCompaction)
+class InventoryCompactionAdmin(admin.ModelAdmin):
+	list_display = [field.name for field in InventoryCompaction._meta.fields]
+
+
+@admin.register(InventoryTransactionArchive)
+class InventoryTransactionArchiveAdmin(admin.ModelAdmin):
+	list_display = [field.name for field in InventoryTransactionArchive._meta.fields]
@@ -0,0 +1,12 @@
+from django import forms
+
+
+class StockCountUploadForm(forms.Form):
+    file = forms.FileField(
+        help_text="CSV or XLSX with 'SKU' and 'Counted Quantity' columns.",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'}),
+    )
+    note = forms.CharField(
+        required=False,
+        widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 2, 'placeholder': 'Optional note'}),
+    )
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Sum, Window
+
+from inventory.models import InventoryTransaction, StockLevel
+from product.models import Product
+
+
+class Command(BaseCommand):
+    help = "Backfill InventoryTransaction.balance_after with a windowed running sum, chunked by product."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200, help="Products processed per DB transaction")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows written per UPDATE batch")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        batch_size = options['batch_size']
+        last_id = 0
+        updated = 0
+
+        while True:
+            product_ids = list(
+                Product.all_objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not product_ids:
+                break
+
+            with transaction.atomic():
+                # Keep new postings for these products out until their history is consistent
+                StockLevel.objects.lock(product_ids)
+
+                running = InventoryTransaction.objects.filter(product_id__in=product_ids).annotate(
+                    running_balance=Window(
+                        expression=Sum('quantity'),
+                        partition_by=[F('product_id')],
+                        order_by=[F('date').asc(), F('id').asc()],
+                    )
+                ).order_by().values_list('id', 'running_balance')
+
+                batch = []
+                for pk, balance in running.iterator(chunk_size=batch_size):
+                    batch.append(InventoryTransaction(pk=pk, balance_after=balance))
+                    if len(batch) >= batch_size:
+                        updated += InventoryTransaction.all_objects.bulk_update(batch, ['balance_after'])
+                        batch = []
+                if batch:
+                    updated += InventoryTransaction.all_objects.bulk_update(batch, ['balance_after'])
+
+            last_id = product_ids[-1]
+            self.stdout.write(f"Backfilled running balances up to product #{last_id}")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled balance_after on {updated} transactions."))
@@ -0,0 +1,49 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory.utils.ledger_compaction import compact_inventory_ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Move stock movements dated before a cutoff into the archive, leaving one opening balance "
+        "row per product. Resumable and safe to run again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before',
+            help="First day of the open period (YYYY-MM-DD). Defaults to the first day of this month a year ago.",
+        )
+        parser.add_argument('--chunk-size', type=int, default=200, help="Products processed per DB transaction")
+        parser.add_argument('--batch-size', type=int, default=2000, help="Rows archived per INSERT batch")
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                period_start = datetime.strptime(options['before'], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--before must be a date in YYYY-MM-DD format.")
+        else:
+            today = timezone.localdate()
+            period_start = today.replace(year=today.year - 1, day=1)
+        cutoff = timezone.make_aware(datetime.combine(period_start, time.min))
+
+        def progress(compaction):
+            self.stdout.write(
+                f"Archived {compaction.archived_count} movements up to product #{compaction.last_product_id}"
+            )
+
+        try:
+            compaction = compact_inventory_ledger(
+                cutoff, chunk_size=options['chunk_size'], batch_size=options['batch_size'], progress=progress
+            )
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Ledger compacted before {period_start:%d-%m-%Y}: {compaction.archived_count} movements archived, "
+            f"{compaction.opening_count} opening balances written."
+        ))
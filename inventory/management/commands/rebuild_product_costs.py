@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventory.models import ProductCost, StockLevel
+from product.models import Product
+
+
+class Command(BaseCommand):
+    help = "Replay the ledger to rebuild moving-average costs and FIFO layers in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=200, help="Products processed per DB transaction")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = 0
+        processed = 0
+
+        while True:
+            product_ids = list(
+                Product.all_objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not product_ids:
+                break
+
+            with transaction.atomic():
+                # Hold the level rows of this chunk so concurrent postings wait for the replay
+                StockLevel.objects.lock(product_ids)
+                ProductCost.objects.replay(product_ids)
+
+            processed += len(product_ids)
+            last_id = product_ids[-1]
+            self.stdout.write(f"Rebuilt costs for {processed} products")
+
+        self.stdout.write(self.style.SUCCESS(f"Product costs rebuilt for {processed} products."))
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from inventory.models import InventoryTransaction, LowStockAlert, StockLevel, StockReservation
+from product.models import Product
+
+
+class Command(BaseCommand):
+    help = "Recompute stock levels and low-stock alerts from the ledger and sale reservations in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Products processed per DB transaction")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = 0
+        processed = 0
+
+        while True:
+            product_ids = list(
+                Product.all_objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not product_ids:
+                break
+
+            with transaction.atomic():
+                # Hold the level rows of this chunk so concurrent postings wait for the rebuild
+                list(StockLevel.objects.select_for_update().filter(pk__in=product_ids).values_list('pk', flat=True))
+
+                totals = {
+                    row['product_id']: row
+                    for row in InventoryTransaction.objects.filter(product_id__in=product_ids)
+                    .order_by()
+                    .values('product_id')
+                    .annotate(total=Sum('quantity'), last_id=Max('id'))
+                }
+                reserved = dict(
+                    StockReservation.objects.filter(product_id__in=product_ids)
+                    .order_by()
+                    .values('product_id')
+                    .annotate(total=Sum('quantity'))
+                    .values_list('product_id', 'total')
+                )
+                now = timezone.now()
+                levels = [
+                    StockLevel(
+                        product_id=product_id,
+                        quantity=totals.get(product_id, {}).get('total') or 0,
+                        reserved=reserved.get(product_id) or 0,
+                        last_transaction_id=totals.get(product_id, {}).get('last_id'),
+                        updated_at=now,
+                    )
+                    for product_id in product_ids
+                ]
+                StockLevel.objects.bulk_create(
+                    levels,
+                    update_conflicts=True,
+                    unique_fields=['product'],
+                    update_fields=['quantity', 'reserved', 'last_transaction_id', 'updated_at'],
+                )
+                LowStockAlert.objects.refresh(product_ids)
+
+            processed += len(product_ids)
+            last_id = product_ids[-1]
+            self.stdout.write(f"Rebuilt stock levels for {processed} products")
+
+        self.stdout.write(self.style.SUCCESS(f"Stock levels rebuilt for {processed} products."))
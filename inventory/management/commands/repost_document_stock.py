@@ -0,0 +1,32 @@
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventory.utils.document_posting import post_document_stock
+
+DOCUMENT_MODELS = ('purchase.Purchase', 'purchase_return.PurchaseReturn', 'sales_return.SaleReturn')
+
+
+class Command(BaseCommand):
+    help = (
+        "Bring the stock postings of every purchase, purchase return and sale return in line with its "
+        "items, a document per DB transaction. Repairs documents edited outside their views, e.g. in the admin."
+    )
+
+    def handle(self, *args, **options):
+        for label in DOCUMENT_MODELS:
+            model = apps.get_model(label)
+            posted = failed = 0
+            # Deleted documents are included so their leftover postings are removed
+            for document in model.all_objects.order_by('pk').iterator():
+                try:
+                    with transaction.atomic():
+                        post_document_stock(document)
+                except ValidationError as error:
+                    failed += 1
+                    self.stderr.write(' '.join(error.messages))
+                    continue
+                posted += 1
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {posted} reposted, {failed} failed")
+        self.stdout.write(self.style.SUCCESS("Document stock reposted."))
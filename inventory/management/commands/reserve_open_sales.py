@@ -0,0 +1,45 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from inventory.models import InventoryTransaction
+from inventory.utils.stock_reservation import sync_sale_stock
+from sales.models import Sale
+
+
+class Command(BaseCommand):
+    help = (
+        "Turn the SALE movements that draft and confirmed sales posted before stock reservations existed "
+        "into reservations, a sale per DB transaction. Delivered and cancelled sales are left alone."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="List the sales without converting them")
+
+    def handle(self, *args, **options):
+        posted = InventoryTransaction.objects.filter(
+            transaction_type=InventoryTransaction.TransactionType.SALE,
+            reference_code=OuterRef('invoice_number'),
+        )
+        sales = Sale.objects.filter(
+            Exists(posted), status__in=[Sale.Status.DRAFT, Sale.Status.CONFIRMED]
+        ).order_by('pk')
+
+        converted = failed = 0
+        for sale in sales.iterator():
+            if options['dry_run']:
+                self.stdout.write(f"Sale #{sale.invoice_number} ({sale.status}) holds posted stock")
+                converted += 1
+                continue
+            try:
+                with transaction.atomic():
+                    sync_sale_stock(sale)
+            except ValidationError as error:
+                failed += 1
+                self.stderr.write(f"Sale #{sale.invoice_number}: {' '.join(error.messages)}")
+                continue
+            converted += 1
+
+        verb = "would be converted" if options['dry_run'] else "converted to reservations"
+        self.stdout.write(self.style.SUCCESS(f"{converted} sales {verb}, {failed} failed."))
@@ -1,10 +1,135 @@
-from django.db import models
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Max, Q, Sum
 # from product.models import Product
 from django.utils import timezone
-from utils.base_model import BaseModel
+from inventory.utils.cost_engine import CostState
+from utils.base_model import BaseModel, SoftDeletionManager, SoftDeletionQuerySet
 # Create your models here.
 
 
+class InventoryTransactionQuerySet(SoftDeletionQuerySet):
+    def delete(self, soft=True):
+        # Reverse the stock effect of the removed rows in the same DB transaction
+        with transaction.atomic():
+            removed = list(
+                self.filter(deleted_at__isnull=True)
+                .order_by()
+                .values('pk', 'product_id', 'date', 'quantity')
+            )
+            StockLevel.objects.lock({row['product_id'] for row in removed})
+            result = super().delete(soft=soft)
+
+            deltas = defaultdict(int)
+            for row in removed:
+                deltas[row['product_id']] -= row['quantity']
+                InventoryTransaction.shift_balances_after(
+                    row['product_id'], row['date'], row['pk'], -row['quantity']
+                )
+            StockLevel.objects.apply_deltas(deltas)
+            ProductCost.objects.replay(deltas)
+        return result
+
+
+class InventoryTransactionManager(SoftDeletionManager):
+    def get_queryset(self):
+        return InventoryTransactionQuerySet(self.model, using=self._db).filter(
+            deleted_at__isnull=True
+        )
+
+    def post_many(self, transactions):
+        """
+        Insert many movements with bulk_create and bring stock levels, running
+        balances, snapshots, costs and low-stock alerts up to date in bulk.
+        Meant for imports dated now; if a product already has later movements
+        the rows are saved one by one instead.
+        """
+        transactions = sorted(transactions, key=lambda movement: movement.date)
+        if not transactions:
+            return []
+
+        with transaction.atomic():
+            deltas = defaultdict(int)
+            for movement in transactions:
+                deltas[movement.product_id] += int(movement.quantity)
+            StockLevel.objects.ensure(deltas)
+            StockLevel.objects.lock(deltas)
+
+            if self.filter(product_id__in=list(deltas), date__gt=transactions[0].date).exists():
+                for movement in transactions:
+                    movement.save()
+                return transactions
+
+            # Nothing is dated later, so each running balance continues from the stock level
+            running = dict(StockLevel.objects.filter(pk__in=list(deltas)).values_list('pk', 'quantity'))
+            for movement in transactions:
+                running[movement.product_id] += int(movement.quantity)
+                movement.balance_after = running[movement.product_id]
+            created = self.bulk_create(transactions)
+
+            last_ids = {movement.product_id: movement.pk for movement in created}
+            now = timezone.now()
+            # Every row exists and is locked; an upsert writes them far faster than bulk_update's CASE chain
+            StockLevel.objects.bulk_create(
+                [
+                    StockLevel(product_id=product_id, quantity=quantity, last_transaction_id=last_ids[product_id], updated_at=now)
+                    for product_id, quantity in running.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['product'],
+                update_fields=['quantity', 'last_transaction_id', 'updated_at'],
+            )
+
+            snapshots = StockSnapshot.objects.filter(
+                product_id__in=list(deltas), date__gte=timezone.localdate(transactions[0].date)
+            )
+            if snapshots.exists():
+                for movement in created:
+                    StockSnapshot.objects.filter(
+                        product_id=movement.product_id, date__gte=timezone.localdate(movement.date)
+                    ).update(quantity=F('quantity') + int(movement.quantity))
+
+            ProductCost.objects.append_many(created)
+            LowStockAlert.objects.refresh(deltas)
+        return created
+
+    def update_many(self, transactions, fields=('quantity', 'unit_cost', 'note')):
+        """
+        Save edits to many movements with one bulk_update. Product and date stay
+        as they are; later running balances move by each quantity change, and
+        the stock levels and costs of the products are brought up to date once.
+        """
+        if not transactions:
+            return
+        pks = [movement.pk for movement in transactions]
+        product_ids = {movement.product_id for movement in transactions}
+
+        with transaction.atomic():
+            StockLevel.objects.lock(product_ids)
+            previous = dict(self.filter(pk__in=pks).values_list('pk', 'quantity'))
+
+            deltas = defaultdict(int)
+            changes = {}
+            for movement in transactions:
+                delta = int(movement.quantity) - previous[movement.pk]
+                if delta:
+                    changes[movement.pk] = delta
+                    deltas[movement.product_id] += delta
+                    InventoryTransaction.shift_balances_after(movement.product_id, movement.date, movement.pk, delta)
+
+            # Re-read after every shift so earlier changes of the same product are included
+            balances = dict(self.filter(pk__in=pks).values_list('pk', 'balance_after'))
+            for movement in transactions:
+                movement.balance_after = (balances[movement.pk] or 0) + changes.get(movement.pk, 0)
+            self.bulk_update(transactions, [*fields, 'balance_after'])
+
+            StockLevel.objects.apply_deltas(deltas)
+            ProductCost.objects.replay(product_ids)
+
+
 class InventoryTransaction(BaseModel):
     class TransactionType(models.TextChoices):
         PURCHASE = 'purchase', 'Purchase'
@@ -15,23 +140,504 @@ class InventoryTransaction(BaseModel):
         TRANSFER_IN = 'transfer_in', 'Transfer In'
         TRANSFER_OUT = 'transfer_out', 'Transfer Out'
         INITIAL_STOCK = 'initial_stock', 'Initial Stock'
+        # Written by ledger compaction in place of the archived movements before a cutoff
+        OPENING_BALANCE = 'opening_balance', 'Opening Balance'
 
     date = models.DateTimeField(default=timezone.now)
     product = models.ForeignKey('product.Product', on_delete=models.CASCADE, related_name="transactions")
     transaction_type = models.CharField(max_length=20, choices=TransactionType.choices)
 
-    # TODO tract previous and present stock quantity
-    current_stock = models.IntegerField(null=True, blank=True)
     quantity = models.IntegerField()
+    # Cost per unit for purchases and purchase returns; other movements use the average cost
+    unit_cost = models.DecimalField(max_digits=14, decimal_places=4, null=True, blank=True)
+    # Running stock of the product right after this movement, in (date, id) order
+    balance_after = models.IntegerField(null=True, blank=True, editable=False)
     note = models.TextField(blank=True, null=True)
     reference_code = models.CharField(max_length=100, blank=True, null=True)
 
+    objects = InventoryTransactionManager()
+    all_objects = models.Manager()
+
     class Meta:
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['product', 'date', 'id'], name='inv_txn_product_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.transaction_type} | {self.product.name} | {self.quantity}"
 
+    @staticmethod
+    def shift_balances_after(product_id, date, pk, delta):
+        """
+        Move the running balance of every later movement of the product by `delta`,
+        along with any snapshot taken at or after the movement's day (back-dated postings).
+        """
+        InventoryTransaction.objects.filter(product_id=product_id).filter(
+            Q(date__gt=date) | Q(date=date, pk__gt=pk)
+        ).update(balance_after=F('balance_after') + delta)
+        StockSnapshot.objects.filter(
+            product_id=product_id, date__gte=timezone.localdate(date)
+        ).update(quantity=F('quantity') + delta)
+
+    def balance_before(self):
+        earlier = InventoryTransaction.objects.filter(product_id=self.product_id)
+        if self.pk:
+            earlier = earlier.exclude(pk=self.pk).filter(
+                Q(date__lt=self.date) | Q(date=self.date, pk__lt=self.pk)
+            )
+        else:
+            earlier = earlier.filter(date__lte=self.date)
+
+        prior = list(earlier.order_by('-date', '-pk').values_list('balance_after', flat=True)[:1])
+        if not prior:
+            return 0
+        if prior[0] is None:
+            # History not backfilled yet (see the backfill_balance_after command)
+            return earlier.aggregate(total=Sum('quantity'))['total'] or 0
+        return prior[0]
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = InventoryTransaction.all_objects.filter(pk=self.pk).values(
+                    'product_id', 'quantity', 'deleted_at', 'date'
+                ).first()
+            counted_before = previous is not None and previous['deleted_at'] is None
+            counted = self.deleted_at is None
+
+            # Lock the stock rows first so running balances are assigned in commit order
+            StockLevel.objects.lock({self.product_id, previous['product_id'] if previous else self.product_id})
+
+            # Checked under the lock so a running compaction cannot miss this row
+            cutoff = InventoryCompaction.objects.latest_cutoff()
+            if cutoff and (self.date < cutoff or (previous and previous['date'] < cutoff)):
+                raise ValidationError(
+                    f"Stock movements before {timezone.localtime(cutoff):%d-%m-%Y} are archived and can no longer change."
+                )
+
+            if counted_before:
+                self.shift_balances_after(previous['product_id'], previous['date'], self.pk, -previous['quantity'])
+            self.balance_after = self.balance_before() + int(self.quantity) if counted else None
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'balance_after'}
+
+            super().save(*args, **kwargs)
+
+            if counted:
+                self.shift_balances_after(self.product_id, self.date, self.pk, int(self.quantity))
+
+            deltas = defaultdict(int)
+            if counted_before:
+                deltas[previous['product_id']] -= previous['quantity']
+            if counted:
+                deltas[self.product_id] += int(self.quantity)
+            StockLevel.objects.apply_deltas(deltas, last_transaction_id=self.pk)
+
+            if counted and not counted_before:
+                ProductCost.objects.append(self)
+            elif counted_before:
+                # Edits and deletions change history, so replay the products' costs
+                ProductCost.objects.replay(deltas)
+
+    def delete(self, using=None, soft=True, *args, **kwargs):
+        if soft:
+            # Soft delete goes through save(), which reverses the stock effect
+            return super().delete(using=using, soft=soft, *args, **kwargs)
+
+        with transaction.atomic():
+            counted = self.deleted_at is None
+            pk = self.pk
+            StockLevel.objects.lock({self.product_id})
+            result = super().delete(using=using, soft=soft, *args, **kwargs)
+            if counted:
+                self.shift_balances_after(self.product_id, self.date, pk, -int(self.quantity))
+                StockLevel.objects.apply_deltas({self.product_id: -int(self.quantity)})
+                ProductCost.objects.replay([self.product_id])
+        return result
+
+
+class StockLevelManager(models.Manager):
+    def lock(self, product_ids):
+        # Always lock in product order to avoid deadlocks between concurrent postings
+        return list(
+            self.select_for_update().filter(pk__in=product_ids).order_by('pk').values_list('pk', flat=True)
+        )
+
+    def ensure(self, product_ids):
+        """Create missing level rows from the ledger so they can be locked."""
+        missing = set(product_ids) - set(self.filter(pk__in=product_ids).values_list('pk', flat=True))
+        if not missing:
+            return
+        totals = dict(
+            InventoryTransaction.objects.filter(product_id__in=missing)
+            .order_by()
+            .values('product_id')
+            .annotate(total=Sum('quantity'))
+            .values_list('product_id', 'total')
+        )
+        self.bulk_create(
+            [self.model(product_id=product_id, quantity=totals.get(product_id) or 0) for product_id in missing],
+            ignore_conflicts=True,
+        )
+
+    def apply_deltas(self, deltas, last_transaction_id=None):
+        """
+        Apply signed quantity changes per product with atomic F() updates.
+        Rows are touched in product order so concurrent writers lock consistently.
+        A missing row is initialised from the ledger, which already includes the change.
+        """
+        now = timezone.now()
+        for product_id, delta in sorted(deltas.items()):
+            values = {'quantity': F('quantity') + delta, 'updated_at': now}
+            if last_transaction_id is not None:
+                values['last_transaction_id'] = last_transaction_id
+
+            if self.filter(pk=product_id).update(**values):
+                continue
+
+            ledger = InventoryTransaction.objects.filter(product_id=product_id).aggregate(
+                total=Sum('quantity'), last_id=models.Max('id')
+            )
+            try:
+                with transaction.atomic():
+                    self.create(
+                        product_id=product_id,
+                        quantity=ledger['total'] or 0,
+                        last_transaction_id=last_transaction_id or ledger['last_id'],
+                    )
+            except IntegrityError:
+                # Another writer created the row first; apply our change on top of it
+                self.filter(pk=product_id).update(**values)
+
+        LowStockAlert.objects.refresh(deltas)
+
+
+class StockLevel(models.Model):
+    """Materialized on-hand quantity per product, kept in step with InventoryTransaction."""
+
+    product = models.OneToOneField(
+        'product.Product', on_delete=models.CASCADE, primary_key=True, related_name='stock_level'
+    )
+    quantity = models.IntegerField(default=0)
+    # Held by draft/confirmed sales, still on hand but not available to sell
+    reserved = models.IntegerField(default=0)
+    last_transaction_id = models.BigIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = StockLevelManager()
+
+    def __str__(self):
+        return f"{self.product_id} | {self.quantity}"
+
+    @property
+    def available(self):
+        return self.quantity - self.reserved
+
+
+class ProductCostManager(models.Manager):
+    """
+    Keeps ProductCost and CostLayer in step with the ledger. A movement that lands
+    after everything already costed is applied on top of the stored position;
+    anything else (edits, deletions, back-dated movements) replays the product.
+    Callers hold the products' StockLevel locks.
+    """
+
+    def append(self, transaction):
+        self.append_many([transaction])
+
+    def append_many(self, transactions):
+        by_product = defaultdict(list)
+        for transaction in transactions:
+            by_product[transaction.product_id].append(transaction)
+        for movements in by_product.values():
+            movements.sort(key=lambda movement: (movement.date, movement.pk))
+
+        costs = self.in_bulk(list(by_product))
+        replay = [
+            product_id for product_id, movements in by_product.items()
+            if product_id in costs and costs[product_id].last_date
+            and (costs[product_id].last_date, costs[product_id].last_transaction_id) > (movements[0].date, movements[0].pk)
+        ]
+        layers = self.open_layers(set(by_product) - set(replay))
+
+        positions = []
+        for product_id, movements in by_product.items():
+            if product_id in replay:
+                continue
+            cost = costs.get(product_id)
+            state = CostState(
+                quantity=cost.quantity if cost else 0,
+                average_cost=cost.average_cost if cost else 0,
+                stock_value=cost.stock_value if cost else 0,
+                layers=layers[product_id],
+            )
+            for movement in movements:
+                state.apply(movement.pk, movement.date, int(movement.quantity), movement.unit_cost)
+            positions.append((product_id, state, movements[-1].pk, movements[-1].date))
+
+        self.store(positions, layers)
+        if replay:
+            self.replay(replay)
+
+    def replay(self, product_ids):
+        product_ids = sorted(product_ids)
+        positions = []
+        for product_id in product_ids:
+            state = CostState()
+            last_id = last_date = None
+            movements = (
+                InventoryTransaction.objects.filter(product_id=product_id)
+                .order_by('date', 'id')
+                .values_list('id', 'date', 'quantity', 'unit_cost')
+            )
+            for last_id, last_date, quantity, unit_cost in movements.iterator():
+                state.apply(last_id, last_date, quantity, unit_cost)
+            positions.append((product_id, state, last_id, last_date))
+
+        self.store(positions, self.open_layers(product_ids))
+
+    def open_layers(self, product_ids):
+        layers = defaultdict(list)
+        rows = (
+            CostLayer.objects.filter(product_id__in=list(product_ids))
+            .order_by('date', 'transaction_id')
+            .values_list('product_id', 'transaction_id', 'date', 'unit_cost', 'remaining')
+        )
+        for product_id, *layer in rows:
+            layers[product_id].append(layer)
+        return layers
+
+    def store(self, positions, previous_layers):
+        if not positions:
+            return
+        self.bulk_create(
+            [
+                self.model(
+                    product_id=product_id,
+                    quantity=state.quantity,
+                    average_cost=state.average_cost,
+                    stock_value=state.stock_value,
+                    fifo_value=state.fifo_value,
+                    last_transaction_id=last_transaction_id,
+                    last_date=last_date,
+                )
+                for product_id, state, last_transaction_id, last_date in positions
+            ],
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=[
+                'quantity', 'average_cost', 'stock_value', 'fifo_value',
+                'last_transaction_id', 'last_date', 'updated_at',
+            ],
+        )
+
+        # Only write the layers that changed; usually one consumed and at most one new
+        consumed, changed, created = [], [], []
+        for product_id, state, _, _ in positions:
+            before = {transaction_id: remaining for transaction_id, _, _, remaining in previous_layers[product_id]}
+            after = {layer[0] for layer in state.layers}
+            consumed.extend(transaction_id for transaction_id in before if transaction_id not in after)
+            for transaction_id, date, unit_cost, remaining in state.layers:
+                if transaction_id not in before:
+                    created.append(CostLayer(
+                        product_id=product_id, transaction_id=transaction_id, date=date,
+                        unit_cost=unit_cost, remaining=remaining,
+                    ))
+                elif before[transaction_id] != remaining:
+                    changed.append(CostLayer(transaction_id=transaction_id, remaining=remaining))
+
+        if consumed:
+            CostLayer.objects.filter(pk__in=consumed).delete()
+        if changed:
+            CostLayer.objects.bulk_update(changed, ['remaining'])
+        if created:
+            CostLayer.objects.bulk_create(created)
+
+
+class ProductCost(models.Model):
+    """Moving-average and FIFO valuation of a product, maintained with each ledger write."""
+
+    product = models.OneToOneField('product.Product', on_delete=models.CASCADE, primary_key=True, related_name='cost')
+    quantity = models.IntegerField(default=0)
+    average_cost = models.DecimalField(max_digits=14, decimal_places=4, default=0)
+    stock_value = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    fifo_value = models.DecimalField(max_digits=18, decimal_places=4, default=0)
+    last_transaction_id = models.BigIntegerField(null=True, blank=True)
+    last_date = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ProductCostManager()
+
+    def __str__(self):
+        return f"{self.product_id} | {self.quantity} @ {self.average_cost}"
+
+
+class CostLayer(models.Model):
+    """Unconsumed remainder of a receipt, consumed oldest first for FIFO valuation."""
+
+    product = models.ForeignKey('product.Product', on_delete=models.CASCADE, related_name='cost_layers')
+    transaction = models.OneToOneField(
+        InventoryTransaction, on_delete=models.CASCADE, primary_key=True, related_name='cost_layer'
+    )
+    date = models.DateTimeField()
+    unit_cost = models.DecimalField(max_digits=14, decimal_places=4)
+    remaining = models.IntegerField()
+
+    class Meta:
+        ordering = ['date', 'transaction_id']
+        indexes = [
+            models.Index(fields=['product', 'date'], name='cost_layer_product_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} | {self.remaining} @ {self.unit_cost}"
+
+
+class LowStockAlertManager(models.Manager):
+    def refresh(self, product_ids):
+        """Add or drop the alerts of the given products after their stock or reorder point changed."""
+        product_ids = list(product_ids)
+        if not product_ids:
+            return
+        Product = self.model._meta.get_field('product').related_model
+        low = [
+            self.model(product_id=product_id, stock=quantity or 0, reorder_point=reorder_point)
+            for product_id, quantity, reorder_point in Product.all_objects.filter(pk__in=product_ids)
+            .values_list('pk', 'stock_level__quantity', 'reorder_point')
+            if (quantity or 0) <= reorder_point
+        ]
+        self.filter(pk__in=product_ids).exclude(pk__in=[alert.product_id for alert in low]).delete()
+        if low:
+            # Existing alerts keep their crossed_at; only the figures move
+            self.bulk_create(
+                low, update_conflicts=True, unique_fields=['product'], update_fields=['stock', 'reorder_point']
+            )
+
+    def lowest(self, limit=10):
+        return self.filter(
+            product__is_active=True, product__deleted_at__isnull=True
+        ).select_related('product__brand').order_by('stock')[:limit]
+
+
+class LowStockAlert(models.Model):
+    """Products at or below their reorder point, kept up to date with every stock change."""
+
+    product = models.OneToOneField(
+        'product.Product', on_delete=models.CASCADE, primary_key=True, related_name='low_stock_alert'
+    )
+    stock = models.IntegerField(default=0)
+    reorder_point = models.IntegerField(default=0)
+    crossed_at = models.DateTimeField(auto_now_add=True)
+
+    objects = LowStockAlertManager()
+
+    class Meta:
+        ordering = ['stock']
+        indexes = [
+            models.Index(fields=['stock'], name='low_stock_alert_stock_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} | {self.stock} <= {self.reorder_point}"
+
+
+class StockReservation(models.Model):
+    """Units of a product held by an undelivered sale; StockLevel.reserved is their sum."""
+
+    sale = models.ForeignKey('sales.Sale', on_delete=models.CASCADE, related_name='stock_reservations')
+    product = models.ForeignKey('product.Product', on_delete=models.CASCADE, related_name='stock_reservations')
+    quantity = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['sale', 'product'], name='unique_stock_reservation_sale_product'),
+        ]
+
+    def __str__(self):
+        return f"{self.sale_id} | {self.product_id} | {self.quantity}"
+
+
+class StockSnapshot(models.Model):
+    """Closing stock of a product at the end of `date`, taken daily for historical queries."""
+
+    product = models.ForeignKey('product.Product', on_delete=models.CASCADE, related_name='stock_snapshots')
+    date = models.DateField(db_index=True)
+    quantity = models.IntegerField(default=0)
+    value = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'date'], name='unique_stock_snapshot_product_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} | {self.date} | {self.quantity}"
+
+
+class InventoryCompactionManager(models.Manager):
+    def latest_cutoff(self):
+        """Start of the open period: movements dated earlier live in the archive."""
+        return self.aggregate(latest=Max('cutoff'))['latest']
+
+
+class InventoryCompaction(models.Model):
+    """
+    One ledger compaction run. Products are processed in id order and
+    `last_product_id` records the progress, so an interrupted run resumes.
+    """
+
+    cutoff = models.DateTimeField(unique=True)
+    last_product_id = models.BigIntegerField(default=0)
+    archived_count = models.PositiveIntegerField(default=0)
+    opening_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    objects = InventoryCompactionManager()
+
+    class Meta:
+        ordering = ['-cutoff']
+
+    def __str__(self):
+        return f"{self.cutoff:%Y-%m-%d} | {'done' if self.completed_at else f'at product #{self.last_product_id}'}"
+
+
+class InventoryTransactionArchive(models.Model):
+    """
+    Movements moved out of InventoryTransaction by compaction, stored unchanged
+    under their original id. Opening balance rows are never archived, so the
+    archive plus the live non-opening rows is the complete history.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    date = models.DateTimeField()
+    product = models.ForeignKey('product.Product', on_delete=models.CASCADE, related_name='archived_transactions')
+    transaction_type = models.CharField(max_length=20, choices=InventoryTransaction.TransactionType.choices)
+    quantity = models.IntegerField()
+    unit_cost = models.DecimalField(max_digits=14, decimal_places=4, null=True, blank=True)
+    balance_after = models.IntegerField(null=True, blank=True)
+    note = models.TextField(blank=True, null=True)
+    reference_code = models.CharField(max_length=100, blank=True, null=True)
+    created_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    compaction = models.ForeignKey(InventoryCompaction, on_delete=models.PROTECT, related_name='archived_transactions')
+
+    class Meta:
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['product', 'date', 'id'], name='inv_archive_product_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_type} | {self.product_id} | {self.quantity} (archived)"
 
 
 class InventoryAdjustment(BaseModel):
@@ -53,4 +659,36 @@ class InventoryAdjustment(BaseModel):
         ordering = ['-date']
 
     def __str__(self):
-        return f"{self.product} - {self.adjustment_type} ({self.quantity}) on {self.date.date()}"
\ No newline at end of file
+        return f"{self.product} - {self.adjustment_type} ({self.quantity}) on {self.date.date()}"
+
+class StockCount(BaseModel):
+    """A physical count uploaded as a file and posted as adjustments for every variance."""
+
+    reference = models.CharField(max_length=50)
+    date = models.DateTimeField(default=timezone.now)
+    file_name = models.CharField(max_length=255, blank=True)
+    note = models.TextField(blank=True, null=True)
+    line_count = models.PositiveIntegerField(default=0)
+    variance_count = models.PositiveIntegerField(default=0)
+
+    unique_fields = ['reference']
+
+    class Meta:
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.reference} ({self.line_count} lines)"
+
+
+class StockCountLine(models.Model):
+    stock_count = models.ForeignKey(StockCount, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey('product.Product', on_delete=models.CASCADE, related_name='stock_count_lines')
+    system_quantity = models.IntegerField()
+    counted_quantity = models.IntegerField()
+    variance = models.IntegerField()
+    adjustment = models.OneToOneField(
+        InventoryAdjustment, on_delete=models.SET_NULL, null=True, blank=True, related_name='stock_count_line'
+    )
+
+    def __str__(self):
+        return f"{self.stock_count_id} | {self.product_id} | {self.variance:+d}"
@@ -20,7 +20,6 @@ def create_inventory_transaction(sender, instance, created, **kwargs):
         transaction_type=InventoryTransaction.TransactionType.ADJUSTMENT,
         product=instance.product,
         defaults={
-            "current_stock": instance.product.stock,
             "quantity": quantity_change,
             "note": f"Stock Adjustment: {instance.reason}",
             "created_by": getattr(instance, "created_by", None),  # optional
@@ -0,0 +1,16 @@
+from datetime import date, timedelta
+
+from celery import shared_task
+from django.utils import timezone
+
+from inventory.utils.stock_snapshot import create_stock_snapshots
+
+
+@shared_task
+def take_stock_snapshot(snapshot_date=None):
+    # Runs shortly after midnight, so the default is the day that just closed
+    if snapshot_date:
+        snapshot_date = date.fromisoformat(snapshot_date)
+    else:
+        snapshot_date = timezone.localdate() - timedelta(days=1)
+    return create_stock_snapshots(snapshot_date)
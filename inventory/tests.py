@@ -1,3 +1,503 @@
-from django.test import TestCase
+import multiprocessing
+import random
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.db.models import Min, Sum
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from authentication.models import Customer
+from inventory.models import (
+    CostLayer, InventoryAdjustment, InventoryTransaction, InventoryTransactionArchive, ProductCost, StockCount,
+    StockLevel, StockReservation,
+)
+from inventory.utils.document_posting import post_document_stock
+from inventory.utils.ledger_compaction import compact_inventory_ledger
+from inventory.utils.stock_count import post_stock_count
+from inventory.utils.stock_quantity import get_stock_as_of
+from inventory.utils.stock_reservation import InsufficientStock, sync_sale_stock
+from inventory.views.movement_report import get_movement_queryset
+from product.models import Product
+from purchase.models import Purchase, PurchaseItem
+from sales.models import Sale, SaleItem
+from sales_return.models import SaleReturn, SaleReturnItem
+from utils.base_model import soft_delete_related_objects
 
 # Create your tests here.
+
+
+def create_sale(customer, invoice_number, lines, status=Sale.Status.DRAFT):
+    sale = Sale.objects.create(
+        customer=customer, invoice_number=invoice_number, sale_date=date.today(), status=status
+    )
+    for product, quantity in lines:
+        SaleItem.objects.create(
+            sale=sale, product=product, quantity=quantity, unit_price=product.price, total_price=product.price * quantity
+        )
+    return sale
+
+
+def receive_stock(product, quantity):
+    InventoryTransaction.objects.create(
+        product=product, transaction_type=InventoryTransaction.TransactionType.INITIAL_STOCK, quantity=quantity
+    )
+
+
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name='Walk-in', phone='0100')
+        self.product = Product.objects.create(name='Pen', price=10)
+        receive_stock(self.product, 5)
+
+    def level(self):
+        return StockLevel.objects.get(pk=self.product.pk)
+
+    def test_draft_sale_reserves_without_touching_on_hand(self):
+        sale = create_sale(self.customer, 'S-1', [(self.product, 3)])
+        sync_sale_stock(sale)
+
+        self.assertEqual((self.level().quantity, self.level().reserved), (5, 3))
+        self.assertEqual(StockReservation.objects.get(sale=sale).quantity, 3)
+
+    def test_reserved_stock_cannot_be_sold_again(self):
+        sync_sale_stock(create_sale(self.customer, 'S-1', [(self.product, 3)]))
+
+        with self.assertRaises(InsufficientStock):
+            sync_sale_stock(create_sale(self.customer, 'S-2', [(self.product, 3)]))
+
+    def test_delivery_posts_the_sale_and_releases_the_reservation(self):
+        sale = create_sale(self.customer, 'S-1', [(self.product, 2), (self.product, 1)])
+        sync_sale_stock(sale)
+
+        sale.status = Sale.Status.DELIVERED
+        sale.save()
+        sync_sale_stock(sale)
+
+        self.assertEqual((self.level().quantity, self.level().reserved), (2, 0))
+        self.assertFalse(StockReservation.objects.filter(sale=sale).exists())
+
+        sale.status = Sale.Status.CANCELLED
+        sale.save()
+        sync_sale_stock(sale)
+
+        self.assertEqual((self.level().quantity, self.level().reserved), (5, 0))
+
+    def test_sale_with_compacted_postings_cannot_change(self):
+        sale = create_sale(self.customer, 'S-1', [(self.product, 2)], status=Sale.Status.DELIVERED)
+        sync_sale_stock(sale)
+        InventoryTransaction.objects.update(date=timezone.now() - timedelta(days=10))
+        compact_inventory_ledger(timezone.now() - timedelta(days=5))
+
+        with self.assertRaises(ValidationError):
+            sync_sale_stock(sale)
+        self.assertEqual(self.level().quantity, 3)
+
+    def test_legacy_postings_of_open_sales_become_reservations(self):
+        # Confirmed before reservations existed: the item signals posted the sale outright
+        sale = create_sale(self.customer, 'S-1', [(self.product, 2)], status=Sale.Status.CONFIRMED)
+        InventoryTransaction.objects.create(
+            product=self.product, transaction_type=InventoryTransaction.TransactionType.SALE,
+            quantity=-2, reference_code='S-1',
+        )
+        self.assertEqual((self.level().quantity, self.level().reserved), (3, 0))
+
+        call_command('reserve_open_sales', stdout=StringIO())
+
+        self.assertEqual((self.level().quantity, self.level().reserved), (5, 2))
+        self.assertEqual(StockReservation.objects.get(sale=sale).quantity, 2)
+
+
+class ProductCostTests(TestCase):
+    def setUp(self):
+        # Soft deletes queue a Celery task; run it inline instead of needing a broker
+        patcher = mock.patch.object(soft_delete_related_objects, 'delay', side_effect=soft_delete_related_objects)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.product = Product.objects.create(name='Pen', price=10)
+        self.start = timezone.now() - timedelta(days=30)
+
+    def post(self, quantity, unit_cost=None, days=0):
+        return InventoryTransaction.objects.create(
+            product=self.product,
+            transaction_type=InventoryTransaction.TransactionType.PURCHASE if quantity > 0 else InventoryTransaction.TransactionType.SALE,
+            quantity=quantity,
+            unit_cost=unit_cost,
+            date=self.start + timedelta(days=days),
+        )
+
+    def position(self):
+        cost = ProductCost.objects.get(pk=self.product.pk)
+        layers = list(CostLayer.objects.filter(product=self.product).values_list('transaction_id', 'unit_cost', 'remaining'))
+        return (cost.quantity, cost.average_cost, cost.stock_value, cost.fifo_value, cost.last_transaction_id), layers
+
+    def test_average_and_fifo_costs(self):
+        self.post(10, Decimal('5'), days=1)
+        second = self.post(10, Decimal('8'), days=2)
+        self.post(-15, days=3)
+
+        cost = ProductCost.objects.get(pk=self.product.pk)
+        self.assertEqual(cost.quantity, 5)
+        self.assertEqual(cost.average_cost, Decimal('6.5'))
+        self.assertEqual(cost.stock_value, Decimal('32.5'))
+        self.assertEqual(cost.fifo_value, Decimal('40'))
+        self.assertEqual(
+            list(CostLayer.objects.filter(product=self.product).values_list('transaction_id', 'remaining')),
+            [(second.pk, 5)],
+        )
+
+    def test_incremental_postings_match_a_full_replay(self):
+        rng = random.Random(7)
+        movements = []
+        for day in range(1, 120):
+            roll = rng.random()
+            if roll < 0.45 or not movements:
+                movements.append(self.post(rng.randint(1, 20), Decimal(rng.randint(100, 900)) / 100, days=day))
+            elif roll < 0.85:
+                movements.append(self.post(-rng.randint(1, 15), days=day))
+            elif roll < 0.9:
+                # Back-dated receipt
+                movements.append(self.post(rng.randint(1, 5), Decimal('4.25'), days=rng.randint(0, day)))
+            elif roll < 0.95:
+                movement = rng.choice(movements)
+                movement.quantity += 1 if movement.quantity > 0 else -1
+                movement.save()
+            else:
+                movements.pop(rng.randrange(len(movements))).delete()
+
+            if day % 20 == 0:
+                incremental = self.position()
+                ProductCost.objects.replay([self.product.pk])
+                self.assertEqual(incremental, self.position(), f"diverged by day {day}")
+
+        ledger_total = InventoryTransaction.objects.filter(product=self.product).aggregate(total=Sum('quantity'))['total']
+        self.assertEqual(ProductCost.objects.get(pk=self.product.pk).quantity, ledger_total)
+
+
+class RunningBalanceTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Pen', price=10)
+        self.start = timezone.now() - timedelta(days=10)
+        for days, quantity in ((1, 10), (3, -4), (5, 6)):
+            self.post(quantity, days)
+
+    def post(self, quantity, days):
+        return InventoryTransaction.objects.create(
+            product=self.product, transaction_type=InventoryTransaction.TransactionType.ADJUSTMENT,
+            quantity=quantity, date=self.start + timedelta(days=days),
+        )
+
+    def balances(self):
+        return list(
+            InventoryTransaction.objects.filter(product=self.product).order_by('date', 'id')
+            .values_list('quantity', 'balance_after')
+        )
+
+    def test_back_dated_movement_shifts_later_balances(self):
+        self.post(3, 2)
+        self.assertEqual(self.balances(), [(10, 10), (3, 13), (-4, 9), (6, 15)])
+
+    def test_backfill_recomputes_running_balances(self):
+        InventoryTransaction.all_objects.update(balance_after=None)
+
+        call_command('backfill_balance_after', stdout=StringIO())
+
+        self.assertEqual(self.balances(), [(10, 10), (-4, 6), (6, 12)])
+
+    def test_stock_as_of_reads_the_last_running_balance(self):
+        day = timezone.localdate(self.start + timedelta(days=4))
+        self.assertEqual(get_stock_as_of([self.product.pk], day), {self.product.pk: 6})
+
+        # The balance is read rather than summed...
+        InventoryTransaction.all_objects.filter(quantity=-4).update(balance_after=99)
+        self.assertEqual(get_stock_as_of([self.product.pk], day), {self.product.pk: 99})
+        # ...unless the history was never backfilled
+        InventoryTransaction.all_objects.update(balance_after=None)
+        self.assertEqual(get_stock_as_of([self.product.pk], day), {self.product.pk: 6})
+
+
+class LedgerCompactionTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Pen', price=10)
+        self.cutoff = timezone.now() - timedelta(days=30)
+        for days, quantity in ((60, 10), (50, -4), (40, 6), (20, -3), (10, 5)):
+            InventoryTransaction.objects.create(
+                product=self.product,
+                transaction_type=InventoryTransaction.TransactionType.ADJUSTMENT,
+                quantity=quantity,
+                date=timezone.now() - timedelta(days=days),
+            )
+
+    def test_compaction_keeps_stock_history(self):
+        days = [timezone.localdate() - timedelta(days=days) for days in (55, 45, 35, 15, 0)]
+        before = [get_stock_as_of([self.product.pk], day) for day in days]
+
+        compact_inventory_ledger(self.cutoff)
+        compact_inventory_ledger(self.cutoff)
+
+        self.assertEqual(InventoryTransactionArchive.objects.count(), 3)
+        opening = InventoryTransaction.objects.get(transaction_type=InventoryTransaction.TransactionType.OPENING_BALANCE)
+        self.assertEqual((opening.quantity, opening.balance_after), (12, 12))
+        self.assertEqual(StockLevel.objects.get(pk=self.product.pk).quantity, 14)
+        self.assertEqual([get_stock_as_of([self.product.pk], day) for day in days], before)
+
+    def test_closed_period_rejects_postings(self):
+        compact_inventory_ledger(self.cutoff)
+
+        with self.assertRaises(ValidationError):
+            InventoryTransaction.objects.create(
+                product=self.product,
+                transaction_type=InventoryTransaction.TransactionType.ADJUSTMENT,
+                quantity=1,
+                date=self.cutoff - timedelta(days=1),
+            )
+
+
+
+class DocumentPostingTests(TestCase):
+    def setUp(self):
+        # Soft deletes queue a Celery task; run it inline instead of needing a broker
+        patcher = mock.patch.object(soft_delete_related_objects, 'delay', side_effect=soft_delete_related_objects)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pen = Product.objects.create(name='Pen', price=10)
+        self.ink = Product.objects.create(name='Ink', price=4)
+        self.purchase = Purchase.objects.create(invoice_number='P-1', purchase_date=date.today())
+        self.pen_line = self.add_line(self.pen, 5, 6)
+        self.ink_line = self.add_line(self.ink, 3, 2)
+
+    def add_line(self, product, quantity, unit_price):
+        return PurchaseItem.objects.create(
+            purchase=self.purchase, product=product, quantity=quantity, unit_price=unit_price,
+            total_price=quantity * unit_price,
+        )
+
+    def postings(self):
+        return set(
+            InventoryTransaction.objects.filter(transaction_type=InventoryTransaction.TransactionType.PURCHASE)
+            .values_list('reference_code', 'product_id', 'quantity', 'unit_cost')
+        )
+
+    def test_lines_post_once_each(self):
+        post_document_stock(self.purchase)
+        post_document_stock(self.purchase)
+
+        self.assertEqual(self.postings(), {
+            (f'P-1-{self.pen_line.pk}', self.pen.pk, 5, Decimal('6')),
+            (f'P-1-{self.ink_line.pk}', self.ink.pk, 3, Decimal('2')),
+        })
+        self.assertEqual(StockLevel.objects.get(pk=self.pen.pk).quantity, 5)
+
+    def test_edited_and_deleted_lines(self):
+        post_document_stock(self.purchase)
+        posted_on = InventoryTransaction.objects.get(reference_code=f'P-1-{self.pen_line.pk}').date
+
+        self.pen_line.quantity = 8
+        self.pen_line.save()
+        self.ink_line.delete()
+        post_document_stock(self.purchase)
+
+        self.assertEqual(self.postings(), {(f'P-1-{self.pen_line.pk}', self.pen.pk, 8, Decimal('6'))})
+        self.assertEqual(InventoryTransaction.objects.get(reference_code=f'P-1-{self.pen_line.pk}').date, posted_on)
+        self.assertEqual(StockLevel.objects.get(pk=self.ink.pk).quantity, 0)
+
+    def test_deleted_document_removes_its_postings(self):
+        post_document_stock(self.purchase)
+
+        self.purchase.delete()
+        post_document_stock(self.purchase)
+
+        self.assertEqual(self.postings(), set())
+        self.assertEqual(StockLevel.objects.get(pk=self.pen.pk).quantity, 0)
+
+    def test_compacted_postings_cannot_change(self):
+        post_document_stock(self.purchase)
+        InventoryTransaction.objects.update(date=timezone.now() - timedelta(days=60))
+        compact_inventory_ledger(timezone.now() - timedelta(days=30))
+
+        self.pen_line.quantity = 8
+        self.pen_line.save()
+        with self.assertRaises(ValidationError):
+            post_document_stock(self.purchase)
+
+    def test_legacy_bare_number_postings_are_replaced(self):
+        sale_return = SaleReturn.objects.create(return_number='R-1', return_date=date.today())
+        line = SaleReturnItem.objects.create(
+            sale_return=sale_return, product=self.pen, quantity=2, unit_price=10, total_price=20
+        )
+        InventoryTransaction.objects.create(
+            product=self.pen, transaction_type=InventoryTransaction.TransactionType.SALE_RETURN,
+            reference_code='R-1', quantity=2,
+        )
+
+        post_document_stock(sale_return)
+
+        self.assertEqual(
+            list(InventoryTransaction.objects.filter(
+                transaction_type=InventoryTransaction.TransactionType.SALE_RETURN
+            ).values_list('reference_code', 'quantity')),
+            [(f'R-1-{line.pk}', 2)],
+        )
+        self.assertEqual(StockLevel.objects.get(pk=self.pen.pk).quantity, 2)
+
+
+class StockCountTests(TestCase):
+    def setUp(self):
+        self.pen = Product.objects.create(name='Pen', price=10, sku='pen-1')
+        self.ink = Product.objects.create(name='Ink', price=4, sku='INK-2')
+        self.cup = Product.objects.create(name='Cup', price=6, sku='CUP')
+        InventoryTransaction.objects.create(
+            product=self.pen, transaction_type=InventoryTransaction.TransactionType.PURCHASE,
+            quantity=5, unit_cost=Decimal('4'), date=timezone.now() - timedelta(days=1),
+        )
+        receive_stock(self.ink, 3)
+        receive_stock(self.cup, 4)
+
+    def sheet(self, content, name='count.csv'):
+        return SimpleUploadedFile(name, content.encode(), content_type='text/csv')
+
+    def test_variances_post_as_adjustments(self):
+        stock_count = post_stock_count(self.sheet("SKU,Counted Quantity\nPEN-1,7\nink-2,1\nCUP,4\n"))
+
+        self.assertEqual(stock_count.reference, f"SC-{stock_count.pk}")
+        self.assertEqual(
+            sorted(stock_count.lines.values_list('product_id', 'system_quantity', 'counted_quantity', 'variance')),
+            sorted([(self.pen.pk, 5, 7, 2), (self.ink.pk, 3, 1, -2), (self.cup.pk, 4, 4, 0)]),
+        )
+        self.assertEqual(
+            sorted(InventoryAdjustment.objects.values_list('product_id', 'adjustment_type', 'quantity')),
+            sorted([
+                (self.pen.pk, InventoryAdjustment.AdjustmentType.INCREASE, 2),
+                (self.ink.pk, InventoryAdjustment.AdjustmentType.DECREASE, 2),
+            ]),
+        )
+        adjustments = InventoryTransaction.objects.filter(
+            transaction_type=InventoryTransaction.TransactionType.ADJUSTMENT
+        )
+        self.assertEqual(
+            sorted(adjustments.values_list('product_id', 'quantity', 'balance_after')),
+            sorted([(self.pen.pk, 2, 7), (self.ink.pk, -2, 1)]),
+        )
+        for product, quantity in ((self.pen, 7), (self.ink, 1), (self.cup, 4)):
+            self.assertEqual(StockLevel.objects.get(pk=product.pk).quantity, quantity)
+
+        # The bulk write leaves the costs where a replay of the ledger puts them
+        costs = list(ProductCost.objects.order_by('pk').values_list('product_id', 'quantity', 'stock_value'))
+        ProductCost.objects.replay([self.pen.pk, self.ink.pk, self.cup.pk])
+        self.assertEqual(costs, list(ProductCost.objects.order_by('pk').values_list('product_id', 'quantity', 'stock_value')))
+        self.assertEqual(ProductCost.objects.get(pk=self.pen.pk).quantity, 7)
+
+    def test_bad_sheets_are_rejected_whole(self):
+        for content in (
+            "SKU,Counted Quantity\nPEN-1,7\nNOPE,1\n",
+            "SKU,Counted Quantity\nPEN-1,2.6\n",
+            "SKU,Counted Quantity\nPEN-1,-1\n",
+        ):
+            with self.assertRaises(ValidationError):
+                post_stock_count(self.sheet(content))
+        with self.assertRaises(ValidationError):
+            post_stock_count(self.sheet("SKU,Counted Quantity\nPEN-1,7\n", name='count.xls'))
+
+        self.assertFalse(StockCount.objects.exists())
+        self.assertEqual(StockLevel.objects.get(pk=self.pen.pk).quantity, 5)
+
+
+class MovementReportTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name='Pen', price=10)
+        TransactionType = InventoryTransaction.TransactionType
+        for days, transaction_type, quantity in (
+            (60, TransactionType.PURCHASE, 10),
+            (50, TransactionType.SALE, -4),
+            (20, TransactionType.PURCHASE, 6),
+            (10, TransactionType.SALE_RETURN, 1),
+            (5, TransactionType.ADJUSTMENT, -2),
+        ):
+            InventoryTransaction.objects.create(
+                product=self.product, transaction_type=transaction_type, quantity=quantity,
+                date=timezone.now() - timedelta(days=days),
+            )
+
+    def report(self, days_back):
+        today = timezone.localdate()
+        row = get_movement_queryset(today - timedelta(days=days_back), today).get()
+        return {name: row[name] for name in (
+            'opening', 'purchases', 'purchase_returns', 'sales', 'sale_returns', 'adjustments', 'closing'
+        )}
+
+    def test_live_movements(self):
+        self.assertEqual(self.report(55), {
+            'opening': 10, 'purchases': 6, 'purchase_returns': 0, 'sales': -4,
+            'sale_returns': 1, 'adjustments': -2, 'closing': 11,
+        })
+
+    def test_ranges_before_the_cutoff_read_the_archive(self):
+        before = [self.report(days) for days in (55, 25)]
+
+        compact_inventory_ledger(timezone.now() - timedelta(days=30))
+
+        self.assertEqual(InventoryTransactionArchive.objects.count(), 2)
+        # The first range merges archived movements, the second starts after the cutoff
+        self.assertEqual([self.report(days) for days in (55, 25)], before)
+
+
+def checkout(sale_id, results):
+    try:
+        with transaction.atomic():
+            sync_sale_stock(Sale.objects.get(pk=sale_id))
+        results.put('sold')
+    except InsufficientStock:
+        results.put('rejected')
+    except Exception as error:
+        results.put(repr(error))
+    finally:
+        connections.close_all()
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "Needs a database with row-level locks")
+class ConcurrentCheckoutTests(TransactionTestCase):
+    checkouts = 60
+
+    def test_parallel_checkouts_never_oversell(self):
+        customer = Customer.objects.create(name='Walk-in', phone='0100')
+        pen = Product.objects.create(name='Pen', price=10)
+        ink = Product.objects.create(name='Ink', price=20)
+        receive_stock(pen, 20)
+        receive_stock(ink, 30)
+
+        # Alternate the line order so naive per-line locking would deadlock
+        sale_ids = [
+            create_sale(
+                customer, f'S-{number}',
+                [(pen, 1), (ink, 1)] if number % 2 else [(ink, 1), (pen, 1)],
+                status=Sale.Status.DELIVERED,
+            ).pk
+            for number in range(self.checkouts)
+        ]
+
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [context.Process(target=checkout, args=(sale_id, results)) for sale_id in sale_ids]
+        for worker in workers:
+            worker.start()
+        outcomes = [results.get(timeout=60) for _ in workers]
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(outcomes.count('sold'), 20, outcomes)
+        self.assertEqual(outcomes.count('rejected'), self.checkouts - 20, outcomes)
+        for product, remaining in ((pen, 0), (ink, 10)):
+            ledger = InventoryTransaction.objects.filter(product=product).aggregate(
+                total=Sum('quantity'), lowest=Min('balance_after')
+            )
+            self.assertEqual(ledger['total'], remaining)
+            self.assertGreaterEqual(ledger['lowest'], 0)
+            self.assertEqual(StockLevel.objects.get(pk=product.pk).quantity, remaining)
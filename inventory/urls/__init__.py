@@ -1,10 +1,14 @@
 from django.urls import path
 from .stock_report import urlpatterns as stock_report_patterns
+from .movement_report import urlpatterns as movement_report_patterns
 from .adjustment import urlpatterns as adjustment_patterns
+from .stock_count import urlpatterns as stock_count_patterns
 from inventory.views.dashboard import dashboard_view
 
 urlpatterns = [
     path('dashboard/', dashboard_view, name='inventory_dashboard'),
     *stock_report_patterns,
+    *movement_report_patterns,
     *adjustment_patterns,
+    *stock_count_patterns,
 ]
\ No newline at end of file
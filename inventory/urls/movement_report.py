@@ -0,0 +1,6 @@
+from django.urls import path
+from inventory.views.movement_report import movement_report
+
+urlpatterns = [
+    path('movement-report/', movement_report, name='movement_report_list'),
+]
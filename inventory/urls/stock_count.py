@@ -0,0 +1,8 @@
+from django.urls import path
+from inventory.views import stock_count as views
+
+urlpatterns = [
+    path('stock-counts/', views.StockCountListView.as_view(), name='stock_count_list'),
+    path('stock-counts/upload/', views.StockCountCreateView.as_view(), name='stock_count_create'),
+    path('stock-counts/<int:pk>/', views.StockCountDetailView.as_view(), name='stock_count_detail'),
+]
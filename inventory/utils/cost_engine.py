@@ -0,0 +1,72 @@
+from decimal import Decimal
+
+COST_PLACES = Decimal('0.0001')
+ZERO = Decimal('0')
+
+
+def round_cost(value):
+    return Decimal(value).quantize(COST_PLACES)
+
+
+class CostState:
+    """
+    Cost position of one product, moved forward one ledger movement at a time.
+
+    Keeps the moving-average cost and the open FIFO layers (oldest first, as
+    [transaction_id, date, unit_cost, remaining]). Both the incremental posting
+    path and a full replay go through apply(), so they always agree.
+    """
+
+    def __init__(self, quantity=0, average_cost=ZERO, stock_value=ZERO, layers=None):
+        self.quantity = quantity
+        self.average_cost = round_cost(average_cost)
+        self.stock_value = round_cost(stock_value)
+        self.layers = [list(layer) for layer in layers or []]
+
+    @property
+    def fifo_value(self):
+        # Stock below zero has no open layers and therefore no FIFO value
+        return round_cost(sum((unit_cost * remaining for _, _, unit_cost, remaining in self.layers), ZERO))
+
+    def apply(self, transaction_id, date, quantity, unit_cost=None):
+        if quantity > 0:
+            self.receive(transaction_id, date, quantity, unit_cost)
+        elif quantity < 0:
+            self.issue(-quantity, unit_cost)
+
+    def receive(self, transaction_id, date, quantity, unit_cost=None):
+        # Receipts without a price of their own (sale returns, adjustments) come in at average cost
+        cost = round_cost(unit_cost) if unit_cost is not None else self.average_cost
+        shortage = max(0, -self.quantity)
+
+        self.quantity += quantity
+        if shortage:
+            # Units sold while out of stock are settled first; the average restarts at this cost
+            self.average_cost = cost
+            self.stock_value = round_cost(self.quantity * cost)
+        else:
+            self.stock_value = round_cost(self.stock_value + quantity * cost)
+            self.average_cost = round_cost(self.stock_value / self.quantity)
+
+        if quantity > shortage:
+            self.layers.append([transaction_id, date, cost, quantity - shortage])
+
+    def issue(self, quantity, unit_cost=None):
+        # Purchase returns leave at their own price, everything else at average cost
+        cost = round_cost(unit_cost) if unit_cost is not None else self.average_cost
+
+        self.quantity -= quantity
+        if self.quantity > 0:
+            self.stock_value = round_cost(self.stock_value - quantity * cost)
+            if unit_cost is not None:
+                self.average_cost = round_cost(self.stock_value / self.quantity)
+        else:
+            self.stock_value = round_cost(self.quantity * self.average_cost)
+
+        while quantity and self.layers:
+            oldest = self.layers[0]
+            taken = min(quantity, oldest[3])
+            oldest[3] -= taken
+            quantity -= taken
+            if not oldest[3]:
+                self.layers.pop(0)
@@ -0,0 +1,115 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from inventory.models import InventoryTransaction, InventoryTransactionArchive
+
+TransactionType = InventoryTransaction.TransactionType
+
+# How the lines of each document model post to the ledger, keyed by model name
+DOCUMENT_POSTINGS = {
+    'purchase': {
+        'transaction_type': TransactionType.PURCHASE,
+        'number_field': 'invoice_number',
+        'sign': 1,
+        'unit_cost': True,
+        'note': "Purchase from supplier via purchase #{number}",
+    },
+    'purchasereturn': {
+        'transaction_type': TransactionType.PURCHASE_RETURN,
+        'number_field': 'return_number',
+        'sign': -1,  # Negative quantity = stock out
+        'unit_cost': True,
+        'note': "Returned to supplier via purchase return #{number}",
+    },
+    'salereturn': {
+        'transaction_type': TransactionType.SALE_RETURN,
+        'number_field': 'return_number',
+        'sign': 1,
+        # Returned goods come back at the average cost
+        'unit_cost': False,
+        'note': "Returned by customer via sale return #{number}",
+    },
+}
+
+
+def apply_postings(transaction_type, existing, wanted):
+    """
+    Make a document's live postings `existing` match `wanted`, a
+    {(product_id, reference_code): fields} map. New lines go in with one bulk
+    insert, edited lines with one bulk update and dropped lines are deleted.
+    Edited postings keep their original date.
+    """
+    existing = {(posting.product_id, posting.reference_code): posting for posting in existing}
+
+    new, changed = [], []
+    for (product_id, reference_code), fields in wanted.items():
+        posting = existing.get((product_id, reference_code))
+        if posting is None:
+            new.append(InventoryTransaction(
+                product_id=product_id,
+                transaction_type=transaction_type,
+                reference_code=reference_code,
+                date=timezone.now(),
+                **fields,
+            ))
+        elif any(getattr(posting, name) != value for name, value in fields.items()):
+            for name, value in fields.items():
+                setattr(posting, name, value)
+            changed.append(posting)
+    removed = [posting.pk for key, posting in existing.items() if key not in wanted]
+
+    with transaction.atomic():
+        if removed:
+            InventoryTransaction.objects.filter(pk__in=removed).delete()
+        InventoryTransaction.objects.update_many(changed)
+        InventoryTransaction.objects.post_many(new)
+
+
+def post_document_stock(document):
+    """
+    Bring the stock postings of a purchase, purchase return or sale return in
+    line with its items: one posting per line, referenced as
+    "<document number>-<item id>". Deleted documents post nothing. Call it
+    inside the transaction that writes the document, so a failure rolls the
+    document back with it.
+
+    Raises ValidationError when part of the document lies in a compacted
+    period and can no longer change.
+    """
+    rule = DOCUMENT_POSTINGS[document._meta.model_name]
+    number = getattr(document, rule['number_field'])
+    items = document.items
+    # Soft-deleted lines are read too, so their postings are found and removed
+    lines = list(
+        items.model.all_objects.filter(**{items.field.name: document})
+        .values('pk', 'product_id', 'quantity', 'unit_price', 'deleted_at')
+    )
+    # Returns used to post under the bare document number; those rows are replaced too
+    reference_codes = [number] + [f"{number}-{line['pk']}" for line in lines]
+
+    archived = InventoryTransactionArchive.objects.filter(
+        transaction_type=rule['transaction_type'], reference_code__in=reference_codes
+    )
+    if archived.exists():
+        raise ValidationError(
+            f"{document._meta.verbose_name.capitalize()} #{number} has stock postings in a compacted period and its stock can no longer change."
+        )
+
+    wanted = {}
+    if document.deleted_at is None:
+        note = rule['note'].format(number=number)
+        for line in lines:
+            if line['deleted_at'] is not None:
+                continue
+            wanted[(line['product_id'], f"{number}-{line['pk']}")] = {
+                'quantity': rule['sign'] * int(abs(line['quantity'])),
+                'unit_cost': line['unit_price'] if rule['unit_cost'] else None,
+                'note': note,
+            }
+
+    existing = InventoryTransaction.objects.filter(
+        transaction_type=rule['transaction_type'], reference_code__in=reference_codes
+    )
+    apply_postings(rule['transaction_type'], existing, wanted)
+
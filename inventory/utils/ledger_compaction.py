@@ -0,0 +1,126 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from inventory.models import (
+    InventoryCompaction, InventoryTransaction, InventoryTransactionArchive, ProductCost, StockLevel,
+)
+from inventory.utils.cost_engine import CostState
+from product.models import Product
+
+OPENING_BALANCE = InventoryTransaction.TransactionType.OPENING_BALANCE
+ARCHIVED_FIELDS = (
+    'id', 'date', 'product_id', 'transaction_type', 'quantity', 'unit_cost', 'balance_after',
+    'note', 'reference_code', 'created_at', 'created_by_id', 'deleted_at',
+)
+
+
+def opening_date(cutoff):
+    # Just before the cutoff, so the opening row sorts ahead of every open-period movement
+    return cutoff - timedelta(microseconds=1)
+
+
+def compact_products(compaction, product_ids, batch_size=2000):
+    """
+    Move the movements of `product_ids` dated before the cutoff into the
+    archive and replace them with one OPENING_BALANCE row per product, carrying
+    the closing quantity at the moving-average cost. Returns (archived, openings).
+
+    Open FIFO layers from the closed period collapse into that single opening
+    layer, and later averages can move in the last decimal place since the
+    stock value restarts from the rounded average. Call inside
+    transaction.atomic with the products' stock levels locked.
+    """
+    cutoff = compaction.cutoff
+    closed = InventoryTransaction.all_objects.filter(product_id__in=product_ids, date__lt=cutoff)
+    if not closed.exclude(transaction_type=OPENING_BALANCE, date=opening_date(cutoff)).exists():
+        # Nothing but this cutoff's own opening rows: already compacted
+        return 0, 0
+
+    states = {}
+    touched = set()
+    removed_ids = []
+    batch = []
+    archived = 0
+    rows = closed.order_by('product_id', 'date', 'id').values(*ARCHIVED_FIELDS)
+    for row in rows.iterator(chunk_size=batch_size):
+        removed_ids.append(row['id'])
+        touched.add(row['product_id'])
+        if row['deleted_at'] is None:
+            states.setdefault(row['product_id'], CostState()).apply(
+                row['id'], row['date'], row['quantity'], row['unit_cost']
+            )
+        if row['transaction_type'] == OPENING_BALANCE:
+            # An earlier opening row only summarizes movements the archive already holds
+            continue
+
+        batch.append(InventoryTransactionArchive(compaction=compaction, **row))
+        if len(batch) >= batch_size:
+            InventoryTransactionArchive.objects.bulk_create(batch, ignore_conflicts=True)
+            archived += len(batch)
+            batch = []
+    if batch:
+        InventoryTransactionArchive.objects.bulk_create(batch, ignore_conflicts=True)
+        archived += len(batch)
+
+    # all_objects is a plain manager, so this skips the balance-shifting delete of the live queryset
+    for start in range(0, len(removed_ids), batch_size):
+        InventoryTransaction.all_objects.filter(pk__in=removed_ids[start:start + batch_size]).delete()
+
+    reference = f"OPENING-{timezone.localdate(cutoff):%Y%m%d}"
+    openings = InventoryTransaction.all_objects.bulk_create([
+        InventoryTransaction(
+            product_id=product_id,
+            transaction_type=OPENING_BALANCE,
+            quantity=state.quantity,
+            unit_cost=state.average_cost if state.quantity > 0 else None,
+            balance_after=state.quantity,
+            date=opening_date(cutoff),
+            reference_code=reference,
+            note=f"Opening balance of movements before {timezone.localdate(cutoff):%d-%m-%Y}",
+        )
+        for product_id, state in states.items()
+        if state.quantity
+    ])
+
+    # Cost layers of the archived receipts went with them; rebuild from the compacted ledger
+    ProductCost.objects.replay(touched)
+    return archived, len(openings)
+
+
+def compact_inventory_ledger(cutoff, chunk_size=200, batch_size=2000, progress=None):
+    """
+    Archive every movement dated before `cutoff`, a chunk of products per DB
+    transaction. Progress is stored on the InventoryCompaction row, so running
+    it again resumes an interrupted run and is a no-op once it has finished.
+    """
+    if cutoff > timezone.now():
+        raise ValueError("The compaction cutoff cannot be in the future.")
+    latest = InventoryCompaction.objects.latest_cutoff()
+    if latest and cutoff < latest:
+        raise ValueError(f"The ledger is already compacted up to {timezone.localdate(latest):%d-%m-%Y}.")
+
+    # From here on postings dated before the cutoff are rejected (see InventoryTransaction.save)
+    compaction, _ = InventoryCompaction.objects.get_or_create(cutoff=cutoff)
+
+    while not compaction.completed_at:
+        product_ids = list(
+            Product.all_objects.filter(pk__gt=compaction.last_product_id)
+            .order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+
+        with transaction.atomic():
+            if product_ids:
+                StockLevel.objects.lock(product_ids)
+                archived, openings = compact_products(compaction, product_ids, batch_size)
+                compaction.last_product_id = product_ids[-1]
+                compaction.archived_count += archived
+                compaction.opening_count += openings
+            else:
+                compaction.completed_at = timezone.now()
+            compaction.save()
+
+        if progress:
+            progress(compaction)
+    return compaction
@@ -0,0 +1,159 @@
+import os
+
+import pandas as pd
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.functions import Upper
+from django.utils import timezone
+
+from inventory.models import (
+    InventoryAdjustment, InventoryTransaction, StockCount, StockCountLine, StockLevel,
+)
+from inventory.utils.stock_quantity import get_current_stock_bulk
+from product.models import Product
+
+SKU_COLUMNS = ('sku',)
+COUNT_COLUMNS = ('counted_quantity', 'counted', 'quantity', 'qty')
+
+
+def read_count_file(upload):
+    """
+    Read a CSV/XLSX count sheet into a frame of (sku, counted_quantity).
+    Column names are matched case-insensitively; repeated SKUs are added up.
+    """
+    extension = os.path.splitext(upload.name)[1].lower()
+    try:
+        if extension == '.csv':
+            frame = pd.read_csv(upload, dtype=str)
+        elif extension == '.xlsx':
+            frame = pd.read_excel(upload, dtype=str)
+        else:
+            raise ValidationError("Upload a .csv or .xlsx file.")
+    except (ValueError, pd.errors.ParserError) as error:
+        raise ValidationError(f"Could not read the file: {error}")
+
+    frame.columns = [str(column).strip().lower().replace(' ', '_') for column in frame.columns]
+    sku_column = next((column for column in SKU_COLUMNS if column in frame.columns), None)
+    count_column = next((column for column in COUNT_COLUMNS if column in frame.columns), None)
+    if not sku_column or not count_column:
+        raise ValidationError("The file needs a 'SKU' column and a 'Counted Quantity' column.")
+
+    frame = frame[[sku_column, count_column]].rename(columns={sku_column: 'sku', count_column: 'counted_quantity'})
+    frame = frame.dropna(subset=['sku'])
+    frame['sku'] = frame['sku'].astype(str).str.strip().str.upper()
+    frame['counted_quantity'] = pd.to_numeric(frame['counted_quantity'], errors='coerce')
+
+    # Counts are whole units; a fraction would be rounded into an adjustment nobody counted
+    invalid = frame.loc[
+        frame['counted_quantity'].isna()
+        | (frame['counted_quantity'] < 0)
+        | (frame['counted_quantity'] % 1 != 0),
+        'sku',
+    ]
+    if not invalid.empty:
+        raise ValidationError(f"Invalid counted quantity for: {', '.join(invalid.head(10))}")
+    if frame.empty:
+        raise ValidationError("The file has no count lines.")
+
+    frame['counted_quantity'] = frame['counted_quantity'].astype(int)
+    return frame.groupby('sku', as_index=False)['counted_quantity'].sum()
+
+
+def match_products(frame):
+    """
+    Attach product ids by SKU, compared case-insensitively like the sheet's
+    uppercased SKUs; unknown or ambiguous SKUs reject the whole sheet.
+    """
+    products = pd.DataFrame(
+        Product.objects.annotate(sku_key=Upper('sku'))
+        .filter(sku_key__in=frame['sku'].tolist())
+        .values('id', 'sku_key'),
+        columns=['id', 'sku_key'],
+    ).rename(columns={'sku_key': 'sku'})
+    ambiguous = products.loc[products['sku'].duplicated(), 'sku'].unique()
+    if len(ambiguous):
+        raise ValidationError(f"SKUs used by more than one product: {', '.join(ambiguous[:10])}")
+
+    frame = frame.merge(products, on='sku', how='left')
+    unknown = frame.loc[frame['id'].isna(), 'sku']
+    if not unknown.empty:
+        raise ValidationError(f"Unknown SKUs: {', '.join(unknown.head(10))}")
+    frame['id'] = frame['id'].astype(int)
+    return frame
+
+
+def post_stock_count(upload, user=None, note=''):
+    """
+    Post a count sheet: every line is recorded, and each variance becomes an
+    InventoryAdjustment plus its ADJUSTMENT movement. Everything is written with
+    bulk_create in one transaction, so the per-row adjustment signal never runs.
+    """
+    frame = match_products(read_count_file(upload))
+    count_date = timezone.now()
+    product_ids = frame['id'].tolist()
+
+    with transaction.atomic():
+        # Lock before reading stock so the variance is taken against what we adjust
+        StockLevel.objects.ensure(product_ids)
+        StockLevel.objects.lock(product_ids)
+
+        frame['system_quantity'] = frame['id'].map(get_current_stock_bulk(product_ids))
+        frame['variance'] = frame['counted_quantity'] - frame['system_quantity']
+        variances = frame[frame['variance'] != 0]
+
+        stock_count = StockCount(
+            date=count_date,
+            file_name=upload.name,
+            note=note,
+            line_count=len(frame),
+            variance_count=len(variances),
+        )
+        stock_count.save()
+        # Numbered by id, so counts posted in the same second still get their own reference
+        stock_count.reference = f"SC-{stock_count.pk}"
+        stock_count.save(update_fields=['reference'])
+
+        reason = f"Stock count {stock_count.reference}"
+        adjustments = InventoryAdjustment.objects.bulk_create([
+            InventoryAdjustment(
+                product_id=product_id,
+                adjustment_type=(
+                    InventoryAdjustment.AdjustmentType.INCREASE if variance > 0
+                    else InventoryAdjustment.AdjustmentType.DECREASE
+                ),
+                quantity=abs(variance),
+                reason=reason,
+                date=count_date,
+                created_by=user,
+            )
+            for product_id, variance in zip(variances['id'].tolist(), variances['variance'].tolist())
+        ])
+        adjustment_ids = {adjustment.product_id: adjustment.pk for adjustment in adjustments}
+
+        InventoryTransaction.objects.post_many([
+            InventoryTransaction(
+                product_id=adjustment.product_id,
+                transaction_type=InventoryTransaction.TransactionType.ADJUSTMENT,
+                quantity=int(adjustment.quantity) if adjustment.adjustment_type == InventoryAdjustment.AdjustmentType.INCREASE else -int(adjustment.quantity),
+                # Same reference and note as the adjustment signal, so later edits find the movement
+                reference_code=adjustment.pk,
+                note=f"Stock Adjustment: {reason}",
+                date=count_date,
+                created_by=user,
+            )
+            for adjustment in adjustments
+        ])
+
+        StockCountLine.objects.bulk_create([
+            StockCountLine(
+                stock_count=stock_count,
+                product_id=int(row.id),
+                system_quantity=int(row.system_quantity),
+                counted_quantity=int(row.counted_quantity),
+                variance=int(row.variance),
+                adjustment_id=adjustment_ids.get(int(row.id)),
+            )
+            for row in frame.itertuples(index=False)
+        ], batch_size=2000)
+
+    return stock_count
@@ -1,27 +1,163 @@
-from django.db.models import Sum
-from inventory.models import InventoryTransaction
+from datetime import timedelta
 
+from django.apps import apps
+from django.db.models import F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 
+from commons.utils import start_of_day
+from inventory.models import (
+    InventoryCompaction, InventoryTransaction, InventoryTransactionArchive, StockLevel, StockSnapshot,
+)
 
-def get_current_stock(product_id):
-    transactions = InventoryTransaction.objects.filter(product_id=product_id)
-
-    additions = transactions.filter(transaction_type__in=[
-        InventoryTransaction.TransactionType.PURCHASE,
-        InventoryTransaction.TransactionType.SALE_RETURN,
-        InventoryTransaction.TransactionType.TRANSFER_IN,
-        InventoryTransaction.TransactionType.INITIAL_STOCK
-    ]).aggregate(total=Sum('quantity'))['total'] or 0
-
-    subtractions = transactions.filter(transaction_type__in=[
-        InventoryTransaction.TransactionType.SALE,
-        InventoryTransaction.TransactionType.PURCHASE_RETURN,
-        InventoryTransaction.TransactionType.TRANSFER_OUT
-    ]).aggregate(total=Sum('quantity'))['total'] or 0
-
-    # Adjustments can be positive or negative, so we sum them separately
-    adjustments = transactions.filter(
-        transaction_type=InventoryTransaction.TransactionType.ADJUSTMENT
+
+def calculate_stock_from_ledger(product_id):
+    # Quantities are signed (stock out is negative), so the balance is a plain sum
+    return InventoryTransaction.objects.filter(
+        product_id=product_id
     ).aggregate(total=Sum('quantity'))['total'] or 0
 
-    return additions + subtractions + adjustments
+
+def get_current_stock(product_id):
+    quantity = StockLevel.objects.filter(pk=product_id).values_list('quantity', flat=True).first()
+    if quantity is None:
+        # No materialized row yet (product without movements or table not rebuilt)
+        return calculate_stock_from_ledger(product_id)
+    return quantity
+
+
+def movement_sources(since=None, until=None):
+    """
+    Querysets that together hold every movement dated in [since, until).
+
+    Windows that start in the open period (or cover all history) read the live
+    ledger, whose opening balance rows stand in for the archived movements.
+    Windows reaching into a compacted period read the archive plus the live
+    movements other than those opening rows.
+    """
+    cutoff = InventoryCompaction.objects.latest_cutoff()
+    boundary = since or until
+    live = InventoryTransaction.objects.all()
+    if cutoff is None or boundary is None or boundary >= cutoff:
+        sources = [live]
+    else:
+        sources = [
+            live.exclude(transaction_type=InventoryTransaction.TransactionType.OPENING_BALANCE),
+            InventoryTransactionArchive.objects.filter(deleted_at__isnull=True),
+        ]
+
+    window = {}
+    if since is not None:
+        window['date__gte'] = since
+    if until is not None:
+        window['date__lt'] = until
+    return [source.filter(**window) for source in sources]
+
+
+def get_current_stock_bulk(product_ids):
+    """Return {product_id: stock} for many products with a single grouped query."""
+    product_ids = list(product_ids)
+    stock = dict(
+        StockLevel.objects.filter(pk__in=product_ids).values_list('product_id', 'quantity')
+    )
+
+    missing = [product_id for product_id in product_ids if product_id not in stock]
+    if missing:
+        ledger = (
+            InventoryTransaction.objects.filter(product_id__in=missing)
+            .order_by()
+            .values('product_id')
+            .annotate(total=Sum('quantity'))
+        )
+        stock.update({row['product_id']: row['total'] or 0 for row in ledger})
+        stock.update({product_id: 0 for product_id in missing if product_id not in stock})
+
+    return stock
+
+
+def current_stock_expression():
+    """
+    Stock expression for annotating a Product queryset. Reads the materialized
+    level and only falls back to the ledger for products that have no level row.
+    """
+    ledger_total = (
+        InventoryTransaction.objects.filter(product_id=OuterRef('pk'))
+        .order_by()
+        .values('product_id')
+        .annotate(total=Sum('quantity'))
+        .values('total')
+    )
+    return Coalesce(F('stock_level__quantity'), Subquery(ledger_total), Value(0))
+
+
+def end_of_day(day):
+    """First moment after `day` in the active timezone; snapshots close the day there."""
+    return start_of_day(day + timedelta(days=1))
+
+
+def latest_snapshot_date(as_of):
+    return StockSnapshot.objects.filter(date__lte=as_of).aggregate(latest=Max('date'))['latest']
+
+
+def balance_seek_expression(until):
+    """
+    Running balance of the product's last movement before `until`, for
+    annotating a Product queryset: an index seek on (product, date, id) per
+    source rather than a sum over the product's history. NULL when there is no
+    such movement or its balance was never backfilled.
+    """
+    seeks = [
+        Subquery(
+            source.filter(product_id=OuterRef('pk')).order_by('-date', '-id').values('balance_after')[:1]
+        )
+        for source in movement_sources(until=until)
+    ]
+    # Before the cutoff the live source holds no movements, so the archive answers
+    return Coalesce(*seeks) if len(seeks) > 1 else seeks[0]
+
+
+def summed_stock_expression(as_of):
+    """Stock at the end of `as_of` as the nearest earlier snapshot plus the movements since."""
+    opening = Value(0)
+    since = None
+
+    snapshot_date = latest_snapshot_date(as_of)
+    if snapshot_date:
+        since = end_of_day(snapshot_date)
+        opening = Coalesce(
+            Subquery(
+                StockSnapshot.objects.filter(product_id=OuterRef('pk'), date=snapshot_date).values('quantity')[:1]
+            ),
+            Value(0),
+        )
+
+    for movements in movement_sources(since, end_of_day(as_of)):
+        movement_total = (
+            movements.filter(product_id=OuterRef('pk'))
+            .order_by().values('product_id').annotate(total=Sum('quantity')).values('total')
+        )
+        opening = opening + Coalesce(Subquery(movement_total), Value(0))
+    return opening
+
+
+def stock_as_of_expression(as_of):
+    """
+    Stock at the end of `as_of`, for annotating a Product queryset: the
+    running balance of the last movement up to then. Products without one,
+    or whose history predates balance_after (see the backfill_balance_after
+    command), are summed from the nearest snapshot instead.
+    """
+    return Coalesce(balance_seek_expression(end_of_day(as_of)), summed_stock_expression(as_of))
+
+
+def get_stock_as_of(product_ids, as_of):
+    """Return {product_id: stock at the end of `as_of`} with one query."""
+    product_ids = list(product_ids)
+    # Product imports this module for its stock annotations
+    Product = apps.get_model('product', 'Product')
+    stock = dict.fromkeys(product_ids, 0)
+    stock.update(
+        Product.all_objects.filter(pk__in=product_ids)
+        .annotate(stock=stock_as_of_expression(as_of))
+        .values_list('pk', 'stock')
+    )
+    return stock
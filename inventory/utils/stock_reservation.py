@@ -0,0 +1,114 @@
+from collections import defaultdict
+
+from django.core.exceptions import ValidationError
+from django.db.models import F
+
+from inventory.models import InventoryTransaction, InventoryTransactionArchive, StockLevel, StockReservation
+from inventory.utils.document_posting import apply_postings
+
+
+class InsufficientStock(ValidationError):
+    """A sale asks for more units than are available (on hand minus reserved)."""
+
+    def __init__(self, shortages):
+        # [(product, requested, available), ...]
+        self.shortages = shortages
+        super().__init__([
+            f"Insufficient stock for {product.name}: requested {requested}, available {available}."
+            for product, requested, available in shortages
+        ])
+
+
+def get_sale_requirements(sale):
+    """Units per product the sale should hold. Cancelled or deleted sales hold nothing."""
+    required = defaultdict(int)
+    products = {}
+    if sale.deleted_at or sale.status == sale.Status.CANCELLED:
+        return required, products
+
+    for item in sale.items.select_related('product'):
+        required[item.product_id] += int(abs(item.quantity))
+        products[item.product_id] = item.product
+    return required, products
+
+
+def sync_sale_stock(sale):
+    """
+    Bring the stock held by a sale in line with its items and status: draft and
+    confirmed sales reserve units, delivered sales post SALE movements.
+
+    The level rows of every product involved are locked in product order before
+    anything is checked, so parallel checkouts queue up instead of overselling.
+    Raises InsufficientStock before writing anything, and ValidationError for
+    a sale whose postings were compacted. Call inside transaction.atomic.
+    """
+    # Serialize concurrent edits of the same sale before reading what it holds
+    list(type(sale).all_objects.select_for_update().filter(pk=sale.pk).values_list('pk', flat=True))
+
+    if InventoryTransactionArchive.objects.filter(
+        transaction_type=InventoryTransaction.TransactionType.SALE, reference_code=sale.invoice_number
+    ).exists():
+        # Its postings were compacted away; reading only the live ones would post the sale again
+        raise ValidationError(
+            f"Sale #{sale.invoice_number} was delivered in a compacted period and its stock can no longer change."
+        )
+
+    required, products = get_sale_requirements(sale)
+    deliver = sale.status == sale.Status.DELIVERED
+
+    reserved = dict(StockReservation.objects.filter(sale=sale).values_list('product_id', 'quantity'))
+    postings = {
+        posting.product_id: posting
+        for posting in InventoryTransaction.objects.filter(
+            transaction_type=InventoryTransaction.TransactionType.SALE,
+            reference_code=sale.invoice_number,
+        )
+    }
+
+    product_ids = sorted(set(required) | set(reserved) | set(postings))
+    StockLevel.objects.ensure(product_ids)
+    levels = {
+        level.pk: level
+        for level in StockLevel.objects.select_for_update().filter(pk__in=product_ids).order_by('pk')
+    }
+
+    shortages = []
+    for product_id, requested in required.items():
+        # Whatever this sale already holds counts towards what it may take
+        held = reserved.get(product_id, 0) - (postings[product_id].quantity if product_id in postings else 0)
+        available = levels[product_id].available + held
+        if requested > available:
+            shortages.append((products[product_id], requested, available))
+    if shortages:
+        raise InsufficientStock(shortages)
+
+    target_reserved = {} if deliver else required
+    target_posted = required if deliver else {}
+
+    for product_id in product_ids:
+        delta = target_reserved.get(product_id, 0) - reserved.get(product_id, 0)
+        if delta:
+            StockLevel.objects.filter(pk=product_id).update(reserved=F('reserved') + delta)
+
+    StockReservation.objects.filter(sale=sale).exclude(product_id__in=list(target_reserved)).delete()
+    StockReservation.objects.bulk_create(
+        [
+            StockReservation(sale=sale, product_id=product_id, quantity=quantity)
+            for product_id, quantity in target_reserved.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['sale', 'product'],
+        update_fields=['quantity', 'updated_at'],
+    )
+
+    apply_postings(
+        InventoryTransaction.TransactionType.SALE,
+        postings.values(),
+        {
+            (product_id, sale.invoice_number): {
+                'quantity': -quantity,  # Negative quantity = stock out
+                'note': f"Sold to customer via sales #{sale.invoice_number}",
+            }
+            for product_id, quantity in target_posted.items()
+        },
+    )
@@ -0,0 +1,43 @@
+
+from inventory.models import StockSnapshot
+from inventory.utils.stock_quantity import get_stock_as_of
+from product.models import Product
+
+
+def create_stock_snapshots(snapshot_date, chunk_size=1000):
+    """
+    Store the closing stock of every product for `snapshot_date`. Each chunk builds
+    on the previous snapshot, so a daily run only reads that day's movements.
+    Re-running a date overwrites its rows.
+    """
+    last_id = 0
+    created = 0
+
+    while True:
+        products = list(
+            Product.all_objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', 'cost__average_cost')[:chunk_size]
+        )
+        if not products:
+            break
+
+        stock = get_stock_as_of([product_id for product_id, _ in products], snapshot_date)
+        snapshots = [
+            StockSnapshot(
+                product_id=product_id,
+                date=snapshot_date,
+                quantity=stock[product_id],
+                value=stock[product_id] * (average_cost or 0),
+            )
+            for product_id, average_cost in products
+        ]
+        StockSnapshot.objects.bulk_create(
+            snapshots,
+            update_conflicts=True,
+            unique_fields=['product', 'date'],
+            update_fields=['quantity', 'value'],
+        )
+
+        created += len(snapshots)
+        last_id = products[-1][0]
+
+    return created
@@ -8,7 +8,7 @@ from authentication.models import Customer, Supplier
 from product.models import Product
 from sales.models import Sale, SaleItem
 from purchase.models import Purchase, PurchaseItem
-from inventory.models import InventoryTransaction
+from inventory.models import InventoryTransaction, LowStockAlert
 
 
 def dashboard_view(request):
@@ -42,7 +42,7 @@ def dashboard_view(request):
     total_sales_invoices = Sale.objects.filter(status__in=['confirmed', 'delivered']).count()
     
     # Recently added products (last 10)
-    recent_products = Product.objects.filter(is_active=True).order_by('-created_at')[:10]
+    recent_products = Product.objects.filter(is_active=True).with_stock().order_by('-created_at')[:10]
     
     # Chart data - Monthly sales and purchase data for current year
     current_year = today.year
@@ -75,17 +75,11 @@ def dashboard_view(request):
             'purchases': float(monthly_purchases)
         })
     
-    # Low stock products (products with stock <= 10)
-    low_stock_products = []
-    for product in Product.objects.filter(is_active=True):
-        if product.stock <= 10:
-            low_stock_products.append({
-                'product': product,
-                'stock': product.stock
-            })
-    
-    # Sort by stock level (lowest first)
-    low_stock_products.sort(key=lambda x: x['stock'])
+    # Low stock products (at or below their reorder point), lowest first
+    low_stock_products = [
+        {'product': alert.product, 'stock': alert.stock}
+        for alert in LowStockAlert.objects.lowest(10)
+    ]
     
     context = {
         'purchase_due_total': purchase_due_total,
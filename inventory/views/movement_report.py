@@ -0,0 +1,171 @@
+import csv
+from datetime import timedelta
+
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db.models import FilteredRelation, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from django.shortcuts import render
+from django.utils import timezone
+
+from commons.utils import is_ajax, parse_date_range
+from inventory.models import InventoryCompaction, InventoryTransaction, InventoryTransactionArchive
+from inventory.utils.stock_quantity import end_of_day
+from product.models import Brand, Product, ProductCategory
+
+TransactionType = InventoryTransaction.TransactionType
+
+# Report column -> transaction types it sums; anything else counts as an adjustment
+MOVEMENT_COLUMNS = {
+    'purchases': [TransactionType.PURCHASE],
+    'purchase_returns': [TransactionType.PURCHASE_RETURN],
+    'sales': [TransactionType.SALE],
+    'sale_returns': [TransactionType.SALE_RETURN],
+}
+ADJUSTMENT_TYPES = [
+    TransactionType.ADJUSTMENT,
+    TransactionType.INITIAL_STOCK,
+    TransactionType.TRANSFER_IN,
+    TransactionType.TRANSFER_OUT,
+]
+# Stock-out columns are shown as positive quantities
+OUTGOING_COLUMNS = {'purchase_returns', 'sales'}
+
+CSV_HEADER = [
+    'Product', 'SKU', 'Category', 'Brand', 'Opening', 'Purchases', 'Purchase Returns',
+    'Sales', 'Sale Returns', 'Adjustments', 'Closing',
+]
+
+
+def get_movement_queryset(date_from, date_to, search='', category=None, brand=None):
+    """
+    Opening, movements by type and closing stock per product between two dates
+    (inclusive), in one grouped query. The ledger join is limited to movements
+    before the end of the range, which the (product, date) index serves.
+    Ranges that start before the compaction cutoff add the archived movements
+    through correlated subqueries in place of the live opening balance rows.
+    """
+    start, end = end_of_day(date_from - timedelta(days=1)), end_of_day(date_to)
+    cutoff = InventoryCompaction.objects.latest_cutoff()
+    read_archive = cutoff is not None and start < cutoff
+
+    def total(**lookups):
+        live = Coalesce(
+            Sum('movements__quantity', filter=Q(**{f'movements__{key}': value for key, value in lookups.items()})),
+            Value(0),
+            output_field=IntegerField(),
+        )
+        if not read_archive:
+            return live
+        archived = (
+            InventoryTransactionArchive.objects.filter(product_id=OuterRef('pk'), date__lt=end, deleted_at__isnull=True)
+            .filter(**lookups)
+            .order_by().values('product_id').annotate(total=Sum('quantity')).values('total')
+        )
+        return live + Coalesce(Subquery(archived), Value(0))
+
+    columns = {
+        name: total(date__gte=start, transaction_type__in=types)
+        for name, types in MOVEMENT_COLUMNS.items()
+    }
+
+    products = Product.objects.filter(is_active=True)
+    if search:
+        products = products.filter(Q(name__icontains=search) | Q(sku__icontains=search))
+    if category:
+        products = products.filter(category_id=category)
+    if brand:
+        products = products.filter(brand_id=brand)
+
+    live_movements = Q(transactions__date__lt=end, transactions__deleted_at__isnull=True)
+    if read_archive:
+        live_movements &= ~Q(transactions__transaction_type=TransactionType.OPENING_BALANCE)
+
+    return (
+        products.annotate(movements=FilteredRelation('transactions', condition=live_movements))
+        .annotate(
+            opening=total(date__lt=start),
+            adjustments=total(date__gte=start, transaction_type__in=ADJUSTMENT_TYPES),
+            closing=total(),
+            **columns,
+        )
+        # Products that had neither stock nor movements have nothing to report
+        .exclude(opening=0, closing=0, adjustments=0, **{name: 0 for name in columns})
+        .values('id', 'name', 'sku', 'category__name', 'brand__name', 'opening', 'adjustments', 'closing', *columns)
+        .order_by('name', 'id')
+    )
+
+
+def build_movement_row(row):
+    for name in OUTGOING_COLUMNS:
+        row[name] = -row[name]
+    return row
+
+
+@login_required
+def movement_report(request):
+    filter_search = request.GET.get('search_input', '').strip()
+    filter_category = request.GET.get('category', '').strip()
+    filter_brand = request.GET.get('brand', '').strip()
+    export_format = request.GET.get('export_format', None)
+
+    # Default to the current month
+    date_from, date_to = parse_date_range(request, timezone.localdate().replace(day=1), timezone.localdate())
+    filter_date_from = date_from.strftime("%d-%m-%Y")
+    filter_date_to = date_to.strftime("%d-%m-%Y")
+
+    movements = get_movement_queryset(date_from, date_to, filter_search, filter_category, filter_brand)
+
+    if export_format == 'csv':
+        return export_movement_report_to_csv(movements, date_from, date_to)
+
+    paginator = Paginator(movements, 50)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    page_obj.object_list = [build_movement_row(row) for row in page_obj.object_list]
+
+    context = {
+        'movement_data': page_obj,
+        'categories': ProductCategory.objects.filter(is_active=True).order_by('name'),
+        'brands': Brand.objects.order_by('name'),
+        'filter_search': filter_search,
+        'filter_category': filter_category,
+        'filter_brand': filter_brand,
+        'filter_date_from': filter_date_from,
+        'filter_date_to': filter_date_to,
+        'selected_category': int(filter_category) if filter_category else None,
+        'selected_brand': int(filter_brand) if filter_brand else None,
+    }
+
+    if not is_ajax(request):
+        return render(request, 'movement_report/list.html', context)
+
+    return render(request, 'movement_report/_table_fragment.html', context)
+
+
+class Echo:
+    """File-like object whose write() hands the line back to the csv writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def export_movement_report_to_csv(movements, date_from, date_to):
+    writer = csv.writer(Echo())
+
+    def rows():
+        yield writer.writerow(CSV_HEADER)
+        # iterator() streams rows from the cursor instead of caching the whole result
+        for row in movements.iterator(chunk_size=2000):
+            row = build_movement_row(row)
+            yield writer.writerow([
+                row['name'], row['sku'], row['category__name'], row['brand__name'], row['opening'],
+                row['purchases'], row['purchase_returns'], row['sales'], row['sale_returns'],
+                row['adjustments'], row['closing'],
+            ])
+
+    response = StreamingHttpResponse(rows(), content_type='text/csv')
+    response['Content-Disposition'] = (
+        f'attachment; filename="movement_report_{date_from:%Y%m%d}_{date_to:%Y%m%d}.csv"'
+    )
+    return response
@@ -0,0 +1,75 @@
+from django.views.generic import ListView, DetailView, FormView
+from django.shortcuts import render, redirect
+from django.contrib import messages
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+from django.http import JsonResponse
+
+from commons.utils import is_ajax
+
+from inventory.models import StockCount
+from inventory.forms.stock_count import StockCountUploadForm
+from inventory.utils.stock_count import post_stock_count
+
+
+class StockCountListView(LoginRequiredMixin, ListView):
+    model = StockCount
+    template_name = 'stock_count/list.html'
+    context_object_name = 'stock_count_list'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        paginator = Paginator(context.get('stock_count_list'), 50)
+        context['stock_count_list'] = paginator.get_page(self.request.GET.get('page'))
+        return context
+
+    def render_to_response(self, context, **response_kwargs):
+        if is_ajax(self.request):
+            html = render_to_string('stock_count/_table_fragment.html', context=context, request=self.request)
+            return JsonResponse({'html': html})
+        return super().render_to_response(context, **response_kwargs)
+
+
+class StockCountDetailView(LoginRequiredMixin, DetailView):
+    model = StockCount
+    template_name = 'stock_count/detail.html'
+    context_object_name = 'stock_count'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        lines = self.object.lines.select_related('product').order_by('variance', 'product__name')
+        if self.request.GET.get('variance_only'):
+            lines = lines.exclude(variance=0)
+        context['lines'] = Paginator(lines, 100).get_page(self.request.GET.get('page'))
+        context['variance_only'] = self.request.GET.get('variance_only', '')
+        return context
+
+
+class StockCountCreateView(LoginRequiredMixin, FormView):
+    form_class = StockCountUploadForm
+    template_name = 'stock_count/form.html'
+
+    def form_valid(self, form):
+        try:
+            stock_count = post_stock_count(
+                form.cleaned_data['file'], user=self.request.user, note=form.cleaned_data['note']
+            )
+        except ValidationError as error:
+            form.add_error('file', error)
+            return self.form_invalid(form)
+
+        messages.success(
+            self.request,
+            f"Stock count {stock_count.reference} posted: {stock_count.variance_count} of {stock_count.line_count} lines adjusted.",
+        )
+        return redirect('stock_count_detail', pk=stock_count.pk)
+
+    def form_invalid(self, form):
+        errors = []
+        for err_list in form.errors.values():
+            errors.extend(err_list)
+        context = self.get_context_data(form=form)
+        context.update({'messages': errors, 'is_error': True})
+        return render(self.request, self.template_name, context, status=400)
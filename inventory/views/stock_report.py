@@ -1,7 +1,7 @@
-from datetime import datetime
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.db.models import Q, Sum, Count, Case, When, IntegerField
+from django.db.models import Q, Sum, Count, Case, When, IntegerField, F, Value, CharField, DecimalField, ExpressionWrapper, Window
+from django.db.models.functions import Coalesce, RowNumber
 from django.http import JsonResponse, HttpResponse
 from django.shortcuts import render
 from django.template.loader import render_to_string
@@ -12,8 +12,8 @@ import os
 
 from product.models import Product, ProductCategory, Brand
 from inventory.models import InventoryTransaction
-from inventory.utils.stock_quantity import get_current_stock
-from commons.utils import is_ajax
+from inventory.utils.stock_quantity import end_of_day
+from commons.utils import is_ajax, parse_date
 
 
 @login_required
@@ -23,10 +23,17 @@ def stock_report(request):
     filter_category = request.GET.get('category', '').strip()
     filter_brand = request.GET.get('brand', '').strip()
     filter_stock_status = request.GET.get('stock_status', '').strip()
+    filter_as_of = request.GET.get('as_of', '').strip()
     export_format = request.GET.get('export_format', None)
 
+    # Closing stock of a past day comes from the nearest snapshot plus later movements;
+    # an unreadable date falls back to the current stock
+    as_of = parse_date(filter_as_of)
+    if as_of is None:
+        filter_as_of = ''
+
     # Get all products with related data
-    products = Product.objects.select_related('category', 'brand', 'unit').filter(is_active=True)
+    products = Product.objects.select_related('category', 'brand', 'unit').filter(is_active=True).with_stock(as_of=as_of)
 
     # Apply search filter
     if filter_search:
@@ -43,50 +50,41 @@ def stock_report(request):
     if filter_brand:
         products = products.filter(brand_id=filter_brand)
 
-    # Build stock report data
-    stock_data = []
-    total_products = 0
-    total_stock_value = 0
-    low_stock_count = 0
-    out_of_stock_count = 0
-
-    for product in products:
-        current_stock = get_current_stock(product.id)
-        stock_value = current_stock * product.price
-        
-        # Determine stock status
-        if current_stock <= 0:
-            stock_status = 'out_of_stock'
-            out_of_stock_count += 1
-        elif current_stock <= 10:  # Assuming low stock threshold is 10
-            stock_status = 'low_stock'
-            low_stock_count += 1
-        else:
-            stock_status = 'in_stock'
-
-        # Apply stock status filter
-        if filter_stock_status:
-            if filter_stock_status != stock_status:
-                continue
-
-        # Get recent transactions
-        recent_transactions = InventoryTransaction.objects.filter(
-            product=product
-        ).select_related('created_by')[:5]
-
-        stock_item = {
-            'product': product,
-            'current_stock': current_stock,
-            'stock_value': stock_value,
-            'stock_status': stock_status,
-            'recent_transactions': recent_transactions
-        }
-        stock_data.append(stock_item)
-        total_products += 1
-        total_stock_value += stock_value
+    # Classify, value and sort in SQL so only the visible page is materialized
+    products = products.annotate(
+        # Valued at the maintained moving-average cost, not the selling price. Only the
+        # current cost is kept, so past stock is valued at it too
+        stock_value=ExpressionWrapper(
+            F('current_stock') * Coalesce(F('cost__average_cost'), Value(0), output_field=DecimalField()),
+            output_field=DecimalField(),
+        ),
+        stock_status=Case(
+            When(current_stock__lte=0, then=Value('out_of_stock')),
+            When(current_stock__lte=F('reorder_point'), then=Value('low_stock')),
+            default=Value('in_stock'),
+            output_field=CharField(),
+        ),
+    )
+
+    # Status counts cover every matching product, totals only the selected status
+    status_filter = Q(stock_status=filter_stock_status) if filter_stock_status else None
+    summary = products.aggregate(
+        total_products=Count('pk', filter=status_filter),
+        total_stock_value=Sum('stock_value', filter=status_filter),
+        low_stock_count=Count('pk', filter=Q(stock_status='low_stock')),
+        out_of_stock_count=Count('pk', filter=Q(stock_status='out_of_stock')),
+    )
+    total_products = summary['total_products']
+    total_stock_value = summary['total_stock_value'] or 0
+    low_stock_count = summary['low_stock_count']
+    out_of_stock_count = summary['out_of_stock_count']
+
+    # Apply stock status filter
+    if filter_stock_status:
+        products = products.filter(stock_status=filter_stock_status)
 
     # Sort by stock quantity (ascending for low stock first)
-    stock_data.sort(key=lambda x: x['current_stock'])
+    products = products.order_by('current_stock', 'pk')
 
     # Get filter options
     categories = ProductCategory.objects.filter(is_active=True).order_by('name')
@@ -94,7 +92,7 @@ def stock_report(request):
 
     if export_format == 'pdf':
         return export_stock_report_to_pdf(request, {
-            'stock_data': stock_data,
+            'stock_data': [build_stock_row(product) for product in products],
             'total_products': total_products,
             'total_stock_value': total_stock_value,
             'low_stock_count': low_stock_count,
@@ -103,13 +101,24 @@ def stock_report(request):
             'filter_category': filter_category,
             'filter_brand': filter_brand,
             'filter_stock_status': filter_stock_status,
+            'filter_as_of': filter_as_of,
+            'valued_at_current_cost': as_of is not None,
         })
 
     # Pagination
-    paginator = Paginator(stock_data, 50)
+    paginator = Paginator(products, 50)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
+    recent_transactions = get_recent_transactions(
+        [product.id for product in page_obj.object_list],
+        until=end_of_day(as_of) if as_of else None,
+    )
+    page_obj.object_list = [
+        build_stock_row(product, recent_transactions.get(product.id, []))
+        for product in page_obj.object_list
+    ]
+
     context = {
         'stock_data': page_obj,
         'categories': categories,
@@ -122,6 +131,8 @@ def stock_report(request):
         'filter_category': filter_category,
         'filter_brand': filter_brand,
         'filter_stock_status': filter_stock_status,
+        'filter_as_of': filter_as_of,
+        'valued_at_current_cost': as_of is not None,
         'selected_category': int(filter_category) if filter_category else None,
         'selected_brand': int(filter_brand) if filter_brand else None,
     }
@@ -134,6 +145,35 @@ def stock_report(request):
     return render(request, 'stock_report/_table_fragment.html', context)
 
 
+def get_recent_transactions(product_ids, limit=5, until=None):
+    """Latest transactions for each product (before `until` if given), fetched with one windowed query."""
+    transactions = InventoryTransaction.objects.filter(product_id__in=product_ids)
+    if until:
+        transactions = transactions.filter(date__lt=until)
+    transactions = transactions.annotate(
+        row_number=Window(
+            expression=RowNumber(),
+            partition_by=[F('product_id')],
+            order_by=[F('date').desc(), F('id').desc()],
+        )
+    ).filter(row_number__lte=limit).select_related('created_by').order_by('product_id', '-date', '-id')
+
+    grouped = {}
+    for transaction in transactions:
+        grouped.setdefault(transaction.product_id, []).append(transaction)
+    return grouped
+
+
+def build_stock_row(product, recent_transactions=None):
+    return {
+        'product': product,
+        'current_stock': product.current_stock,
+        'stock_value': product.stock_value,
+        'stock_status': product.stock_status,
+        'recent_transactions': recent_transactions or [],
+    }
+
+
 def export_stock_report_to_pdf(request, context):
     # Render HTML template
     html_string = render_to_string('stock_report/pdf_template.html', context, request=request)
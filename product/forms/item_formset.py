@@ -0,0 +1,49 @@
+from decimal import Decimal
+
+from django.forms import BaseInlineFormSet
+from django.utils.functional import cached_property
+
+from product.models import Product
+
+
+class ProductItemFormSet(BaseInlineFormSet):
+    """
+    Inline formset for document line items (sale, purchase, returns).
+
+    Active products are loaded once, annotated with stock, and every row's
+    product select renders from that shared list instead of its own queryset.
+    """
+
+    @cached_property
+    def products(self):
+        return list(Product.objects.filter(is_active=True).select_related('brand').with_stock())
+
+    @cached_property
+    def product_choices(self):
+        field = self.form.base_fields['product']
+        return [('', field.empty_label), *((product.pk, str(product)) for product in self.products)]
+
+    def get_product_choices(self):
+        return self.product_choices
+
+    def get_form_kwargs(self, index):
+        kwargs = super().get_form_kwargs(index)
+        # Passed as a callable so the list is only built when a select is rendered
+        kwargs['product_choices'] = self.get_product_choices
+        return kwargs
+
+    def get_subtotal(self):
+        """
+        Sum of the line totals this formset is about to save, taken from the
+        cleaned forms so the document's totals are known before it is saved.
+        Call after is_valid().
+        """
+        subtotal = Decimal('0')
+        for index, form in enumerate(self.forms):
+            if self.can_delete and self._should_delete_form(form):
+                continue
+            if index >= self.initial_form_count() and not form.has_changed():
+                # Blank extra rows are not saved
+                continue
+            subtotal += form.line_total()
+        return subtotal
@@ -14,12 +14,14 @@ class ProductForm(forms.ModelForm):
     
     class Meta:
         model = Product
-        fields = ['name', 'sku', 'image', 'category', 'description', 'price', 'is_active', 'brand', 'unit', 'color']
+        fields = ['name', 'sku', 'image', 'category', 'description', 'price', 'reorder_point', 'reorder_qty', 'is_active', 'brand', 'unit', 'color']
         widgets = {
             'category': forms.Select(attrs={'class': 'form-control select2_search'}),
             'brand': forms.Select(attrs={'class': 'form-control select2_search'}),
             'unit': forms.Select(attrs={'class': 'form-control select2_search'}),
             'color': forms.Select(attrs={'class': 'form-control select2_search'}),
+            'reorder_point': forms.NumberInput(attrs={'class': 'form-control', 'step': '1'}),
+            'reorder_qty': forms.NumberInput(attrs={'class': 'form-control', 'step': '1'}),
         }
 
     def __init__(self, *args, **kwargs):
@@ -38,6 +40,18 @@ class ProductForm(forms.ModelForm):
             raise ValidationError("Price cannot be negative.")
         return price
 
+    def clean_reorder_point(self):
+        reorder_point = self.cleaned_data.get('reorder_point')
+        if reorder_point is not None and reorder_point < 0:
+            raise ValidationError("Reorder point cannot be negative.")
+        return reorder_point
+
+    def clean_reorder_qty(self):
+        reorder_qty = self.cleaned_data.get('reorder_qty')
+        if reorder_qty is not None and reorder_qty < 0:
+            raise ValidationError("Reorder quantity cannot be negative.")
+        return reorder_qty
+
     def clean_sku(self):
         sku = self.cleaned_data.get('sku', '').strip().upper()
         if not sku:
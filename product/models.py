@@ -2,8 +2,9 @@ from django.db import models
 from django.utils.text import slugify
 from django.conf import settings
 from django.db.models.fields.related import ForeignKey
-from inventory.utils.stock_quantity import get_current_stock
-from utils.base_model import BaseModel
+from inventory.models import LowStockAlert
+from inventory.utils.stock_quantity import current_stock_expression, get_current_stock, stock_as_of_expression
+from utils.base_model import BaseModel, SoftDeletionManager, SoftDeletionQuerySet
 
 
 
@@ -42,6 +43,23 @@ class ProductCategory(BaseModel):
 		ordering = ['-id',]
 		verbose_name_plural = 'Categories'
 
+class ProductQuerySet(SoftDeletionQuerySet):
+    def with_stock(self, as_of=None):
+        # Exposes the balance as `current_stock`; Product.stock reuses it without a query.
+        # With `as_of` (a date) it is the closing stock of that day, built from snapshots.
+        if as_of:
+            return self.annotate(current_stock=stock_as_of_expression(as_of))
+        return self.annotate(current_stock=current_stock_expression())
+
+
+class ProductManager(SoftDeletionManager):
+    def get_queryset(self):
+        return ProductQuerySet(self.model, using=self._db).filter(deleted_at__isnull=True)
+
+    def with_stock(self, as_of=None):
+        return self.get_queryset().with_stock(as_of=as_of)
+
+
 class Product(BaseModel):
     name = models.CharField(max_length=255)
     sku = models.CharField(max_length=64, null=True, blank=True)
@@ -51,12 +69,17 @@ class Product(BaseModel):
     color = models.ForeignKey(Color, on_delete=models.PROTECT, related_name='products', null=True, blank=True)
     description = models.TextField(null=True, blank=True)
     price = models.DecimalField(max_digits=12, decimal_places=2)
+    reorder_point = models.IntegerField(default=10, help_text="Flag the product as low stock at or below this quantity")
+    reorder_qty = models.IntegerField(default=0, help_text="Suggested quantity to purchase when restocking")
     is_active = models.BooleanField(default=True)
     slug = models.SlugField(max_length=280, blank=True)
     image = models.ImageField(upload_to='products/', null=True, blank=True)
 
     unique_fields = ['name', 'slug']
 
+    objects = ProductManager()
+    all_objects = models.Manager()
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -66,6 +89,8 @@ class Product(BaseModel):
 
     @property
     def stock(self):
+        if hasattr(self, 'current_stock'):
+            return self.current_stock
         return get_current_stock(self.id)
 
     def save(self, *args, **kwargs):
@@ -79,12 +104,15 @@ class Product(BaseModel):
                 counter += 1
             self.slug = slug_candidate
         super().save(*args, **kwargs)
+        # The reorder point may have moved across the current stock
+        LowStockAlert.objects.refresh([self.pk])
 
 
     def __str__(self):
+        stock = self.stock
         return "-".join(x for x in (
             self.name,
             getattr(self.brand, "name", None),
             self.sku,
-            f"[{self.stock}]" if self.stock is not None else None
+            f"[{stock}]" if stock is not None else None
         ) if x)
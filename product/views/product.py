@@ -27,7 +27,7 @@ class ProductListView(LoginRequiredMixin, OwnerFilterMixin, ListView):
     context_object_name = 'product_list'
 
     def get_queryset(self):
-        qs = super().get_queryset().select_related('category')
+        qs = super().get_queryset().select_related('category').with_stock()
         search = self.request.GET.get('search_input', '').strip()
         category_slug = self.request.GET.get('category', '').strip()
         if search:
@@ -297,7 +297,7 @@ def create_product_ajax(request):
 @login_required
 def get_products_list(request):
     """API endpoint to get filtered products list with pagination"""
-    products = Product.objects.filter(is_active=True).select_related('brand', 'category')
+    products = Product.objects.filter(is_active=True).select_related('brand', 'category').with_stock()
 
     # Apply filters
     search = request.GET.get('search', '').strip()
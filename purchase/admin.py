@@ -1,16 +1,17 @@
 from django.contrib import admin
 from django.contrib.auth.models import Group
 
+from commons.admin import ReadOnlyAdminMixin
 from .models import *
 
 
 @admin.register(Purchase)
-class PurchaseAdmin(admin.ModelAdmin):
+class PurchaseAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
 	list_display = [field.name for field in Purchase._meta.fields]
 
 
 
 @admin.register(PurchaseItem)
-class PurchaseItemAdmin(admin.ModelAdmin):
+class PurchaseItemAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
 	list_display = [field.name for field in PurchaseItem._meta.fields]
 
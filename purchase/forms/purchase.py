@@ -1,8 +1,11 @@
+from decimal import Decimal
+
 from django import forms
 from purchase.models import Purchase, PurchaseItem
 from authentication.models import Supplier
 from product.models import Product
 from django.core.exceptions import ValidationError
+from accounts.utils.period_close import check_document_dates
 import uuid
 
 
@@ -64,6 +67,12 @@ class PurchaseForm(forms.ModelForm):
         
         return f"{prefix}{new_number:05d}"
 
+    def clean_purchase_date(self):
+        purchase_date = self.cleaned_data.get('purchase_date')
+        # Both the new date and the stored one must lie in an open period
+        check_document_dates(purchase_date, self.instance.purchase_date if self.instance.pk else None)
+        return purchase_date
+
     def clean_invoice_number(self):
         invoice_number = self.cleaned_data.get('invoice_number', '').strip()
         if not invoice_number:
@@ -100,9 +109,12 @@ class PurchaseItemForm(forms.ModelForm):
             'unit_price': forms.NumberInput(attrs={'class': 'form-control price-input', 'step': '1', 'min': '1'}),
         }
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, product_choices=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['product'].queryset = Product.objects.filter(is_active=True)
+        if product_choices is not None:
+            # Shared, stock-annotated choices from ProductItemFormSet
+            self.fields['product'].choices = product_choices
 
     def clean_quantity(self):
         quantity = self.cleaned_data.get('quantity')
@@ -116,11 +128,16 @@ class PurchaseItemForm(forms.ModelForm):
             raise ValidationError("Unit price cannot be negative.")
         return unit_price
 
+    def line_total(self):
+        """Line total from the cleaned data; save() stores the same figure."""
+        quantity = self.cleaned_data.get('quantity') or 0
+        unit_price = self.cleaned_data.get('unit_price') or 0
+        return Decimal(quantity * unit_price).quantize(Decimal('0.01'))
+
     def save(self, commit=True):
         instance = super().save(commit=False)
         # Calculate total price
-        if instance.quantity and instance.unit_price:
-            instance.total_price = instance.quantity * instance.unit_price
+        instance.total_price = self.line_total()
         
         if commit:
             instance.save()
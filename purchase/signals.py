@@ -1,83 +1,15 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from accounts.models import AccountLog, LedgerAccount, SubLedgerAccount
-from inventory.models import InventoryTransaction
-from purchase.models import Purchase, PurchaseItem
-from django.utils.timezone import now
+from accounts.models import AccountLog
+from accounts.utils.account_posting import enqueue_account_posting
+from purchase.models import Purchase
 
 @receiver(post_save, sender=Purchase)
-def create_or_update_account_logs_for_purchase(sender, instance, created, **kwargs):
-    supplier_ledger = LedgerAccount.objects.filter(reference_id=instance.supplier.id).first()
-    payment_ledger = instance.payment_ledger
-    reference_no = instance.invoice_number
-    total = instance.total
-    paid = instance.paid
-    sub_ledger, _ = SubLedgerAccount.objects.get_or_create(name='Purchase')
-
-    # Handle Supplier Ledger (DEBIT)
-    supplier_log, _ = AccountLog.objects.update_or_create(
-        reference_no=reference_no,
-        log_type='purchase_supplier',
-        ledger=supplier_ledger,
-        defaults={
-            'date': now(),
-            'sub_ledger': sub_ledger,
-            'debit_amount': total,
-            'credit_amount': 0,
-            'details': f'Purchase from supplier: {supplier_ledger.name}',
-        }
-    )
-
-    # Handle Payment Ledger (CREDIT)
-    if paid > 0 and payment_ledger:
-        payment_log, _ = AccountLog.objects.update_or_create(
-            reference_no=reference_no,
-            log_type='purchase_payment',
-            ledger=payment_ledger,
-            defaults={
-                'date': now(),
-                'sub_ledger': sub_ledger,
-                'debit_amount': 0,
-                'credit_amount': paid,
-                'details': f'Payment made for purchase: {supplier_ledger.name}',
-            }
-        )
-    else:
-        # If no payment or ledger, remove any old payment logs
-        AccountLog.objects.filter(reference_no=reference_no, log_type='purchase_payment').delete()
+def queue_account_logs_for_purchase(sender, instance, created, **kwargs):
+    # Party and payment logs are written by the posting worker, off the save path
+    enqueue_account_posting(instance)
 
 
 @receiver(post_delete, sender=Purchase)
 def delete_account_log_of_purchase(sender, instance, **kwargs):
-    AccountLog.objects.filter(reference_id=instance.invoice_number, log_type='purchase_payment').delete()
-
-
-@receiver(post_save, sender=PurchaseItem)
-def create_inventory_transaction(sender, instance, **kwargs):
-    purchase = instance.purchase
-    product = instance.product
-    reference_code = f"{purchase.invoice_number}-{instance.id}"
-    quantity = instance.quantity
-
-    # Handle inventory return (stock going OUT of warehouse)
-    InventoryTransaction.objects.update_or_create(
-        product=product,
-        transaction_type=InventoryTransaction.TransactionType.PURCHASE,
-        reference_code=reference_code,
-        defaults={
-            "current_stock": product.stock,
-            'quantity': abs(quantity),
-            'date': now(),
-            'note': f"Purchase from supplier via purchase #{purchase.invoice_number}",
-        }
-    )
-
-
-@receiver(post_delete, sender=PurchaseItem)
-def delete_inventory_transaction_on_return_delete(sender, instance, **kwargs):
-    reference_code = f"{instance.purchase.invoice_number}-{instance.id}"
-    InventoryTransaction.objects.filter(
-        product=instance.product,
-        transaction_type=InventoryTransaction.TransactionType.PURCHASE,
-        reference_code=reference_code
-    ).delete()
+    AccountLog.objects.filter(reference_no=instance.invoice_number, log_type__in=['purchase_supplier', 'purchase_payment']).delete()
@@ -3,18 +3,23 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
 from django.db.models import Q
 from django.template.loader import render_to_string
 from django.http import JsonResponse, HttpResponse
 from django.core.paginator import Paginator
 from django.forms import inlineformset_factory
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
 import weasyprint
 from utils.pillow_image import img_base64
 
 
 from purchase.models import Purchase, PurchaseItem
 from purchase.forms.purchase import PurchaseForm, PurchaseItemForm
+from product.forms.item_formset import ProductItemFormSet
+from inventory.utils.document_posting import post_document_stock
+from accounts.utils.period_close import check_document_dates
 
 
 class OwnerFilterMixin:
@@ -81,6 +86,7 @@ class PurchaseCreateView(LoginRequiredMixin, CreateView):
         PurchaseItemFormSet = inlineformset_factory(
             Purchase, PurchaseItem, 
             form=PurchaseItemForm,
+            formset=ProductItemFormSet,
             extra=1, 
             can_delete=True
         )
@@ -113,16 +119,23 @@ class PurchaseCreateView(LoginRequiredMixin, CreateView):
         item_formset = context['item_formset']
         
         if form.is_valid() and item_formset.is_valid():
-            purchase = form.save(commit=False)
-            purchase.created_by = self.request.user
-            purchase.save()
-            
-            item_formset.instance = purchase
-            item_formset.save()
-            
-            # Calculate totals
-            self.calculate_purchase_totals(purchase)
-            
+            try:
+                with transaction.atomic():
+                    purchase = form.save(commit=False)
+                    purchase.created_by = self.request.user
+                    # Totals come from the bound formset, so the document is written once
+                    self.calculate_purchase_totals(purchase, item_formset)
+                    purchase.save()
+
+                    item_formset.instance = purchase
+                    item_formset.save()
+
+                    # Post the stock of all lines at once; a failure rolls the document back
+                    post_document_stock(purchase)
+            except ValidationError as error:
+                form.add_error(None, error)
+                return self.form_invalid(form)
+
             messages.success(self.request, "Purchase created successfully.")
             return redirect('purchase_list')
         else:
@@ -146,13 +159,12 @@ class PurchaseCreateView(LoginRequiredMixin, CreateView):
         context.update({'messages': errors, 'is_error': True})
         return render(self.request, self.template_name, context, status=400)
 
-    def calculate_purchase_totals(self, purchase):
-        items = purchase.items.all()
-        subtotal = sum(item.total_price for item in items)
-        
+    def calculate_purchase_totals(self, purchase, item_formset):
+        subtotal = item_formset.get_subtotal()
+
         purchase.subtotal = subtotal
         purchase.total = subtotal - purchase.discount + purchase.tax
-        purchase.save()
+        purchase.due = purchase.total - purchase.paid
 
 
 class PurchaseUpdateView(LoginRequiredMixin, UpdateView):
@@ -166,6 +178,7 @@ class PurchaseUpdateView(LoginRequiredMixin, UpdateView):
         PurchaseItemFormSet = inlineformset_factory(
             Purchase, PurchaseItem, 
             form=PurchaseItemForm,
+            formset=ProductItemFormSet,
             extra=0, 
             can_delete=True
         )
@@ -198,16 +211,23 @@ class PurchaseUpdateView(LoginRequiredMixin, UpdateView):
         item_formset = context['item_formset']
         
         if form.is_valid() and item_formset.is_valid():
-            purchase = form.save(commit=False)
-            purchase.updated_by = self.request.user
-            purchase.save()
-            
-            item_formset.instance = purchase
-            item_formset.save()
-            
-            # Calculate totals
-            self.calculate_purchase_totals(purchase)
-            
+            try:
+                with transaction.atomic():
+                    purchase = form.save(commit=False)
+                    purchase.updated_by = self.request.user
+                    # Totals come from the bound formset, so the document is written once
+                    self.calculate_purchase_totals(purchase, item_formset)
+                    purchase.save()
+
+                    item_formset.instance = purchase
+                    item_formset.save()
+
+                    # Post the stock of all lines at once; a failure rolls the document back
+                    post_document_stock(purchase)
+            except ValidationError as error:
+                form.add_error(None, error)
+                return self.form_invalid(form)
+
             messages.success(self.request, "Purchase updated successfully.")
             return redirect('purchase_list')
         else:
@@ -231,13 +251,12 @@ class PurchaseUpdateView(LoginRequiredMixin, UpdateView):
         context.update({'messages': errors, 'is_error': True})
         return render(self.request, self.template_name, context, status=400)
 
-    def calculate_purchase_totals(self, purchase):
-        items = purchase.items.all()
-        subtotal = sum(item.total_price for item in items)
-        
+    def calculate_purchase_totals(self, purchase, item_formset):
+        subtotal = item_formset.get_subtotal()
+
         purchase.subtotal = subtotal
         purchase.total = subtotal - purchase.discount + purchase.tax
-        purchase.save()
+        purchase.due = purchase.total - purchase.paid
 
 
 class PurchaseDeleteView(LoginRequiredMixin, DeleteView):
@@ -247,7 +266,14 @@ class PurchaseDeleteView(LoginRequiredMixin, DeleteView):
 
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
-        self.object.delete()
+        try:
+            check_document_dates(self.object.purchase_date)
+            with transaction.atomic():
+                self.object.delete()
+                post_document_stock(self.object)
+        except ValidationError as error:
+            messages.error(self.request, ' '.join(error.messages))
+            return redirect(self.success_url)
         messages.success(self.request, "Purchase deleted successfully.")
         return redirect(self.success_url)
 
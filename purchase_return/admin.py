@@ -1,14 +1,16 @@
 from django.contrib import admin
+
+from commons.admin import ReadOnlyAdminMixin
 from .models import PurchaseReturn, PurchaseReturnItem
 
 
-class PurchaseReturnItemInline(admin.TabularInline):
+class PurchaseReturnItemInline(ReadOnlyAdminMixin, admin.TabularInline):
     model = PurchaseReturnItem
     extra = 0
 
 
 @admin.register(PurchaseReturn)
-class PurchaseReturnAdmin(admin.ModelAdmin):
+class PurchaseReturnAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
     list_display = ('return_number', 'supplier', 'return_date', 'total', 'status', 'created_at')
     list_filter = ('status', 'return_date', 'created_at')
     search_fields = ('return_number', 'supplier__name')
@@ -17,7 +19,7 @@ class PurchaseReturnAdmin(admin.ModelAdmin):
 
 
 @admin.register(PurchaseReturnItem)
-class PurchaseReturnItemAdmin(admin.ModelAdmin):
+class PurchaseReturnItemAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
     list_display = ('purchase_return', 'product', 'quantity', 'unit_price', 'total_price')
     list_filter = ('purchase_return__status', 'created_at')
     search_fields = ('product__name', 'purchase_return__return_number')
\ No newline at end of file
@@ -3,18 +3,23 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
 from django.db.models import Q
 from django.template.loader import render_to_string
 from django.http import JsonResponse, HttpResponse
 from django.core.paginator import Paginator
 from django.forms import inlineformset_factory
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
 import weasyprint
 from django.conf import settings
 import os
 
 from purchase_return.models import PurchaseReturn, PurchaseReturnItem
 from purchase_return.forms.purchase_return import PurchaseReturnForm, PurchaseReturnItemForm
+from product.forms.item_formset import ProductItemFormSet
+from inventory.utils.document_posting import post_document_stock
+from accounts.utils.period_close import check_document_dates
 
 
 class OwnerFilterMixin:
@@ -82,6 +87,7 @@ class PurchaseReturnCreateView(LoginRequiredMixin, CreateView):
         PurchaseReturnItemFormSet = inlineformset_factory(
             PurchaseReturn, PurchaseReturnItem, 
             form=PurchaseReturnItemForm,
+            formset=ProductItemFormSet,
             extra=1, 
             can_delete=True
         )
@@ -109,16 +115,23 @@ class PurchaseReturnCreateView(LoginRequiredMixin, CreateView):
         item_formset = context['item_formset']
         
         if form.is_valid() and item_formset.is_valid():
-            purchase_return = form.save(commit=False)
-            purchase_return.created_by = self.request.user
-            purchase_return.save()
-            
-            item_formset.instance = purchase_return
-            item_formset.save()
-            
-            # Calculate totals
-            self.calculate_return_totals(purchase_return)
-            
+            try:
+                with transaction.atomic():
+                    purchase_return = form.save(commit=False)
+                    purchase_return.created_by = self.request.user
+                    # Totals come from the bound formset, so the document is written once
+                    self.calculate_return_totals(purchase_return, item_formset)
+                    purchase_return.save()
+
+                    item_formset.instance = purchase_return
+                    item_formset.save()
+
+                    # Post the stock of all lines at once; a failure rolls the document back
+                    post_document_stock(purchase_return)
+            except ValidationError as error:
+                form.add_error(None, error)
+                return self.form_invalid(form)
+
             messages.success(self.request, "Purchase return created successfully.")
             return redirect('purchase_return_list')
         else:
@@ -142,13 +155,12 @@ class PurchaseReturnCreateView(LoginRequiredMixin, CreateView):
         context.update({'messages': errors, 'is_error': True})
         return render(self.request, self.template_name, context, status=400)
 
-    def calculate_return_totals(self, purchase_return):
-        items = purchase_return.items.all()
-        subtotal = sum(item.total_price for item in items)
-        
+    def calculate_return_totals(self, purchase_return, item_formset):
+        subtotal = item_formset.get_subtotal()
+
         purchase_return.subtotal = subtotal
         purchase_return.total = subtotal - purchase_return.discount + purchase_return.tax
-        purchase_return.save()
+        purchase_return.due = purchase_return.total - purchase_return.refunded
 
 
 class PurchaseReturnUpdateView(LoginRequiredMixin, UpdateView):
@@ -162,6 +174,7 @@ class PurchaseReturnUpdateView(LoginRequiredMixin, UpdateView):
         PurchaseReturnItemFormSet = inlineformset_factory(
             PurchaseReturn, PurchaseReturnItem, 
             form=PurchaseReturnItemForm,
+            formset=ProductItemFormSet,
             extra=0, 
             can_delete=True
         )
@@ -189,16 +202,23 @@ class PurchaseReturnUpdateView(LoginRequiredMixin, UpdateView):
         item_formset = context['item_formset']
         
         if form.is_valid() and item_formset.is_valid():
-            purchase_return = form.save(commit=False)
-            purchase_return.updated_by = self.request.user
-            purchase_return.save()
-            
-            item_formset.instance = purchase_return
-            item_formset.save()
-            
-            # Calculate totals
-            self.calculate_return_totals(purchase_return)
-            
+            try:
+                with transaction.atomic():
+                    purchase_return = form.save(commit=False)
+                    purchase_return.updated_by = self.request.user
+                    # Totals come from the bound formset, so the document is written once
+                    self.calculate_return_totals(purchase_return, item_formset)
+                    purchase_return.save()
+
+                    item_formset.instance = purchase_return
+                    item_formset.save()
+
+                    # Post the stock of all lines at once; a failure rolls the document back
+                    post_document_stock(purchase_return)
+            except ValidationError as error:
+                form.add_error(None, error)
+                return self.form_invalid(form)
+
             messages.success(self.request, "Purchase return updated successfully.")
             return redirect('purchase_return_list')
         else:
@@ -222,13 +242,12 @@ class PurchaseReturnUpdateView(LoginRequiredMixin, UpdateView):
         context.update({'messages': errors, 'is_error': True})
         return render(self.request, self.template_name, context, status=400)
 
-    def calculate_return_totals(self, purchase_return):
-        items = purchase_return.items.all()
-        subtotal = sum(item.total_price for item in items)
-        
+    def calculate_return_totals(self, purchase_return, item_formset):
+        subtotal = item_formset.get_subtotal()
+
         purchase_return.subtotal = subtotal
         purchase_return.total = subtotal - purchase_return.discount + purchase_return.tax
-        purchase_return.save()
+        purchase_return.due = purchase_return.total - purchase_return.refunded
 
 
 class PurchaseReturnDeleteView(LoginRequiredMixin, DeleteView):
@@ -238,7 +257,14 @@ class PurchaseReturnDeleteView(LoginRequiredMixin, DeleteView):
 
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
-        self.object.delete()
+        try:
+            check_document_dates(self.object.return_date)
+            with transaction.atomic():
+                self.object.delete()
+                post_document_stock(self.object)
+        except ValidationError as error:
+            messages.error(self.request, ' '.join(error.messages))
+            return redirect(self.success_url)
         messages.success(self.request, "Purchase return deleted successfully.")
         return redirect(self.success_url)
 
@@ -1,16 +1,17 @@
 from django.contrib import admin
 from django.contrib.auth.models import Group
 
+from commons.admin import ReadOnlyAdminMixin
 from .models import *
 
 
 @admin.register(Sale)
-class SaleAdmin(admin.ModelAdmin):
+class SaleAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
 	list_display = [field.name for field in Sale._meta.fields]
 
 
 
 @admin.register(SaleItem)
-class SaleItemAdmin(admin.ModelAdmin):
+class SaleItemAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
 	list_display = [field.name for field in SaleItem._meta.fields]
 
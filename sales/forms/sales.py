@@ -1,7 +1,10 @@
+from decimal import Decimal
+
 from django import forms
 from sales.models import Sale, SaleItem
 from product.models import Product
 from django.core.exceptions import ValidationError
+from accounts.utils.period_close import check_document_dates
 
 
 class SaleForm(forms.ModelForm):
@@ -57,6 +60,12 @@ class SaleForm(forms.ModelForm):
         
         return f"{prefix}{new_number:05d}"
 
+    def clean_sale_date(self):
+        sale_date = self.cleaned_data.get('sale_date')
+        # Both the new date and the stored one must lie in an open period
+        check_document_dates(sale_date, self.instance.sale_date if self.instance.pk else None)
+        return sale_date
+
     def clean_invoice_number(self):
         invoice_number = self.cleaned_data.get('invoice_number', '').strip()
         if not invoice_number:
@@ -85,9 +94,12 @@ class SaleItemForm(forms.ModelForm):
             'discount_amount': forms.NumberInput(attrs={'class': 'form-control discount-amount-input', 'step': '1', 'min': '0', 'placeholder': '0'}),
         }
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, product_choices=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['product'].queryset = Product.objects.filter(is_active=True)
+        if product_choices is not None:
+            # Shared, stock-annotated choices from ProductItemFormSet
+            self.fields['product'].choices = product_choices
 
     def clean_quantity(self):
         quantity = self.cleaned_data.get('quantity')
@@ -107,6 +119,16 @@ class SaleItemForm(forms.ModelForm):
             raise ValidationError("Discount percentage must be between 0 and 100.")
         return discount
 
+    def line_total(self):
+        """Line total after discount, from the cleaned data; save() stores the same figure."""
+        quantity = self.cleaned_data.get('quantity') or 0
+        unit_price = self.cleaned_data.get('unit_price') or 0
+        subtotal = quantity * unit_price
+        discount_amount = self.cleaned_data.get('discount_amount') or 0
+        if not discount_amount > 0:
+            discount_amount = subtotal * (self.cleaned_data.get('discount_percentage') or 0) / 100
+        return Decimal(subtotal - discount_amount).quantize(Decimal('0.01'))
+
     def save(self, commit=True):
         instance = super().save(commit=False)
         # Calculate total price based on discount
@@ -122,7 +144,7 @@ class SaleItemForm(forms.ModelForm):
                 discount_percentage = instance.discount_percentage or 0
                 instance.discount_amount = (subtotal * discount_percentage) / 100
 
-            instance.total_price = subtotal - instance.discount_amount
+        instance.total_price = self.line_total()
 
         if commit:
             instance.save()
@@ -4,17 +4,22 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
 from django.db.models import Q
 from django.template.loader import render_to_string
 from django.http import JsonResponse, HttpResponse
 from django.core.paginator import Paginator
 from django.forms import inlineformset_factory
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
 from utils.pillow_image import img_base64
 
 from sales.models import Sale, SaleItem
 from sales.forms.sales import SaleForm, SaleItemForm
+from product.forms.item_formset import ProductItemFormSet
+from inventory.utils.stock_reservation import sync_sale_stock
 from product.models import Product
+from accounts.utils.period_close import check_document_dates
 
 
 class OwnerFilterMixin:
@@ -83,6 +88,7 @@ class SaleCreateView(LoginRequiredMixin, CreateView):
         SaleItemFormSet = inlineformset_factory(
             Sale, SaleItem,
             form=SaleItemForm,
+            formset=ProductItemFormSet,
             extra=1,
             can_delete=True
         )
@@ -119,15 +125,23 @@ class SaleCreateView(LoginRequiredMixin, CreateView):
         print("form", form)
 
         if form.is_valid() and item_formset.is_valid():
-            sale = form.save(commit=False)
-            sale.created_by = self.request.user
-            sale.save()
-
-            item_formset.instance = sale
-            item_formset.save()
-
-            # Calculate totals
-            self.calculate_sale_totals(sale)
+            try:
+                with transaction.atomic():
+                    sale = form.save(commit=False)
+                    sale.created_by = self.request.user
+                    # Totals come from the bound formset, so the document is written once
+                    self.calculate_sale_totals(sale, item_formset)
+                    sale.save()
+
+                    item_formset.instance = sale
+                    item_formset.save()
+
+                    # Reserve or post the stock; rolls the whole sale back when oversold
+                    # or when its postings were compacted
+                    sync_sale_stock(sale)
+            except ValidationError as error:
+                form.add_error(None, error)
+                return self.form_invalid(form)
 
             messages.success(self.request, "Sale created successfully.")
             return redirect('sale_list')
@@ -162,13 +176,12 @@ class SaleCreateView(LoginRequiredMixin, CreateView):
         context.update({'messages': errors, 'is_error': True})
         return render(self.request, self.template_name, context, status=400)
 
-    def calculate_sale_totals(self, sale):
-        items = sale.items.all()
-        subtotal = sum(item.total_price for item in items)
-        
+    def calculate_sale_totals(self, sale, item_formset):
+        subtotal = item_formset.get_subtotal()
+
         sale.subtotal = subtotal
         sale.total = subtotal - sale.discount + sale.tax
-        sale.save()
+        sale.due = sale.total - sale.paid
 
 
 class SaleUpdateView(LoginRequiredMixin, UpdateView):
@@ -182,6 +195,7 @@ class SaleUpdateView(LoginRequiredMixin, UpdateView):
         SaleItemFormSet = inlineformset_factory(
             Sale, SaleItem,
             form=SaleItemForm,
+            formset=ProductItemFormSet,
             extra=0,
             can_delete=True
         )
@@ -216,15 +230,23 @@ class SaleUpdateView(LoginRequiredMixin, UpdateView):
         item_formset = context['item_formset']
 
         if form.is_valid() and item_formset.is_valid():
-            sale = form.save(commit=False)
-            sale.updated_by = self.request.user
-            sale.save()
-
-            item_formset.instance = sale
-            item_formset.save()
-
-            # Calculate totals
-            self.calculate_sale_totals(sale)
+            try:
+                with transaction.atomic():
+                    sale = form.save(commit=False)
+                    sale.updated_by = self.request.user
+                    # Totals come from the bound formset, so the document is written once
+                    self.calculate_sale_totals(sale, item_formset)
+                    sale.save()
+
+                    item_formset.instance = sale
+                    item_formset.save()
+
+                    # Reserve or post the stock; rolls the whole sale back when oversold
+                    # or when its postings were compacted
+                    sync_sale_stock(sale)
+            except ValidationError as error:
+                form.add_error(None, error)
+                return self.form_invalid(form)
 
             messages.success(self.request, "Sale updated successfully.")
             return redirect('sale_list')
@@ -259,13 +281,12 @@ class SaleUpdateView(LoginRequiredMixin, UpdateView):
         context.update({'messages': errors, 'is_error': True})
         return render(self.request, self.template_name, context, status=400)
 
-    def calculate_sale_totals(self, sale):
-        items = sale.items.all()
-        subtotal = sum(item.total_price for item in items)
-        
+    def calculate_sale_totals(self, sale, item_formset):
+        subtotal = item_formset.get_subtotal()
+
         sale.subtotal = subtotal
         sale.total = subtotal - sale.discount + sale.tax
-        sale.save()
+        sale.due = sale.total - sale.paid
 
 
 class SaleDeleteView(LoginRequiredMixin, DeleteView):
@@ -275,7 +296,14 @@ class SaleDeleteView(LoginRequiredMixin, DeleteView):
 
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
-        self.object.delete()
+        try:
+            check_document_dates(self.object.sale_date)
+            with transaction.atomic():
+                self.object.delete()
+                sync_sale_stock(self.object)
+        except ValidationError as error:
+            messages.error(self.request, ' '.join(error.messages))
+            return redirect(self.success_url)
         messages.success(self.request, "Sale deleted successfully.")
         return redirect(self.success_url)
 
@@ -1,12 +1,14 @@
 from django.contrib import admin
+
+from commons.admin import ReadOnlyAdminMixin
 from .models import SaleReturn, SaleReturnItem
 
-class SaleReturnItemInline(admin.TabularInline):
+class SaleReturnItemInline(ReadOnlyAdminMixin, admin.TabularInline):
     model = SaleReturnItem
     extra = 0
 
 @admin.register(SaleReturn)
-class SaleReturnAdmin(admin.ModelAdmin):
+class SaleReturnAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
     list_display = ['return_number', 'customer', 'return_date', 'total', 'status']
     list_filter = ['status', 'return_date']
     search_fields = ['return_number', 'customer__name']
@@ -26,7 +28,7 @@ class SaleReturnAdmin(admin.ModelAdmin):
     )
 
 @admin.register(SaleReturnItem)
-class SaleReturnItemAdmin(admin.ModelAdmin):
+class SaleReturnItemAdmin(ReadOnlyAdminMixin, admin.ModelAdmin):
     list_display = ['sale_return', 'product', 'quantity', 'unit_price', 'total_price']
     list_filter = ['sale_return__return_date']
     search_fields = ['product__name', 'sale_return__return_number']
\ No newline at end of file
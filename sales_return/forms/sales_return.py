@@ -1,9 +1,12 @@
+from decimal import Decimal
+
 from django import forms
 from sales_return.models import SaleReturn, SaleReturnItem
 from authentication.models import Customer
 from product.models import Product
 from sales.models import Sale, SaleItem
 from django.core.exceptions import ValidationError
+from accounts.utils.period_close import check_document_dates
 import uuid
 
 
@@ -69,6 +72,12 @@ class SaleReturnForm(forms.ModelForm):
         
         return f"{prefix}{new_number:05d}"
 
+    def clean_return_date(self):
+        return_date = self.cleaned_data.get('return_date')
+        # Both the new date and the stored one must lie in an open period
+        check_document_dates(return_date, self.instance.return_date if self.instance.pk else None)
+        return return_date
+
     def clean_return_number(self):
         return_number = self.cleaned_data.get('return_number', '').strip()
         if not return_number:
@@ -111,10 +120,13 @@ class SaleReturnItemForm(forms.ModelForm):
             'unit_price': forms.NumberInput(attrs={'class': 'form-control price-input', 'step': '1', 'min': '1'}),
         }
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, product_choices=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['product'].queryset = Product.objects.filter(is_active=True)
-        self.fields['original_sale_item'].queryset = SaleItem.objects.all()
+        if product_choices is not None:
+            # Shared, stock-annotated choices from ProductItemFormSet
+            self.fields['product'].choices = product_choices
+        self.fields['original_sale_item'].queryset = SaleItem.objects.select_related('product')
         self.fields['original_sale_item'].required = False
 
     def clean_quantity(self):
@@ -165,11 +177,16 @@ class SaleReturnItemForm(forms.ModelForm):
         
         return cleaned_data
 
+    def line_total(self):
+        """Line total from the cleaned data; save() stores the same figure."""
+        quantity = self.cleaned_data.get('quantity') or 0
+        unit_price = self.cleaned_data.get('unit_price') or 0
+        return Decimal(quantity * unit_price).quantize(Decimal('0.01'))
+
     def save(self, commit=True):
         instance = super().save(commit=False)
         # Calculate total price
-        if instance.quantity and instance.unit_price:
-            instance.total_price = instance.quantity * instance.unit_price
+        instance.total_price = self.line_total()
         
         if commit:
             instance.save()
@@ -3,18 +3,23 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.db import transaction
 from django.db.models import Q
 from django.template.loader import render_to_string
 from django.http import JsonResponse, HttpResponse
 from django.core.paginator import Paginator
 from django.forms import inlineformset_factory
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
 import weasyprint
 from django.conf import settings
 import os
 
 from sales_return.models import SaleReturn, SaleReturnItem
 from sales_return.forms.sales_return import SaleReturnForm, SaleReturnItemForm
+from product.forms.item_formset import ProductItemFormSet
+from inventory.utils.document_posting import post_document_stock
+from accounts.utils.period_close import check_document_dates
 
 
 class OwnerFilterMixin:
@@ -82,6 +87,7 @@ class SaleReturnCreateView(LoginRequiredMixin, CreateView):
         SaleReturnItemFormSet = inlineformset_factory(
             SaleReturn, SaleReturnItem, 
             form=SaleReturnItemForm,
+            formset=ProductItemFormSet,
             extra=1, 
             can_delete=True
         )
@@ -109,16 +115,23 @@ class SaleReturnCreateView(LoginRequiredMixin, CreateView):
         item_formset = context['item_formset']
         
         if form.is_valid() and item_formset.is_valid():
-            sale_return = form.save(commit=False)
-            sale_return.created_by = self.request.user
-            sale_return.save()
-            
-            item_formset.instance = sale_return
-            item_formset.save()
-            
-            # Calculate totals
-            self.calculate_return_totals(sale_return)
-            
+            try:
+                with transaction.atomic():
+                    sale_return = form.save(commit=False)
+                    sale_return.created_by = self.request.user
+                    # Totals come from the bound formset, so the document is written once
+                    self.calculate_return_totals(sale_return, item_formset)
+                    sale_return.save()
+
+                    item_formset.instance = sale_return
+                    item_formset.save()
+
+                    # Post the stock of all lines at once; a failure rolls the document back
+                    post_document_stock(sale_return)
+            except ValidationError as error:
+                form.add_error(None, error)
+                return self.form_invalid(form)
+
             messages.success(self.request, "Sale return created successfully.")
             return redirect('sale_return_list')
         else:
@@ -142,13 +155,12 @@ class SaleReturnCreateView(LoginRequiredMixin, CreateView):
         context.update({'messages': errors, 'is_error': True})
         return render(self.request, self.template_name, context, status=400)
 
-    def calculate_return_totals(self, sale_return):
-        items = sale_return.items.all()
-        subtotal = sum(item.total_price for item in items)
-        
+    def calculate_return_totals(self, sale_return, item_formset):
+        subtotal = item_formset.get_subtotal()
+
         sale_return.subtotal = subtotal
         sale_return.total = subtotal - sale_return.discount + sale_return.tax
-        sale_return.save()
+        sale_return.due = sale_return.total - sale_return.refunded
 
 
 class SaleReturnUpdateView(LoginRequiredMixin, UpdateView):
@@ -162,6 +174,7 @@ class SaleReturnUpdateView(LoginRequiredMixin, UpdateView):
         SaleReturnItemFormSet = inlineformset_factory(
             SaleReturn, SaleReturnItem, 
             form=SaleReturnItemForm,
+            formset=ProductItemFormSet,
             extra=0, 
             can_delete=True
         )
@@ -189,16 +202,23 @@ class SaleReturnUpdateView(LoginRequiredMixin, UpdateView):
         item_formset = context['item_formset']
         
         if form.is_valid() and item_formset.is_valid():
-            sale_return = form.save(commit=False)
-            sale_return.updated_by = self.request.user
-            sale_return.save()
-            
-            item_formset.instance = sale_return
-            item_formset.save()
-            
-            # Calculate totals
-            self.calculate_return_totals(sale_return)
-            
+            try:
+                with transaction.atomic():
+                    sale_return = form.save(commit=False)
+                    sale_return.updated_by = self.request.user
+                    # Totals come from the bound formset, so the document is written once
+                    self.calculate_return_totals(sale_return, item_formset)
+                    sale_return.save()
+
+                    item_formset.instance = sale_return
+                    item_formset.save()
+
+                    # Post the stock of all lines at once; a failure rolls the document back
+                    post_document_stock(sale_return)
+            except ValidationError as error:
+                form.add_error(None, error)
+                return self.form_invalid(form)
+
             messages.success(self.request, "Sale return updated successfully.")
             return redirect('sale_return_list')
         else:
@@ -222,13 +242,12 @@ class SaleReturnUpdateView(LoginRequiredMixin, UpdateView):
         context.update({'messages': errors, 'is_error': True})
         return render(self.request, self.template_name, context, status=400)
 
-    def calculate_return_totals(self, sale_return):
-        items = sale_return.items.all()
-        subtotal = sum(item.total_price for item in items)
-        
+    def calculate_return_totals(self, sale_return, item_formset):
+        subtotal = item_formset.get_subtotal()
+
         sale_return.subtotal = subtotal
         sale_return.total = subtotal - sale_return.discount + sale_return.tax
-        sale_return.save()
+        sale_return.due = sale_return.total - sale_return.refunded
 
 
 class SaleReturnDeleteView(LoginRequiredMixin, DeleteView):
@@ -238,7 +257,14 @@ class SaleReturnDeleteView(LoginRequiredMixin, DeleteView):
 
     def post(self, request, *args, **kwargs):
         self.object = self.get_object()
-        self.object.delete()
+        try:
+            check_document_dates(self.object.return_date)
+            with transaction.atomic():
+                self.object.delete()
+                post_document_stock(self.object)
+        except ValidationError as error:
+            messages.error(self.request, ' '.join(error.messages))
+            return redirect(self.success_url)
         messages.success(self.request, "Sale return deleted successfully.")
         return redirect(self.success_url)
 